@@ -0,0 +1,274 @@
+"""
+Benchmarks of drawing with each backend: wall time, peak traced memory and
+produced bytes for circles, lines and texts drawn through Cartesian, plus
+cartesian_svg.unify_shapes.  Runs headless (no browser or notebook).
+
+Record a run (sizes default to 1e2 .. 1e6 elements):
+
+    python bench.py run -o before.json
+    python bench.py run -o after.json --sizes 100,10000 --backends widget,static
+
+Compare two runs (exits with status 1 if anything regressed):
+
+    python bench.py compare before.json after.json
+
+Produced bytes are what the backend would ship: the encoded widget messages
+(JSON plus binary buffers), the HTML embedding, the SVG file or the PNG.
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from jp_svg_canvas import canvas
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import fake_svg
+from jp_svg_canvas import raster
+from jp_svg_canvas import static_svg
+from jp_svg_canvas import svg_file
+
+SIZES = (100, 1000, 10000, 100000, 1000000)
+
+# Larger sizes of a case are skipped once one run takes longer than this (seconds).
+BUDGET = 60.0
+
+# Default regression thresholds: allowed relative increase.
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.25
+BYTES_THRESHOLD = 0.01
+
+# Times below this (seconds) are too noisy to flag.
+MIN_TIME = 0.01
+
+FORMAT_VERSION = 1
+
+
+# backends: make(viewBox) returns a canvas; output(canvas) returns the produced bytes.
+
+def widget_output(widget):
+    (commands, buffers) = widget.encode_commands(widget.buffered_commands)
+    return len(json.dumps([1, commands])) + sum(memoryview(b).nbytes for b in buffers)
+
+def make_svg_file(viewBox):
+    return svg_file.SVGFileCanvas(io.StringIO(), viewBox, stream=True)
+
+def svg_file_output(target):
+    target.close()
+    return len(target.file.getvalue())
+
+BACKENDS = {
+    "widget": (lambda viewBox: canvas.SVGCanvasWidget(), widget_output),
+    "static": (static_svg.StaticCanvas, lambda target: len(target.embedding())),
+    "static_inline": (lambda viewBox: static_svg.StaticCanvas(viewBox, inline=True),
+        lambda target: len(target.embedding())),
+    "fake": (fake_svg.FakeCanvasWidget, lambda target: len(target.embedding())),
+    "fake_typed": (lambda viewBox: fake_svg.FakeCanvasWidget(viewBox, typed_arrays=True),
+        lambda target: len(target.embedding())),
+    "svg_file": (make_svg_file, svg_file_output),
+    "raster": (raster.RasterCanvas, lambda target: len(target.png())),
+}
+
+
+# workloads: draw(cartesian, data) with data from workload_data(n).
+
+def workload_data(n, seed=0):
+    rng = np.random.RandomState(seed)
+    (xs, ys, x2s, y2s) = rng.uniform(0, 100, (4, n))
+    return {
+        "xs": xs, "ys": ys, "x2s": x2s, "y2s": y2s,
+        "rs": rng.uniform(0.1, 1, n),
+        "texts": ["t%s" % (i % 1000) for i in range(n)],
+    }
+
+def draw_circles(C, data):
+    C.circles(None, data["xs"], data["ys"], data["rs"], "blue")
+
+def draw_lines(C, data):
+    C.lines(None, data["xs"], data["ys"], data["x2s"], data["y2s"], "black")
+
+def draw_texts(C, data):
+    C.texts(None, data["xs"], data["ys"], data["texts"], "black")
+
+WORKLOADS = {
+    "circles": draw_circles,
+    "lines": draw_lines,
+    "texts": draw_texts,
+}
+
+
+def run_case(workload, backend, n, data):
+    "Run one case: returns the number of produced bytes."
+    if backend is None:
+        # unify_shapes has no backend.
+        shapes = cartesian_svg.unify_shapes(data["xs"], data["ys"], "black", None)
+        return sum(shape.nbytes for shape in shapes)
+    (make, output) = BACKENDS[backend]
+    target = make("0 0 500 500")
+    C = cartesian_svg.doodle(0, 0, 100, 100, svg=target)
+    WORKLOADS[workload](C, data)
+    return output(target)
+
+def measure(workload, backend, n, repeat=1, memory=True):
+    "Result record for one case: best wall time of repeat runs and peak traced memory."
+    data = workload_data(n)
+    seconds = None
+    for _ in range(repeat):
+        start = time.time()
+        output_bytes = run_case(workload, backend, n, data)
+        elapsed = time.time() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run_case(workload, backend, n, data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        "case": case_name(workload, backend),
+        "n": n,
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "output_bytes": output_bytes,
+    }
+
+def case_name(workload, backend):
+    if backend is None:
+        return workload
+    return "%s/%s" % (workload, backend)
+
+def cases(workloads, backends):
+    "(workload, backend) pairs to run."
+    result = []
+    for workload in workloads:
+        if workload == "unify_shapes":
+            result.append((workload, None))
+        else:
+            result.extend((workload, backend) for backend in backends)
+    return result
+
+def run(sizes=SIZES, workloads=None, backends=None, repeat=1, memory=True, budget=BUDGET, verbose=True):
+    "Run the benchmarks and return the results as a JSON compatible dictionary."
+    if workloads is None:
+        workloads = sorted(WORKLOADS) + ["unify_shapes"]
+    if backends is None:
+        backends = sorted(BACKENDS)
+    results = []
+    for (workload, backend) in cases(workloads, backends):
+        for n in sorted(sizes):
+            record = measure(workload, backend, n, repeat, memory)
+            results.append(record)
+            if verbose:
+                print(format_record(record))
+                sys.stdout.flush()
+            if record["seconds"] > budget:
+                if verbose:
+                    print("%s: skipping sizes above %s (over budget)" % (record["case"], n))
+                break
+    return {
+        "version": FORMAT_VERSION,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+def format_record(record):
+    peak = record["peak_bytes"]
+    return "%-24s n=%-8s seconds=%-9.4f peak=%-11s bytes=%s" % (
+        record["case"], record["n"], record["seconds"], "-" if peak is None else peak, record["output_bytes"])
+
+
+def compare(old, new, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD,
+        bytes_threshold=BYTES_THRESHOLD, min_time=MIN_TIME):
+    """
+    Compare two runs: returns (lines, regressions) where lines report every case
+    present in both runs and regressions lists the lines which regressed.
+    """
+    old_records = dict(((r["case"], r["n"]), r) for r in old["results"])
+    lines = []
+    regressions = []
+    for record in new["results"]:
+        key = (record["case"], record["n"])
+        if key not in old_records:
+            continue
+        before = old_records[key]
+        flags = []
+        checks = [
+            ("seconds", time_threshold, min_time),
+            ("peak_bytes", memory_threshold, 0),
+            ("output_bytes", bytes_threshold, 0),
+        ]
+        ratios = []
+        for (field, threshold, floor) in checks:
+            (a, b) = (before[field], record[field])
+            if a is None or b is None:
+                ratios.append("-")
+                continue
+            ratio = b / float(a) if a else (1.0 if not b else float("inf"))
+            ratios.append("%.2f" % ratio)
+            if ratio > 1 + threshold and b > floor:
+                flags.append(field)
+        line = "%-24s n=%-8s time x%-6s peak x%-6s bytes x%-6s %s" % (
+            key[0], key[1], ratios[0], ratios[1], ratios[2], "REGRESSED: " + ", ".join(flags) if flags else "")
+        lines.append(line)
+        if flags:
+            regressions.append(line)
+    return (lines, regressions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="jp_svg_canvas benchmarks")
+    commands = parser.add_subparsers(dest="command")
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", help="JSON file for the results")
+    run_parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES),
+        help="comma separated element counts")
+    run_parser.add_argument("--workloads", help="comma separated subset of %s" % (sorted(WORKLOADS) + ["unify_shapes"]))
+    run_parser.add_argument("--backends", help="comma separated subset of %s" % sorted(BACKENDS))
+    run_parser.add_argument("--repeat", type=int, default=1, help="runs per case (the best time is kept)")
+    run_parser.add_argument("--no-memory", action="store_true", help="skip the traced memory run")
+    run_parser.add_argument("--budget", type=float, default=BUDGET,
+        help="skip larger sizes of a case after a run longer than this (seconds)")
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    compare_parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    compare_parser.add_argument("--bytes-threshold", type=float, default=BYTES_THRESHOLD)
+    args = parser.parse_args(argv)
+    split = lambda text: text.split(",") if text else None
+    if args.command == "run":
+        sizes = [int(float(n)) for n in args.sizes.split(",")]
+        results = run(sizes, split(args.workloads), split(args.backends), args.repeat,
+            not args.no_memory, args.budget)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=1)
+        return 0
+    if args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        (lines, regressions) = compare(old, new, args.time_threshold, args.memory_threshold,
+            args.bytes_threshold)
+        for line in lines:
+            print(line)
+        print("%s of %s cases regressed" % (len(regressions), len(lines)))
+        return 1 if regressions else 0
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Compare the message payload size and encoding time of the dict-per-element
+command format and the columnar batch format with binary buffers.
+
+Run from a shell (no notebook required):
+
+    python wire_format_comparison.py 100000
+"""
+
+from __future__ import print_function
+
+import json
+import sys
+import time
+import numpy as np
+from jp_svg_canvas import canvas
+
+
+def buffered_circles(n, columnar):
+    "Buffer commands for n circles on an unrendered widget and return the widget."
+    widget = canvas.SVGCanvasWidget()
+    cxs = np.random.uniform(0, 500, n)
+    cys = np.random.uniform(0, 500, n)
+    rs = np.random.uniform(1, 5, n)
+    names = ["c*%s" % (i + 1) for i in range(n)]
+    if columnar:
+        widget.add_elements(names, "circle", {"cx": cxs, "cy": cys, "r": rs}, {"fill": "black"})
+    else:
+        for i in range(n):
+            widget.circle(names[i], cxs[i], cys[i], rs[i])
+    return widget
+
+
+def encode(widget):
+    "Encode the buffered commands as they would be sent; return (json bytes, buffer bytes)."
+    (commands, buffers) = widget.encode_commands(widget.buffered_commands)
+    text = json.dumps([1, commands])
+    return (len(text), sum(memoryview(b).nbytes for b in buffers))
+
+
+def compare(n):
+    for columnar in (False, True):
+        start = time.time()
+        widget = buffered_circles(n, columnar)
+        (json_bytes, buffer_bytes) = encode(widget)
+        elapsed = time.time() - start
+        print("%-10s n=%-8s json=%-10s buffers=%-10s total=%-10s seconds=%.3f" % (
+            ("columnar" if columnar else "per-element"), n, json_bytes, buffer_bytes,
+            json_bytes + buffer_bytes, elapsed))
+
+
+if __name__ == "__main__":
+    n = 10000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    compare(n)
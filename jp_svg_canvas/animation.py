@@ -0,0 +1,147 @@
+"""
+Keyframe timelines for animating element attributes in the browser.
+
+A Timeline holds attribute tracks for named elements.  It is sent to the
+canvas once (SVGCanvasWidget.define_timeline) and canvas.js interpolates the
+attributes on each animation frame, so playing an animation does not
+need a round trip to the kernel per frame.
+
+    timeline = animation.Timeline()
+    timeline.track(names, "cx", [0, 1, 2], [0, 100, 0])
+    widget.define_timeline("bounce", timeline)
+    widget.play_timeline("bounce", callback=finished)
+"""
+
+import numpy as np
+from jp_svg_canvas import ids
+
+# Interpolation between keyframes (canvas.js implements the same functions).
+EASINGS = ("linear", "step", "ease-in-out")
+
+
+class Track(object):
+    "Keyframe values of one attribute for a list of named elements."
+
+    def __init__(self, names, att, times, values, easing):
+        self.names = names
+        self.att = att
+        self.times = times
+        # values[k, i] is the value for element i at times[k]
+        self.values = values
+        self.easing = easing
+
+    def values_at(self, t):
+        "Attribute values of the elements at time t (matching canvas.js apply_timeline)."
+        (times, values) = (self.times, self.values)
+        if len(times) == 1:
+            return values[0]
+        k = int(np.searchsorted(times, t, side="right")) - 1
+        k = min(max(k, 0), len(times) - 2)
+        f = (t - times[k]) / (times[k + 1] - times[k])
+        f = min(max(f, 0.0), 1.0)
+        if self.easing == "step":
+            return values[k + 1] if f >= 1 else values[k]
+        f = ease(self.easing, f)
+        return values[k] + (values[k + 1] - values[k]) * f
+
+
+class Timeline(object):
+    "Attribute tracks for named elements over time in seconds."
+
+    def __init__(self, loop=False):
+        self.loop = loop
+        self.tracks = []
+
+    @property
+    def duration(self):
+        "Time of the last keyframe."
+        if not self.tracks:
+            return 0.0
+        return max(float(track.times[-1]) for track in self.tracks)
+
+    def track(self, names, att, times, values, easing="linear"):
+        """
+        Animate attribute att of the named elements.
+
+        Parameters
+        ----------
+
+        names: sequence of str
+            The element names (or a range of integer identifiers).
+
+        att: str
+            The attribute name (for example "cx").
+
+        times: sequence of float
+            Increasing keyframe times in seconds.
+
+        values: sequence
+            One entry per keyframe: a value shared by all elements or a sequence
+            with one value per element.  Non numeric values (like colors) change
+            in steps.
+
+        easing: str
+            One of EASINGS.
+        """
+        assert easing in EASINGS, "unknown easing " + repr(easing)
+        if not ids.is_id_range(names):
+            names = list(names)
+        times = np.asarray(times, dtype=np.float64)
+        assert times.ndim == 1 and len(times) > 0, "times must be a non empty sequence"
+        assert np.all(np.diff(times) > 0), "keyframe times must increase"
+        values = np.asarray(values)
+        if values.ndim == 1:
+            values = np.repeat(values[:, None], len(names), axis=1)
+        if values.shape != (len(times), len(names)):
+            raise ValueError("values for %s must have shape %s" % (att, (len(times), len(names))))
+        if values.dtype.kind in "biuf":
+            values = values.astype(np.float64)
+        else:
+            easing = "step"
+        track = Track(names, att, times, values, easing)
+        self.tracks.append(track)
+        return track
+
+    def time(self, t):
+        "Time within the timeline for a playing time t (wrapped if the timeline loops)."
+        duration = self.duration
+        if self.loop and duration > 0:
+            return t % duration
+        return min(max(t, 0.0), duration)
+
+    def values_at(self, t):
+        "List of (names, att, values) with attribute values of each track at time t."
+        t = self.time(t)
+        return [(track.names, track.att, track.values_at(t)) for track in self.tracks]
+
+    def command(self, name):
+        "A define_timeline command for canvas.js with keyframe data in columns."
+        tracks = []
+        columns = {}
+        for (i, track) in enumerate(self.tracks):
+            (times, values) = ("t%s" % i, "v%s" % i)
+            columns[times] = track.times
+            # values are flattened by keyframe: values[k * count + element]
+            columns[values] = track.values.ravel()
+            tracks.append({
+                "names": ids.wire_names(track.names),
+                "att": track.att,
+                "easing": track.easing,
+                "times": times,
+                "values": values,
+            })
+        return {
+            "command": "define_timeline",
+            "name": name,
+            "loop": self.loop,
+            "duration": self.duration,
+            "tracks": tracks,
+            "columns": columns,
+        }
+
+
+def ease(easing, f):
+    "Eased fraction for a fraction f of the way between keyframes."
+    if easing == "ease-in-out":
+        return f * f * (3 - 2 * f)
+    return f
@@ -53,6 +53,11 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
             }
             info.name = target.ipy_name;
             var ept = SVGEventLocation(that, e);
+            if (that.renderer) {
+                // the event target is the html canvas: find the item under the pointer.
+                var item = that.renderer.hit(ept.x, ept.y);
+                info.name = item ? item.ipy_name : "";
+            }
             info.svgX = ept.x;
             info.svgY = ept.y;
             var message = {
@@ -68,7 +73,816 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
         return svgEventHandler;
     };
 
+    // typed array constructors for binary columns (see canvas.py COLUMN_DTYPES)
+    var TYPED_ARRAYS = {
+        "float32": Float32Array,
+        "float64": Float64Array,
+        "int16": Int16Array,
+        "int32": Int32Array
+    };
+
+    var decode_column = function(reference, buffers) {
+        // make a typed array view of a binary message buffer.
+        var Typed = TYPED_ARRAYS[reference.dtype];
+        var view = buffers[reference.buffer];
+        var offset = view.byteOffset;
+        var data = view.buffer;
+        if ((offset % Typed.BYTES_PER_ELEMENT) != 0) {
+            // typed arrays require aligned offsets: copy the bytes.
+            data = data.slice(offset, offset + view.byteLength);
+            offset = 0;
+        }
+        var column = new Typed(data, offset, view.byteLength / Typed.BYTES_PER_ELEMENT);
+        var divisor = reference.divisor;
+        if (divisor) {
+            // quantized values (see canvas.py quantize): dividing prints short decimals.
+            var values = new Float64Array(column.length);
+            for (var i=0; i<column.length; i++) {
+                values[i] = column[i] / divisor;
+            }
+            column = values;
+        }
+        return column;
+    };
+
+    var decode_names = function(names) {
+        // a range of integer identifiers arrives as {"start": s, "count": n} (see ids.py).
+        if (Array.isArray(names)) {
+            return names;
+        }
+        var identifiers = new Int32Array(names.count);
+        for (var i=0; i<names.count; i++) {
+            identifiers[i] = names.start + i;
+        }
+        return identifiers;
+    };
+
+    var remove_children = function(element) {
+        while (element.firstChild) {
+            element.removeChild(element.firstChild);
+        }
+    };
+
+    // HTML5 canvas rendering (render_mode "canvas").
+    // CanvasItem objects in a retained display list stand in for svg elements.  They
+    // implement the part of the DOM element interface used by the do_* commands, so
+    // both render modes share the command protocol.
+
+    // presentation attributes inherited from enclosing groups, with svg defaults.
+    var INHERITED_PAINT = {
+        "fill": "black",
+        "fill-opacity": 1,
+        "stroke": "none",
+        "stroke-opacity": 1,
+        "stroke-width": 1,
+        "stroke-dasharray": "none",
+        "stroke-linecap": "butt",
+        "stroke-linejoin": "miter",
+        "font-size": 16,
+        "font-family": "sans-serif",
+        "font-weight": "normal",
+        "font-style": "normal",
+        "text-anchor": "start",
+        "visibility": "visible"
+    };
+
+    // redraw everything if the dirty region covers more than this fraction of the view.
+    var FULL_REDRAW_FRACTION = 0.5;
+
+    var CAMEL_CASE = {};
+
+    var camel_case = function(name) {
+        var result = CAMEL_CASE[name];
+        if (result === undefined) {
+            result = CAMEL_CASE[name] = name.replace(/-([a-z])/g, function(match, letter) {
+                return letter.toUpperCase();
+            });
+        }
+        return result;
+    };
+
+    // paint name for attribute and (dashed or camel case) style names.
+    var PAINT_KEYS = {"opacity": "opacity"};
+    for (var paint_name in INHERITED_PAINT) {
+        PAINT_KEYS[paint_name] = paint_name;
+        PAINT_KEYS[camel_case(paint_name)] = paint_name;
+    }
+
+    var escape_markup = function(text) {
+        return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+    };
+
+    // affine matrices are [a, b, c, d, e, f] as in svg matrix(a b c d e f).
+    var IDENTITY = [1, 0, 0, 1, 0, 0];
+
+    var multiply = function(m, n) {
+        // the matrix which applies n then m.
+        return [
+            m[0] * n[0] + m[2] * n[1],
+            m[1] * n[0] + m[3] * n[1],
+            m[0] * n[2] + m[2] * n[3],
+            m[1] * n[2] + m[3] * n[3],
+            m[0] * n[4] + m[2] * n[5] + m[4],
+            m[1] * n[4] + m[3] * n[5] + m[5]
+        ];
+    };
+
+    var parse_numbers = function(text) {
+        var parts = String(text).trim().split(/[\s,]+/);
+        var numbers = [];
+        for (var i=0; i<parts.length; i++) {
+            if (parts[i] !== "") {
+                numbers.push(parseFloat(parts[i]));
+            }
+        }
+        return numbers;
+    };
+
+    var parse_transform = function(text) {
+        // matrix for an svg transform attribute value.
+        var matrix = IDENTITY;
+        var pattern = /(\w+)\s*\(([^)]*)\)/g;
+        var match;
+        while ((match = pattern.exec(text)) !== null) {
+            var kind = match[1];
+            var v = parse_numbers(match[2]);
+            var m = IDENTITY;
+            if (kind == "matrix" && v.length == 6) {
+                m = v;
+            } else if (kind == "translate") {
+                m = [1, 0, 0, 1, v[0] || 0, v[1] || 0];
+            } else if (kind == "scale") {
+                m = [v[0], 0, 0, (v.length > 1) ? v[1] : v[0], 0, 0];
+            } else if (kind == "rotate") {
+                var radians = v[0] * Math.PI / 180;
+                var cos = Math.cos(radians);
+                var sin = Math.sin(radians);
+                m = [cos, sin, -sin, cos, 0, 0];
+                if (v.length == 3) {
+                    m = multiply(multiply([1, 0, 0, 1, v[1], v[2]], m), [1, 0, 0, 1, -v[1], -v[2]]);
+                }
+            } else if (kind == "skewX") {
+                m = [1, 0, Math.tan(v[0] * Math.PI / 180), 1, 0, 0];
+            } else if (kind == "skewY") {
+                m = [1, Math.tan(v[0] * Math.PI / 180), 0, 1, 0, 0];
+            }
+            matrix = multiply(matrix, m);
+        }
+        return matrix;
+    };
+
+    var transform_box = function(m, box) {
+        // bounding box of a transformed box [x0, y0, x1, y1].
+        // the extremes of a linear function of x and y are at the corners.
+        var ax0 = m[0] * box[0];
+        var ax1 = m[0] * box[2];
+        var cy0 = m[2] * box[1];
+        var cy1 = m[2] * box[3];
+        var bx0 = m[1] * box[0];
+        var bx1 = m[1] * box[2];
+        var dy0 = m[3] * box[1];
+        var dy1 = m[3] * box[3];
+        return [
+            Math.min(ax0, ax1) + Math.min(cy0, cy1) + m[4],
+            Math.min(bx0, bx1) + Math.min(dy0, dy1) + m[5],
+            Math.max(ax0, ax1) + Math.max(cy0, cy1) + m[4],
+            Math.max(bx0, bx1) + Math.max(dy0, dy1) + m[5]
+        ];
+    };
+
+    var union_box = function(a, b) {
+        if (!a) {
+            return b;
+        }
+        if (!b) {
+            return a;
+        }
+        return [Math.min(a[0], b[0]), Math.min(a[1], b[1]), Math.max(a[2], b[2]), Math.max(a[3], b[3])];
+    };
+
+    var intersects = function(a, b) {
+        return (a[0] <= b[2]) && (b[0] <= a[2]) && (a[1] <= b[3]) && (b[1] <= a[3]);
+    };
+
+    var CanvasItem = function(renderer, tag) {
+        this.renderer = renderer;
+        this.tagName = tag;
+        this.atts = {};
+        this.style = {};
+        this.text = null;
+        this.children = [];
+        // number of removed children not yet dropped from children.
+        this.removed_children = 0;
+        this.parentNode = null;
+        this.removed = false;
+        // cached Path2D and local bounding box (cleared when the item changes).
+        this.path = null;
+        this.local_box = null;
+        this.measured = false;
+        // canvas user space bounding box when the item was last drawn.
+        this.box = null;
+        // the box is valid for this paint and matrix (see CanvasRenderer.item_box).
+        this.box_paint = null;
+        this.box_matrix = null;
+        // paint and matrix cached for the parent paint and matrix.
+        this.paint_parent = null;
+        this.paint_cache = null;
+        this.matrix_parent = null;
+        this.matrix_cache = null;
+        this.touched = false;
+    };
+
+    CanvasItem.prototype = {
+        setAttribute: function(name, value) {
+            this.atts[name] = value;
+            this.changed();
+        },
+
+        getAttribute: function(name) {
+            var value = this.atts[name];
+            return (value === undefined) ? null : String(value);
+        },
+
+        changed: function() {
+            this.path = null;
+            this.local_box = null;
+            this.measured = false;
+            this.box_paint = null;
+            this.paint_parent = null;
+            this.matrix_parent = null;
+            this.renderer.touch(this);
+        },
+
+        appendChild: function(child) {
+            if (child.nodeType == 3) {
+                // a text node: the item text.
+                this.text = child.nodeValue;
+                this.changed();
+                return child;
+            }
+            if (child.is_fragment) {
+                var children = child.children;
+                child.children = [];
+                for (var i=0; i<children.length; i++) {
+                    this.appendChild(children[i]);
+                }
+                return child;
+            }
+            child.parentNode = this;
+            child.removed = false;
+            this.children.push(child);
+            this.renderer.touch(child);
+            return child;
+        },
+
+        removeChild: function(child) {
+            if (child.parentNode === this && !child.removed) {
+                this.renderer.forget(child);
+                child.parentNode = null;
+                child.removed = true;
+                this.removed_children++;
+                if (this.removed_children * 2 > this.children.length) {
+                    this.children = this.children.filter(function(item) { return !item.removed; });
+                    this.removed_children = 0;
+                }
+            }
+            return child;
+        },
+
+        clear: function() {
+            this.children = [];
+            this.removed_children = 0;
+        },
+
+        live_children: function() {
+            var children = this.children;
+            if (this.removed_children) {
+                children = children.filter(function(item) { return !item.removed; });
+            }
+            return children;
+        },
+
+        getElementsByTagName: function(tag) {
+            var result = [];
+            var children = this.live_children();
+            for (var i=0; i<children.length; i++) {
+                var child = children[i];
+                if (tag == "*" || tag == child.tagName) {
+                    result.push(child);
+                }
+                result.push.apply(result, child.getElementsByTagName(tag));
+            }
+            return result;
+        },
+
+        own: function(name) {
+            // the value set on this item for a presentation attribute (style first) or undefined.
+            var value = this.style[name];
+            if (value === undefined || value === "") {
+                value = this.style[camel_case(name)];
+            }
+            if (value === undefined || value === "") {
+                value = this.atts[name];
+            }
+            return (value === "") ? undefined : value;
+        },
+
+        paint: function(inherited) {
+            // presentation attributes of this item given the attributes of its parent.
+            if (this.paint_parent === inherited) {
+                return this.paint_cache;
+            }
+            var paint = inherited;
+            var sources = [this.atts, this.style];
+            for (var i=0; i<2; i++) {
+                // style is applied after attributes so it takes precedence.
+                var source = sources[i];
+                for (var key in source) {
+                    var name = PAINT_KEYS[key];
+                    var value = source[key];
+                    if (name === undefined || value === undefined || value === null || value === "" ||
+                            value === "inherit") {
+                        continue;
+                    }
+                    if (paint === inherited) {
+                        paint = $.extend({}, inherited);
+                    }
+                    if (name == "opacity") {
+                        paint.opacity = inherited.opacity * parseFloat(value);
+                    } else {
+                        paint[name] = value;
+                    }
+                }
+            }
+            this.paint_parent = inherited;
+            this.paint_cache = paint;
+            return paint;
+        },
+
+        matrix: function(parent_matrix) {
+            var transform = this.atts.transform;
+            if (!transform) {
+                return parent_matrix;
+            }
+            if (this.matrix_parent !== parent_matrix) {
+                this.matrix_parent = parent_matrix;
+                this.matrix_cache = multiply(parent_matrix, parse_transform(transform));
+            }
+            return this.matrix_cache;
+        },
+
+        number: function(name) {
+            var value = parseFloat(this.atts[name]);
+            return isNaN(value) ? 0 : value;
+        },
+
+        geometry: function(context, paint) {
+            // Path2D and local bounding box of the item (null for groups and unknown tags).
+            if (!this.measured) {
+                var path = new Path2D();
+                var box = null;
+                var tag = this.tagName;
+                if (tag == "circle" || tag == "ellipse") {
+                    var cx = this.number("cx");
+                    var cy = this.number("cy");
+                    var rx = (tag == "circle") ? this.number("r") : this.number("rx");
+                    var ry = (tag == "circle") ? rx : this.number("ry");
+                    path.ellipse(cx, cy, Math.abs(rx), Math.abs(ry), 0, 0, 2 * Math.PI);
+                    box = [cx - rx, cy - ry, cx + rx, cy + ry];
+                } else if (tag == "rect") {
+                    var x = this.number("x");
+                    var y = this.number("y");
+                    var width = this.number("width");
+                    var height = this.number("height");
+                    path.rect(x, y, width, height);
+                    box = [x, y, x + width, y + height];
+                } else if (tag == "line") {
+                    var x1 = this.number("x1");
+                    var y1 = this.number("y1");
+                    var x2 = this.number("x2");
+                    var y2 = this.number("y2");
+                    path.moveTo(x1, y1);
+                    path.lineTo(x2, y2);
+                    box = [Math.min(x1, x2), Math.min(y1, y2), Math.max(x1, x2), Math.max(y1, y2)];
+                } else if (tag == "polyline" || tag == "polygon") {
+                    var points = parse_numbers(this.atts.points || "");
+                    box = [Infinity, Infinity, -Infinity, -Infinity];
+                    for (var i=0; i+1<points.length; i+=2) {
+                        var px = points[i];
+                        var py = points[i+1];
+                        if (i == 0) {
+                            path.moveTo(px, py);
+                        } else {
+                            path.lineTo(px, py);
+                        }
+                        box = [Math.min(box[0], px), Math.min(box[1], py), Math.max(box[2], px), Math.max(box[3], py)];
+                    }
+                    if (tag == "polygon") {
+                        path.closePath();
+                    }
+                    if (points.length < 2) {
+                        box = null;
+                    }
+                } else if (tag == "path") {
+                    path = new Path2D(this.atts.d || "");
+                    // path data is not measured: always redraw it.
+                    box = [-Infinity, -Infinity, Infinity, Infinity];
+                } else if (tag == "text") {
+                    path = null;
+                    if (this.text) {
+                        context.font = font(paint);
+                        var tx = this.number("x");
+                        var ty = this.number("y");
+                        var size = parseFloat(paint["font-size"]);
+                        var text_width = context.measureText(this.text).width;
+                        var anchor = paint["text-anchor"];
+                        var left = tx - ((anchor == "middle") ? text_width / 2 : ((anchor == "end") ? text_width : 0));
+                        box = [left, ty - size, left + text_width, ty + size * 0.3];
+                    }
+                } else {
+                    path = null;
+                }
+                this.path = path;
+                this.local_box = box;
+                this.measured = true;
+            }
+            return this.path;
+        },
+
+        markup: function() {
+            var parts = [this.tagName];
+            for (var att in this.atts) {
+                parts.push(att + '="' + escape_markup(this.atts[att]) + '"');
+            }
+            var style = [];
+            for (var name in this.style) {
+                var value = this.style[name];
+                if (value !== undefined && value !== null && value !== "") {
+                    style.push(name + ": " + value + ";");
+                }
+            }
+            if (style.length) {
+                parts.push('style="' + escape_markup(style.join(" ")) + '"');
+            }
+            return "<" + parts.join(" ") + ">" + this.content_markup() + "</" + this.tagName + ">";
+        },
+
+        content_markup: function() {
+            var content = this.text ? escape_markup(this.text) : "";
+            var children = this.live_children();
+            for (var i=0; i<children.length; i++) {
+                content += children[i].markup();
+            }
+            return content;
+        }
+    };
+
+    Object.defineProperty(CanvasItem.prototype, "firstElementChild", {
+        get: function() {
+            var children = this.live_children();
+            return children.length ? children[0] : null;
+        }
+    });
+
+    Object.defineProperty(CanvasItem.prototype, "innerHTML", {
+        get: function() {
+            return this.content_markup();
+        }
+    });
+
+    var font = function(paint) {
+        return paint["font-style"] + " " + paint["font-weight"] + " " + parseFloat(paint["font-size"]) + "px " +
+            paint["font-family"];
+    };
+
+    var CanvasFragment = function() {
+        // collects items like a DocumentFragment until it is appended.
+        this.is_fragment = true;
+        this.children = [];
+    };
+
+    CanvasFragment.prototype.appendChild = function(child) {
+        this.children.push(child);
+        return child;
+    };
+
+    var CanvasRenderer = function(view, canvas) {
+        this.view = view;
+        this.canvas = canvas;
+        this.context = canvas.getContext("2d");
+        this.root = new CanvasItem(this, "svg");
+        // user space region to redraw at the next frame ([x0, y0, x1, y1], true for all or null).
+        this.dirty = null;
+        this.touched_items = [];
+        this.frame_requested = false;
+        this.view_matrix = IDENTITY;
+        this.view_box = [0, 0, 1, 1];
+        // inherited paint of top level items (one object, so items can cache their paint).
+        this.root_paint = $.extend({"opacity": 1}, INHERITED_PAINT);
+        this.redraws = 0;
+        this.partial_redraws = 0;
+    };
+
+    CanvasRenderer.prototype = {
+        resize: function(width, height, view_box) {
+            // set the display size (css pixels) and viewBox [x, y, width, height].
+            var ratio = window.devicePixelRatio || 1;
+            var canvas = this.canvas;
+            canvas.style.width = width + "px";
+            canvas.style.height = height + "px";
+            canvas.width = Math.max(1, Math.round(width * ratio));
+            canvas.height = Math.max(1, Math.round(height * ratio));
+            this.set_view_box(view_box);
+        },
+
+        set_view_box: function(view_box) {
+            var sx = this.canvas.width / view_box[2];
+            var sy = this.canvas.height / view_box[3];
+            this.view_box = view_box;
+            this.view_matrix = [sx, 0, 0, sy, -view_box[0] * sx, -view_box[1] * sy];
+            this.invalidate(true);
+        },
+
+        user_point: function(client_x, client_y) {
+            // canvas user space point for client (window) coordinates.
+            var rect = this.canvas.getBoundingClientRect();
+            var box = this.view_box;
+            return {
+                "x": box[0] + (client_x - rect.left) * box[2] / rect.width,
+                "y": box[1] + (client_y - rect.top) * box[3] / rect.height
+            };
+        },
+
+        invalidate: function(box) {
+            // redraw box (or everything if box is true) at the next animation frame.
+            if (box === true || this.dirty === true) {
+                this.dirty = true;
+            } else if (box) {
+                this.dirty = union_box(this.dirty, box);
+            }
+            this.request_frame();
+        },
+
+        touch: function(item) {
+            // the item changed: redraw where it was and (at the frame) where it is.
+            if (item.children.length) {
+                // a group change can move any descendant.
+                this.invalidate(true);
+                return;
+            }
+            this.invalidate(item.box);
+            if (!item.touched) {
+                item.touched = true;
+                this.touched_items.push(item);
+            }
+        },
+
+        forget: function(item) {
+            // the item is removed: redraw where it was.
+            this.invalidate(item.children.length ? true : item.box);
+        },
+
+        request_frame: function() {
+            var that = this;
+            if (!that.frame_requested) {
+                that.frame_requested = true;
+                requestAnimationFrame(function() {
+                    that.frame_requested = false;
+                    that.frame();
+                });
+            }
+        },
+
+        attached: function(item) {
+            // item paint and matrix if the item is in the drawing (else null).
+            var chain = [];
+            while (item && item !== this.root) {
+                if (item.removed || !item.parentNode) {
+                    return null;
+                }
+                chain.push(item);
+                item = item.parentNode;
+            }
+            if (!item) {
+                return null;
+            }
+            var paint = this.root_paint;
+            var matrix = IDENTITY;
+            for (var i=chain.length-1; i>=0; i--) {
+                paint = chain[i].paint(paint);
+                matrix = chain[i].matrix(matrix);
+            }
+            return {"paint": paint, "matrix": matrix};
+        },
+
+        item_box: function(item, paint, matrix) {
+            // user space bounding box of a drawn item including half the stroke width.
+            if (item.box_paint === paint && item.box_matrix === matrix) {
+                return item.box;
+            }
+            item.box_paint = paint;
+            item.box_matrix = matrix;
+            item.geometry(this.context, paint);
+            var box = item.local_box;
+            if (!box) {
+                return item.box = null;
+            }
+            if (paint.stroke != "none") {
+                var half = parseFloat(paint["stroke-width"]) / 2;
+                box = [box[0] - half, box[1] - half, box[2] + half, box[3] + half];
+            }
+            return item.box = transform_box(matrix, box);
+        },
+
+        frame: function() {
+            var touched = this.touched_items;
+            this.touched_items = [];
+            for (var i=0; i<touched.length; i++) {
+                var item = touched[i];
+                item.touched = false;
+                if (this.dirty === true) {
+                    continue;
+                }
+                var state = this.attached(item);
+                if (state) {
+                    item.box = this.item_box(item, state.paint, state.matrix);
+                    this.invalidate(item.box);
+                }
+            }
+            var dirty = this.dirty;
+            this.dirty = null;
+            if (dirty) {
+                this.redraw(dirty);
+            }
+        },
+
+        redraw: function(dirty) {
+            var context = this.context;
+            var canvas = this.canvas;
+            var clip = null;
+            context.setTransform(1, 0, 0, 1, 0, 0);
+            if (dirty !== true) {
+                var device = transform_box(this.view_matrix, dirty);
+                var x0 = Math.max(0, Math.floor(device[0]) - 1);
+                var y0 = Math.max(0, Math.floor(device[1]) - 1);
+                var x1 = Math.min(canvas.width, Math.ceil(device[2]) + 1);
+                var y1 = Math.min(canvas.height, Math.ceil(device[3]) + 1);
+                if (x1 <= x0 || y1 <= y0) {
+                    return;
+                }
+                if ((x1 - x0) * (y1 - y0) < FULL_REDRAW_FRACTION * canvas.width * canvas.height) {
+                    clip = dirty;
+                    context.save();
+                    context.beginPath();
+                    context.rect(x0, y0, x1 - x0, y1 - y0);
+                    context.clip();
+                    context.clearRect(x0, y0, x1 - x0, y1 - y0);
+                    this.partial_redraws++;
+                }
+            }
+            if (clip === null) {
+                context.clearRect(0, 0, canvas.width, canvas.height);
+                this.redraws++;
+            }
+            this.draw_children(this.root, this.root_paint, IDENTITY, clip);
+            if (clip !== null) {
+                context.restore();
+            }
+        },
+
+        draw_children: function(item, paint, matrix, clip) {
+            var children = item.children;
+            for (var i=0; i<children.length; i++) {
+                var child = children[i];
+                if (!child.removed) {
+                    this.draw_item(child, paint, matrix, clip);
+                }
+            }
+        },
+
+        draw_item: function(item, inherited, parent_matrix, clip) {
+            if (item.own("display") == "none") {
+                item.box = null;
+                return;
+            }
+            var paint = item.paint(inherited);
+            var matrix = item.matrix(parent_matrix);
+            if (item.children.length) {
+                this.draw_children(item, paint, matrix, clip);
+            }
+            var path = item.geometry(this.context, paint);
+            var box = item.box = this.item_box(item, paint, matrix);
+            if (!box || (clip && !intersects(box, clip)) || paint.visibility == "hidden") {
+                return;
+            }
+            var context = this.context;
+            var m = multiply(this.view_matrix, matrix);
+            context.setTransform(m[0], m[1], m[2], m[3], m[4], m[5]);
+            if (item.tagName == "text") {
+                context.globalAlpha = paint.opacity * parseFloat(paint["fill-opacity"]);
+                context.fillStyle = paint.fill;
+                context.font = font(paint);
+                var anchor = paint["text-anchor"];
+                context.textAlign = (anchor == "middle") ? "center" : ((anchor == "end") ? "end" : "start");
+                context.fillText(item.text, item.number("x"), item.number("y"));
+                return;
+            }
+            if (paint.fill != "none" && item.tagName != "line") {
+                context.globalAlpha = paint.opacity * parseFloat(paint["fill-opacity"]);
+                context.fillStyle = paint.fill;
+                context.fill(path);
+            }
+            if (paint.stroke != "none") {
+                context.globalAlpha = paint.opacity * parseFloat(paint["stroke-opacity"]);
+                context.strokeStyle = paint.stroke;
+                context.lineWidth = parseFloat(paint["stroke-width"]);
+                context.lineCap = paint["stroke-linecap"];
+                context.lineJoin = paint["stroke-linejoin"];
+                var dashes = paint["stroke-dasharray"];
+                context.setLineDash((dashes == "none") ? [] : parse_numbers(dashes));
+                context.stroke(path);
+            }
+        },
+
+        hit: function(x, y) {
+            // the topmost drawn item containing the user space point (x, y), or null.
+            return this.hit_children(this.root, this.root_paint, IDENTITY, x, y);
+        },
+
+        hit_children: function(item, paint, matrix, x, y) {
+            var children = item.children;
+            for (var i=children.length-1; i>=0; i--) {
+                var child = children[i];
+                var box = child.box;
+                if (child.removed || (!child.children.length && (!box || x < box[0] || x > box[2] ||
+                        y < box[1] || y > box[3])) || child.own("display") == "none") {
+                    continue;
+                }
+                var child_paint = child.paint(paint);
+                var child_matrix = child.matrix(matrix);
+                var found = null;
+                if (child.children.length) {
+                    found = this.hit_children(child, child_paint, child_matrix, x, y);
+                }
+                if (!found && this.hit_item(child, child_paint, child_matrix, x, y)) {
+                    found = child;
+                }
+                if (found) {
+                    return found;
+                }
+            }
+            return null;
+        },
+
+        hit_item: function(item, paint, matrix, x, y) {
+            var box = item.box;
+            if (!box || x < box[0] || x > box[2] || y < box[1] || y > box[3] || paint.visibility == "hidden") {
+                return false;
+            }
+            var path = item.path;
+            if (!path) {
+                // text is hit anywhere in its box.
+                return item.tagName == "text";
+            }
+            var context = this.context;
+            var m = multiply(this.view_matrix, matrix);
+            var v = this.view_matrix;
+            var dx = v[0] * x + v[4];
+            var dy = v[3] * y + v[5];
+            context.setTransform(m[0], m[1], m[2], m[3], m[4], m[5]);
+            var hit = false;
+            if (paint.fill != "none" && item.tagName != "line") {
+                hit = context.isPointInPath(path, dx, dy);
+            }
+            if (!hit && paint.stroke != "none") {
+                context.lineWidth = parseFloat(paint["stroke-width"]);
+                hit = context.isPointInStroke(path, dx, dy);
+            }
+            context.setTransform(1, 0, 0, 1, 0, 0);
+            return hit;
+        },
+
+        getBBox: function() {
+            // user space bounding box of the drawing like svg getBBox.
+            var box = null;
+            var items = this.root.getElementsByTagName("*");
+            for (var i=0; i<items.length; i++) {
+                var state = this.attached(items[i]);
+                if (state && !items[i].children.length) {
+                    box = union_box(box, this.item_box(items[i], state.paint, state.matrix));
+                }
+            }
+            if (!box || !isFinite(box[0]) || !isFinite(box[2])) {
+                return {"x": 0, "y": 0, "width": 0, "height": 0};
+            }
+            return {"x": box[0], "y": box[1], "width": box[2] - box[0], "height": box[3] - box[1]};
+        }
+    };
+
     var SVGEventLocation = function(that, e) {
+        if (that.renderer) {
+            return that.renderer.user_point(e.clientX, e.clientY);
+        }
         // http://stackoverflow.com/questions/10298658/mouse-position-inside-autoscaled-svg
         var pt = that.reference_point;
         var svg = that.$svg[0];
@@ -82,14 +896,28 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
         render: function() {
             debugger;
             var that = this;
-            var svg = that.svg_elt("svg");
             var eventHandler = svgEventHandlerFactory(that);
             that.eventHandler = eventHandler;
             that.named_elements = {};
-            svg.ipy_name = "";
-            that.$svg = $(svg);
-            that.reference_point = svg.createSVGPoint();
-            svg.setAttribute("preserveAspectRatio", "none");
+            // elements with integer identifiers, indexed by identifier.
+            that.id_elements = [];
+            that.timelines = {};
+            that.frame_requested = false;
+            that.renderer = null;
+            if (that.model.get("render_mode") == "canvas") {
+                // draw into an html canvas from a display list (see CanvasRenderer).
+                var canvas = document.createElement("canvas");
+                that.renderer = new CanvasRenderer(that, canvas);
+                that.root = that.renderer.root;
+                that.$svg = $(canvas);
+            } else {
+                var svg = that.svg_elt("svg");
+                svg.setAttribute("preserveAspectRatio", "none");
+                that.reference_point = svg.createSVGPoint();
+                that.root = svg;
+                that.$svg = $(svg);
+            }
+            that.root.ipy_name = "";
             that.$el.append(that.$svg);
             that.svg_parameters_changed();
             //that.commands_changed();
@@ -104,6 +932,9 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
             that.model.on("change:svg_style", that.svg_parameters_changed, that);
             that.model.on("change:watch_event", that.start_watch_event, that);
             that.model.on("change:unwatch_event", that.stop_watch_event, that);
+            that.view_sync_timer = null;
+            that.pan_zoom_changed();
+            that.model.on("change:pan_zoom", that.pan_zoom_changed, that);
             that.model.set("rendered", true);
             that.touch();
         },
@@ -118,6 +949,90 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
             }
         },
         
+        pan_zoom_changed: function() {
+            // drag to pan and turn the mouse wheel to zoom by changing the viewBox locally.
+            var that = this;
+            var namespace = ".pan_zoom_" + that.cid;
+            that.$svg.off(namespace);
+            $(window).off(namespace);
+            if (!that.model.get("pan_zoom")) {
+                return;
+            }
+            var drag = null;
+            that.$svg.on("wheel" + namespace, function(e) {
+                var event = e.originalEvent;
+                event.preventDefault();
+                // deltaMode 0 is pixels, otherwise lines or pages.
+                var delta = event.deltaY * ((event.deltaMode == 0) ? 1 : 40);
+                var factor = Math.pow(1.002, delta);
+                var point = SVGEventLocation(that, event);
+                var box = that.view_box();
+                that.set_view_box([
+                    point.x - (point.x - box[0]) * factor,
+                    point.y - (point.y - box[1]) * factor,
+                    box[2] * factor,
+                    box[3] * factor
+                ]);
+            });
+            that.$svg.on("mousedown" + namespace, function(e) {
+                if (e.button == 0) {
+                    e.preventDefault();
+                    drag = {"x": e.clientX, "y": e.clientY, "box": that.view_box()};
+                }
+            });
+            $(window).on("mousemove" + namespace, function(e) {
+                if (drag) {
+                    var rect = that.$svg[0].getBoundingClientRect();
+                    var box = drag.box;
+                    that.set_view_box([
+                        box[0] - (e.clientX - drag.x) * box[2] / rect.width,
+                        box[1] - (e.clientY - drag.y) * box[3] / rect.height,
+                        box[2],
+                        box[3]
+                    ]);
+                }
+            });
+            $(window).on("mouseup" + namespace, function(e) {
+                if (drag) {
+                    drag = null;
+                    that.sync_view_box();
+                }
+            });
+        },
+
+        view_box: function() {
+            var text = this.$svg[0].getAttribute("viewBox");
+            return text.trim().split(/[\s,]+/).map(parseFloat);
+        },
+
+        set_view_box: function(box) {
+            // change the view without a kernel round trip and sync the viewBox trait later.
+            var that = this;
+            that.$svg[0].setAttribute("viewBox", box.join(" "));
+            if (that.renderer) {
+                that.renderer.set_view_box(box);
+            }
+            if (that.view_sync_timer === null) {
+                that.view_sync_timer = setTimeout(function() {
+                    that.view_sync_timer = null;
+                    that.sync_view_box();
+                }, that.model.get("view_sync_interval"));
+            }
+        },
+
+        sync_view_box: function() {
+            var that = this;
+            if (that.view_sync_timer !== null) {
+                clearTimeout(that.view_sync_timer);
+                that.view_sync_timer = null;
+            }
+            var text = that.$svg[0].getAttribute("viewBox");
+            if (text != that.model.get("viewBox")) {
+                that.model.set("viewBox", text);
+                that.touch();
+            }
+        },
+
         stop_watch_event: function() {
             var that = this;
             var event_types = that.model.get("unwatch_event");
@@ -130,31 +1045,36 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
         
         handle_custom_message: function(commands_pair, buffers, widget) {
             var that = this;
+            var counter = null;
             try {
                 var svg = that.$svg[0];
                 //var commands_pair = that.get_JSON("commands")
-                // ignore the counter
                 var commands = [];
                 if (commands_pair.length > 0) {
+                    counter = commands_pair[0];
                     commands = commands_pair[1];
                 }
                 for (var i=0; i<commands.length; i++) {
                     var command_dict = commands[i];
                     var indicator = command_dict["command"];
+                    if (command_dict.columns) {
+                        that.decode_columns(command_dict.columns, buffers);
+                    }
                     var method = that["do_"+indicator];
                     method(that, command_dict);
                 }
             }
             finally {
-                that.model.set("command_pending", false);
-                that.touch();
+                // acknowledge the batch immediately (not buffered like events).
+                if (counter !== null) {
+                    that.model.send({"indicator": "ack", "payload": counter});
+                }
             }
         },
 
         do_fit: function(that, info) {
             // fit viewport to bounding box.
-            var svg = that.$svg[0];
-            var bbox = svg.getBBox();
+            var bbox = that.renderer ? that.renderer.getBBox() : that.root.getBBox();
             var D = {"width": bbox.width, "height": bbox.height, "x": bbox.x, "y": bbox.y}
             var vbox = "" + D.x + " " + D.y + " " + D.width + " " + D.height;
             if ((D.width > 0) && (D.height > 0)) {
@@ -169,7 +1089,7 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
 
         do_get_SVG_text(that, info) {
             // deliver the SVG text to the python kernel
-            var text = that.$svg[0].innerHTML;
+            var text = that.root.innerHTML;
             var message = {
                 "indicator": "SVG_text",
                 "payload": text
@@ -180,39 +1100,329 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
         do_add_element: function (that, info) {
             var tag = info.tag;
             var name = info.name;
-            var element = that.svg_elt(tag);
+            var element = that.new_element(tag);
             element.ipy_name = name;
-            var $element = $(element);
-            that.update_element($element, info);
+            that.update_element(element, info);
             // add event callbacks
-            that.$svg.append($element);
-            that.named_elements[name] = $element;
+            that.parent_element(info.parent).appendChild(element);
+            that.register_element(name, element);
+        },
+
+        parent_element: function(parent) {
+            // the named group element to add children to (default the svg element).
+            if (parent !== undefined && parent !== null) {
+                var group = this.lookup_element(parent);
+                if (group) {
+                    return group;
+                }
+                console.warn("couldn't find parent element "+parent);
+            }
+            return this.root;
+        },
+
+        new_element: function(tag) {
+            // an svg element, or a display list item in canvas render mode.
+            if (this.renderer) {
+                return new CanvasItem(this.renderer, tag);
+            }
+            return this.svg_elt(tag);
+        },
+
+        register_element: function(name, element) {
+            var previous = this.lookup_element(name);
+            if (previous && previous !== element) {
+                // a new element replaces the element with its name (as in scene.py SceneModel).
+                this.do_delete(this, {"names": [name]});
+            }
+            if (typeof name === "number") {
+                this.id_elements[name] = element;
+            } else {
+                this.named_elements[name] = element;
+            }
+        },
+
+        lookup_element: function(name) {
+            var element = (typeof name === "number") ? this.id_elements[name] : this.named_elements[name];
+            return element || null;
+        },
+
+        unregister_element: function(name) {
+            if (typeof name === "number") {
+                // the slot is only cleared: which identifiers are reused is decided
+                // on the Python side (ids.IdAllocator), never here.
+                this.id_elements[name] = undefined;
+            } else {
+                delete this.named_elements[name];
+            }
+        },
+        
+        decode_columns: function(columns, buffers) {
+            for (var att in columns) {
+                var column = columns[att];
+                if (column && (column.buffer !== undefined) && !Array.isArray(column)) {
+                    columns[att] = decode_column(column, buffers);
+                }
+            }
+        },
+
+        do_add_elements: function (that, info) {
+            // add a batch of elements from shared attributes and per-element columns.
+            var tag = info.tag;
+            var names = decode_names(info.names);
+            var columns = info.columns;
+            var texts = info.texts;
+            var shared = {"atts": info.atts, "style": info.style, "text": null};
+            if (!Array.isArray(texts)) {
+                shared.text = texts;
+            }
+            var column_names = Object.keys(columns);
+            var ncolumns = column_names.length;
+            var fragment = that.renderer ? new CanvasFragment() : document.createDocumentFragment();
+            for (var i=0; i<names.length; i++) {
+                var name = names[i];
+                var element = that.new_element(tag);
+                element.ipy_name = name;
+                that.update_element(element, shared);
+                for (var j=0; j<ncolumns; j++) {
+                    var att = column_names[j];
+                    element.setAttribute(att, columns[att][i]);
+                }
+                if (Array.isArray(texts) && texts[i]) {
+                    element.appendChild(document.createTextNode(texts[i]));
+                }
+                fragment.appendChild(element);
+                that.register_element(name, element);
+            }
+            that.parent_element(info.parent).appendChild(fragment);
         },
         
         do_change_element: function (that, info) {
             var name = info.name;
-            var $element = that.named_elements[name];
-            if ($element) {
-                that.update_element($element, info);
+            var element = that.lookup_element(name);
+            if (element) {
+                that.update_element(element, info);
             } else {
                 console.warn("couldn't find element for "+name);
             }
         },
         
+        do_change_elements: function (that, info) {
+            // change a batch of named elements from shared attributes and per-element columns.
+            var names = decode_names(info.names);
+            var columns = info.columns;
+            var texts = info.texts;
+            var shared = {"atts": info.atts, "style": info.style, "text": null};
+            if (!Array.isArray(texts)) {
+                shared.text = texts;
+            }
+            var column_names = Object.keys(columns);
+            var ncolumns = column_names.length;
+            for (var i=0; i<names.length; i++) {
+                var name = names[i];
+                var element = that.lookup_element(name);
+                if (!element) {
+                    console.warn("couldn't find element for "+name);
+                    continue;
+                }
+                that.update_element(element, shared);
+                for (var j=0; j<ncolumns; j++) {
+                    var att = column_names[j];
+                    element.setAttribute(att, columns[att][i]);
+                }
+                if (Array.isArray(texts) && texts[i]) {
+                    remove_children(element);
+                    element.appendChild(document.createTextNode(texts[i]));
+                }
+            }
+        },
+
+        do_define_timeline: function (that, info) {
+            // keyframe tracks interpolated on animation frames (see animation.py).
+            var tracks = [];
+            for (var i=0; i<info.tracks.length; i++) {
+                var track = info.tracks[i];
+                tracks.push({
+                    "names": decode_names(track.names),
+                    "att": track.att,
+                    "easing": track.easing,
+                    "times": info.columns[track.times],
+                    "values": info.columns[track.values],
+                    "elements": null
+                });
+            }
+            that.timelines[info.name] = {
+                "name": info.name,
+                "duration": info.duration,
+                "loop": info.loop,
+                "tracks": tracks,
+                "time": 0,
+                "speed": 1,
+                "running": false,
+                "origin": null
+            };
+        },
+
+        do_play_timeline: function (that, info) {
+            var timeline = that.timelines[info.name];
+            if (!timeline) {
+                console.warn("no timeline named "+info.name);
+                return;
+            }
+            if ((info.time !== null) && (info.time !== undefined)) {
+                timeline.time = info.time;
+            }
+            timeline.speed = info.speed;
+            timeline.running = true;
+            timeline.origin = null;
+            that.request_animation_frame();
+        },
+
+        do_pause_timeline: function (that, info) {
+            var timeline = that.timelines[info.name];
+            if (timeline) {
+                timeline.running = false;
+            }
+        },
+
+        do_seek_timeline: function (that, info) {
+            var timeline = that.timelines[info.name];
+            if (timeline) {
+                timeline.time = info.time;
+                timeline.origin = null;
+                that.apply_timeline(timeline);
+            }
+        },
+
+        do_delete_timeline: function (that, info) {
+            delete that.timelines[info.name];
+        },
+
+        request_animation_frame: function () {
+            var that = this;
+            if (!that.frame_requested) {
+                that.frame_requested = true;
+                requestAnimationFrame(function (now) {
+                    that.animation_frame(now);
+                });
+            }
+        },
+
+        animation_frame: function (now) {
+            var that = this;
+            that.frame_requested = false;
+            var running = false;
+            for (var name in that.timelines) {
+                var timeline = that.timelines[name];
+                if (!timeline.running) {
+                    continue;
+                }
+                if (timeline.origin === null) {
+                    timeline.origin = now - timeline.time * 1000 / timeline.speed;
+                }
+                var t = (now - timeline.origin) * timeline.speed / 1000;
+                var done = false;
+                if (t >= timeline.duration) {
+                    if (timeline.loop && (timeline.duration > 0)) {
+                        t = t % timeline.duration;
+                    } else {
+                        t = timeline.duration;
+                        done = true;
+                    }
+                }
+                timeline.time = t;
+                that.apply_timeline(timeline);
+                if (done) {
+                    timeline.running = false;
+                    that.model.send({"indicator": "timeline_done", "payload": {"name": name, "time": t}});
+                } else {
+                    running = true;
+                }
+            }
+            if (running) {
+                that.request_animation_frame();
+            }
+        },
+
+        apply_timeline: function (timeline) {
+            // set animated attributes to their values at timeline.time (see animation.Track.values_at)
+            var that = this;
+            var t = timeline.time;
+            for (var j=0; j<timeline.tracks.length; j++) {
+                var track = timeline.tracks[j];
+                var names = track.names;
+                var count = names.length;
+                if (!track.elements) {
+                    track.elements = [];
+                    for (var i=0; i<count; i++) {
+                        track.elements.push(that.lookup_element(names[i]));
+                    }
+                }
+                var times = track.times;
+                var values = track.values;
+                var k = 0;
+                var f = 0;
+                if (times.length > 1) {
+                    // last keyframe k with times[k] <= t, limited to the last interval
+                    var low = 0;
+                    var high = times.length - 2;
+                    while (low < high) {
+                        var middle = (low + high + 1) >> 1;
+                        if (times[middle] <= t) {
+                            low = middle;
+                        } else {
+                            high = middle - 1;
+                        }
+                    }
+                    k = low;
+                    f = Math.min(Math.max((t - times[k]) / (times[k+1] - times[k]), 0), 1);
+                    if (track.easing == "ease-in-out") {
+                        f = f * f * (3 - 2 * f);
+                    }
+                }
+                for (var i=0; i<count; i++) {
+                    var element = track.elements[i];
+                    if (!element) {
+                        continue;
+                    }
+                    var value = values[k * count + i];
+                    if (f > 0) {
+                        var next = values[(k + 1) * count + i];
+                        if (track.easing == "step") {
+                            value = (f >= 1) ? next : value;
+                        } else {
+                            value = value + (next - value) * f;
+                        }
+                    }
+                    element.setAttribute(track.att, value);
+                }
+            }
+        },
+
         do_delete: function (that, info) {
-            var names = info.names;
+            var names = decode_names(info.names);
             for (var i=0; i<names.length; i++) {
                 var name = names[i];
-                var $element = that.named_elements[name];
-                if ($element) {
-                    $element.remove();
-                    delete that.named_elements[name];
+                var element = that.lookup_element(name);
+                if (element) {
+                    if (element.parentNode) {
+                        element.parentNode.removeChild(element);
+                    }
+                    that.unregister_element(name);
+                    if (element.firstElementChild) {
+                        // forget the elements inside a deleted group.
+                        var descendants = element.getElementsByTagName("*");
+                        for (var j=0; j<descendants.length; j++) {
+                            var descendant = descendants[j].ipy_name;
+                            if (descendant !== undefined && that.lookup_element(descendant) === descendants[j]) {
+                                that.unregister_element(descendant);
+                            }
+                        }
+                    }
                 }
             }
         },
         
-        update_element: function($element, info) {
-            var element = $element[0];
+        update_element: function(element, info) {
             var atts = info.atts;
             var style = info.style;
             var text = info.text;
@@ -227,15 +1437,25 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
                 }
             }
             if (text) {
-                $element.empty();
+                remove_children(element);
                 var node = document.createTextNode(text);
                 element.appendChild(node);
             }
+            if (element.changed) {
+                // a display list item: redraw it (style changes are not observed).
+                element.changed();
+            }
         },
         
         do_empty: function (that, info) {
             that.named_elements = {};
-            that.$svg.empty();
+            that.id_elements = [];
+            if (that.renderer) {
+                that.root.clear();
+                that.renderer.invalidate(true);
+            } else {
+                that.$svg.empty();
+            }
         },
         
         svg_parameters_changed: function() {
@@ -243,8 +1463,12 @@ define("SVGCanvas", ['@jupyter-widgets/base'], function(widgets) {
             var style_additions = that.get_JSON("svg_style");
             var svg = that.$svg[0];
             svg.setAttribute("viewBox", that.model.get("viewBox"));
-            svg.setAttribute("width", that.model.get("svg_width"));
-            svg.setAttribute("height", that.model.get("svg_height"));
+            if (that.renderer) {
+                that.renderer.resize(that.model.get("svg_width"), that.model.get("svg_height"), that.view_box());
+            } else {
+                svg.setAttribute("width", that.model.get("svg_width"));
+                svg.setAttribute("height", that.model.get("svg_height"));
+            }
             for (var style_attr in style_additions) {
                 svg.style[style_attr] = style_additions[style_attr];
             }
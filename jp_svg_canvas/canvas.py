@@ -9,6 +9,16 @@ import os
 import pprint
 import IPython
 import time
+import math
+import numpy as np
+try:
+    import asyncio
+except ImportError:
+    # python 2: send_commands does not return futures.
+    asyncio = None
+from jp_svg_canvas import scene
+from jp_svg_canvas import markup
+from jp_svg_canvas import ids
 
 # XXXX I initially had difficulties directly passing
 # complex structures like lists and dicts from the
@@ -26,13 +36,25 @@ stroke-linejoin stroke-opacity
 
 [STROKE, WIDTH, LINECAP, DASHARRAY, LINEJOIN, OPACITY] = STROKE_ATTRIBUTES
 
+# Significant digits used to format polyline and polygon points.
+POINT_DIGITS = 6
+
+# Numeric dtypes which canvas.js can decode from binary message buffers.
+COLUMN_DTYPES = ("float32", "float64", "int16", "int32")
+
+# Commands with columns of attribute values which are quantized by the precision policy.
+QUANTIZED_COMMANDS = ("add_elements", "change_elements")
+
 
 JS_LOADED = [False]
 
 def load_javascript_support(verbose=False, force=False):
     """
     Install javascript support required for this module into the notebook.
+    Does nothing outside of IPython (for example in headless batch jobs).
     """
+    if IPython.get_ipython() is None:
+        return
     if (not JS_LOADED[0]) or force:
         my_dir = os.path.dirname(__file__)
         js_filename = os.path.join(my_dir, "canvas.js")
@@ -103,28 +125,104 @@ class SVGHelperMixin(HasTraits):
     # the SVG canvas will not fire -- only the global default callback will fire.
     local_events = True
 
-    # number of times to iterate awaiting pending comments.
-    wait_iterations = 100
+    # seconds to wait for pending commands before giving up.
+    wait_timeout = 10.0
+
+    # how long to sleep between kernel iterations in the wait loop
+    wait_sleep = 0.002
+
+    # Counters of the last command batch sent, the last batch acknowledged by javascript
+    # and the last batch given up on after a timeout.
+    command_counter = 0
+    acknowledged_counter = 0
+    expired_counter = 0
+
+    # Number of commands waiting to be sent.
+    queue_depth = 0
+
+    # Retained copy of the drawing (scene.SceneModel) or None if not retained.
+    scene = None
+
+    # Number of decimals (in viewBox units) kept for numeric attribute values,
+    # or None to send full precision.  See set_pixel_precision.
+    precision = None
 
-    # now long to sleep in wait loop
-    wait_sleep = 0.1
+    def retain_scene(self, model=None):
+        """
+        Keep a Python side copy of the drawing in self.scene, updated by the drawing commands.
+        Only commands issued after this call are recorded.
+        """
+        if model is None:
+            model = scene.SceneModel()
+        self.scene = model
+        return model
 
-    def await_pending_commands(self, verbose=False, strict=False):
-        "Wait for javascript side to execute commands."
-        if self.command_pending:
+    # ids.IdAllocator for integer element identifiers (created when first used).
+    id_allocator = None
+
+    def allocate_ids(self, count):
+        "Allocate a range of count integer element identifiers (see ids.py)."
+        if self.id_allocator is None:
+            self.id_allocator = ids.IdAllocator()
+        return self.id_allocator.allocate(count)
+
+    def free_ids(self, identifiers):
+        "Free integer element identifiers for reuse (after their elements are deleted)."
+        if self.id_allocator is not None:
+            self.id_allocator.free(identifiers)
+
+    def set_pixel_precision(self, subpixels=10):
+        """
+        Set the precision to resolve 1/subpixels of a display pixel, using the viewBox
+        width and svg_width.  Returns the number of decimals.
+        """
+        [_, _, width, _] = [float(x) for x in self.viewBox.split()]
+        pixel = width / float(self.svg_width)
+        self.precision = int(math.ceil(-math.log10(pixel / subpixels)))
+        return self.precision
+
+    def rounded(self, value):
+        "Round numbers in an attribute value or dictionary according to the precision policy."
+        return round_value(value, self.precision)
+
+    def rounded_columns(self, columns):
+        "Round numeric columns according to the precision policy."
+        digits = self.precision
+        if digits is None:
+            return columns
+        result = {}
+        for (att, values) in columns.items():
+            array = np.asarray(values)
+            if array.dtype.kind == "f":
+                values = np.round(array, digits)
+            result[att] = values
+        return result
+
+    def await_pending_commands(self, verbose=False, strict=False, counter=None):
+        """
+        Wait for javascript side to execute commands (the batch numbered counter
+        and all batches before it, by default all batches sent or queued so far).
+        Notebook coroutines should await wait_for_commands instead.
+        """
+        all_commands = counter is None
+        def waiting():
+            if all_commands:
+                # queued commands are sent as acknowledgements arrive.
+                return self.queue_depth or self.command_pending
+            return self.expired_counter < counter and self.acknowledged_counter < counter
+        if self.command_pending and waiting():
             ip = IPython.get_ipython()
-            for i in range(self.wait_iterations):
+            deadline = time.time() + self.wait_timeout
+            while waiting() and time.time() < deadline:
                 if verbose:
-                    print ("awaiting pending commands " + str(i))
-                time.sleep(self.wait_sleep)
+                    print ("awaiting pending commands " + str(self.command_counter))
                 ip.kernel.do_one_iteration()
-                if not self.command_pending:
-                    break
-        if strict and self.command_pending:
+                if waiting():
+                    time.sleep(self.wait_sleep)
+        if waiting():
             self.command_pending = False
-            raise RuntimeError("timeout awaiting pending commands.")
-        self.command_pending = False
-
+            if strict:
+                raise RuntimeError("timeout awaiting pending commands.")
 
     def get_style(self):
         "Get the current SVG style."
@@ -200,6 +298,71 @@ class SVGHelperMixin(HasTraits):
         atts["fill"] = fill
         self.add_element(name, tag, atts, style_dict, event_callback=event_cb)
 
+    def polyline(self, name, points, color="black", width=None, event_cb=None, style_dict=None,
+            **other_attributes):
+        "Add a command to create an unfilled polyline element through (x, y) points to the command buffer."
+        tag = "polyline"
+        atts = other_attributes.copy()
+        atts["points"] = format_points(points, decimals=self.precision)
+        atts["fill"] = atts.get("fill", "none")
+        if width:
+            atts["stroke-width"] = width
+        atts["stroke"] = color
+        self.add_element(name, tag, atts, style_dict, event_callback=event_cb)
+
+    def add_elements(self, names, tagname, columns, attribute_dict=None, style_dict=None, texts=None,
+            event_callbacks=None):
+        """
+        Add a batch of elements with the same tag.  Columns maps attribute names to
+        sequences of per-element values and attribute_dict holds attributes shared by
+        every element.  Texts and event_callbacks may be single values or sequences.
+        This default implementation adds the elements one at a time.
+        """
+        rows = batch_rows(names, columns, attribute_dict, texts, event_callbacks)
+        for (name, atts, text, callback) in rows:
+            self.add_element(name, tagname, atts, style_dict, text=text, event_callback=callback)
+
+    def change_elements(self, names, columns, attribute_dict=None, style_dict=None, texts=None):
+        """
+        Change a batch of named elements.  Columns maps attribute names to sequences
+        of per-element values aligned with names and attribute_dict holds values set
+        on every element.  This default implementation changes the elements one at a time.
+        """
+        for (name, atts, text, _) in batch_rows(names, columns, attribute_dict, texts):
+            self.change_element(name, atts, style_dict, text)
+
+    # name --> animation.Timeline defined on this canvas
+    timelines = None
+
+    def define_timeline(self, name, timeline):
+        "Define (or replace) an animation.Timeline to play later."
+        if self.timelines is None:
+            self.timelines = {}
+        self.timelines[name] = timeline
+
+    def play_timeline(self, name, speed=1.0, seconds=None, callback=None):
+        """
+        Play a timeline.  Canvases which cannot animate jump to the end of the timeline
+        and call callback({"name": name, "time": duration}) immediately.
+        """
+        timeline = self.timelines[name]
+        duration = timeline.duration
+        self.seek_timeline(name, duration)
+        if callback is not None:
+            callback({"name": name, "time": duration})
+
+    def pause_timeline(self, name):
+        pass
+
+    def seek_timeline(self, name, seconds):
+        "Set the attributes animated by a timeline to their values at time seconds."
+        for (names, att, values) in self.timelines[name].values_at(seconds):
+            self.change_elements(names, {att: values})
+
+    def delete_timeline(self, name):
+        if self.timelines is not None:
+            self.timelines.pop(name, None)
+
     def polygon(self, name, points, fill=None, stroke=None, stroke_width=None, style_dict=None, 
             event_callback=None, **other_attributes):
         if style_dict is None:
@@ -236,6 +399,17 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
 
     # The bounding box set in response to "fit" command.
     boundingBox = Dict({}, sync=True)
+
+    # Set True to pan (drag) and zoom (mouse wheel) in the browser without kernel
+    # round trips.  The browser updates viewBox (and so view_minx, ...) at most
+    # every view_sync_interval milliseconds while the view moves.
+    pan_zoom = Bool(False, sync=True)
+    view_sync_interval = Float(200, sync=True)
+
+    # "svg" draws elements into the DOM.  "canvas" draws them into an HTML5 canvas
+    # from a retained display list, which stays responsive with many more elements
+    # (events still find the element under the pointer).  Set before the widget is displayed.
+    render_mode = Unicode("svg", sync=True)
     
     # Canvas width
     svg_width = Float(500, sync=True)
@@ -266,6 +440,9 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
     
     # use this style dictionary if not provided
     default_style = {}
+
+    # add new elements to this named group element (None for the top level of the svg).
+    default_parent = None
     
     # Set True to enable localized event callbacks
     # If set False then event callbacks attached to descendent elements to
@@ -277,6 +454,7 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
         super(SVGCanvasWidget, self).__init__(*pargs, **kwargs)
         #self.on_trait_change(self.handle_event_change, "event")
         self.on_trait_change(self.send_commands, "rendered")
+        self.on_trait_change(self.handle_viewBox_change, "viewBox")
         self.on_msg(self.handle_custom_message)
         self.name_counter = 0
         self.verbose = False
@@ -287,6 +465,20 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
         self._exception = None
         self.last_svg_text = None
         self.svg_text_callback = None
+        # command counter --> futures resolved when javascript acknowledges that batch
+        self.command_futures = {}
+        # counters of batches sent but not acknowledged (or expired), in order
+        self.in_flight_counters = []
+        # commands (and futures) waiting for room in the in flight window
+        self.queued_commands = []
+        self.queued_futures = []
+        self.queued_batches = 0
+        self.timelines = {}
+        # timeline name --> callback for the timeline_done message
+        self.timeline_callbacks = {}
+        # elements added minus elements deleted (an estimate without a retained scene).
+        self.element_count = 0
+        self.reset_stats()
 
     def handle_custom_message(self, widget, data, *etcetera):
         self._last_message_data = data
@@ -299,9 +491,24 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
         elif indicator == "SVG_text":
             self.status = "handling SVG text"
             self.handle_svg(payload)
+        elif indicator == "ack":
+            self.handle_ack(payload)
+        elif indicator == "timeline_done":
+            self.handle_timeline_done(payload)
         else:
             self._status = "unknown message indicator " + repr(indicator)
 
+    def handle_viewBox_change(self):
+        "Keep view_minx, view_miny, view_width and view_height in step with viewBox (set by pan_zoom)."
+        try:
+            [minx, miny, width, height] = [float(x) for x in self.viewBox.replace(",", " ").split()]
+        except ValueError:
+            return
+        self.view_minx = minx
+        self.view_miny = miny
+        self.view_width = width
+        self.view_height = height
+
     def handle_svg(self, svg_text):
         self.last_svg_text = svg_text
         callback = self.svg_text_callback
@@ -337,27 +544,281 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
         if self.buffered_commands is None:
             self.buffered_commands = []
         self.buffered_commands.append(dictionary)
+        self.commands_buffered += 1
 
-    command_counter = 0
+    # Set True to count the JSON bytes of each batch in stats() (this encodes each batch twice).
+    measure_json_bytes = False
+
+    def reset_stats(self):
+        "Reset the performance counters reported by stats()."
+        self.stats_start = time.time()
+        self.commands_buffered = 0
+        self.commands_sent = 0
+        self.batches_sent = 0
+        self.buffer_bytes = 0
+        self.json_bytes = 0
+        self.encode_seconds = 0.0
+        self.send_seconds = 0.0
+        self.acks = 0
+        self.ack_seconds = 0.0
+        self.max_ack_seconds = 0.0
+        self.eliminated_commands = 0
+        # number of send_commands batches merged into a later batch
+        self.coalesced_batches = 0
+        # batch counter --> time sent, for the acknowledgement latency
+        self.send_times = {}
+
+    def stats(self):
+        """
+        Dictionary of performance counters since the widget was created or reset_stats():
+        commands buffered and sent, batches and bytes sent, time spent compacting and
+        encoding batches (encode_seconds) and in ipywidgets send (send_seconds), and the
+        latency from sending a batch to its javascript acknowledgement.
+        """
+        elapsed = time.time() - self.stats_start
+        batches = self.batches_sent
+        json_bytes = self.json_bytes if self.measure_json_bytes else None
+        sent_bytes = self.buffer_bytes + (json_bytes or 0)
+        alive = self.element_count
+        if self.scene is not None:
+            alive = len(self.scene)
+        return {
+            "elapsed_seconds": elapsed,
+            "commands_buffered": self.commands_buffered,
+            "commands_sent": self.commands_sent,
+            "commands_eliminated": self.eliminated_commands,
+            "batches_sent": batches,
+            "batches_coalesced": self.coalesced_batches,
+            "batches_per_second": batches / elapsed if elapsed > 0 else None,
+            "buffer_bytes": self.buffer_bytes,
+            "json_bytes": json_bytes,
+            "bytes_per_batch": sent_bytes / float(batches) if batches else None,
+            "elements_alive": alive,
+            "encode_seconds": self.encode_seconds,
+            "send_seconds": self.send_seconds,
+            "acks": self.acks,
+            "mean_ack_seconds": self.ack_seconds / self.acks if self.acks else None,
+            "max_ack_seconds": self.max_ack_seconds if self.acks else None,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+        }
+
+    # seconds before futures for unacknowledged command batches resolve to False (None for no limit).
+    command_timeout = 10.0
+
+    # maximum number of command batches sent but not acknowledged (None for no limit).
+    # Batches sent while the window is full are queued and coalesced into one batch.
+    # Acknowledgements are only handled when the running cell yields to the kernel
+    # event loop, so a synchronous loop in one cell which fills the window sends
+    # nothing more until the cell ends.  Only set a limit for code which awaits
+    # (for example wait_for_commands) between batches.
+    max_in_flight = None
+
+    # Set False to send commands exactly as issued instead of compacting them (see compact_commands).
+    compact = True
+
+    # number of commands removed by compact_commands
+    eliminated_commands = 0
+
+    # dtype used to ship numeric columns of batched commands as binary buffers.
+    column_dtype = "float32"
         
     def send_commands(self):
-        "Send all commands in the command buffer to the JS interpreter."
+        """
+        Send all commands in the command buffer to the JS interpreter.
+        If max_in_flight is set and that many batches are awaiting acknowledgement the
+        commands are queued and sent (coalesced with other queued commands) when
+        javascript catches up.  By default every batch is sent immediately.
+        Returns a future which resolves to True when javascript has executed the batch
+        (or False if it is not acknowledged within command_timeout seconds),
+        or None if the widget is not rendered yet or asyncio is not available.
+        """
         if not self.rendered:
             if self.verbose:
                 print ("not sending commands because render has not happened yet.")
+            return None
+        bc = self.buffered_commands
+        self.buffered_commands = None
+        if not bc:
+            # nothing new to execute: wait for the batches already sent or queued.
+            return self.wait_future()
+        self.queued_commands.extend(bc)
+        self.queued_batches += 1
+        future = self.new_future()
+        if future is not None:
+            self.queued_futures.append(future)
+        self.send_queued_commands()
+        return future
+
+    @property
+    def in_flight(self):
+        "Number of command batches sent but not acknowledged."
+        return len(self.in_flight_counters)
+
+    @property
+    def queue_depth(self):
+        "Number of commands waiting for room in the in flight window."
+        return len(self.queued_commands)
+
+    def send_queued_commands(self):
+        "Send queued commands as one batch if the in flight window has room."
+        if not self.queued_commands:
+            return
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
             return
-        #self.await_pending_commands()
+        commands = self.queued_commands
+        futures = self.queued_futures
+        self.coalesced_batches += self.queued_batches - 1
+        self.queued_commands = []
+        self.queued_futures = []
+        self.queued_batches = 0
+        start = time.time()
+        if self.compact:
+            count = len(commands)
+            commands = compact_commands(commands)
+            self.eliminated_commands += count - len(commands)
+            if not commands:
+                # nothing left to do: the futures resolve with the batches already sent.
+                self.resolve_futures(futures, self.command_counter)
+                self.encode_seconds += time.time() - start
+                return
         # Update the counter so every command sequence is distinct
         self.command_counter += 1
-        bc = self.buffered_commands
-        if bc:
-            command_pair = [self.command_counter, bc]
-            self.command_pending = True
-            #self.commands = json.dumps(command_pair)
-            self.send(command_pair)
-        self.buffered_commands = None
+        counter = self.command_counter
+        (encoded, buffers) = self.encode_commands(commands)
+        command_pair = [counter, encoded]
+        if self.measure_json_bytes:
+            self.json_bytes += len(json.dumps(command_pair))
+        sent = time.time()
+        self.encode_seconds += sent - start
+        self.commands_sent += len(commands)
+        self.batches_sent += 1
+        self.buffer_bytes += sum(memoryview(buffer).nbytes for buffer in buffers)
+        self.send_times[counter] = sent
+        self.command_pending = True
+        self.in_flight_counters.append(counter)
+        if futures:
+            self.command_futures[counter] = futures
+        loop = event_loop()
+        if loop is not None and self.command_timeout is not None:
+            loop.call_later(self.command_timeout, self.expire_commands, counter)
+        self.send(command_pair, buffers)
+        self.send_seconds += time.time() - sent
+
+    def new_future(self):
+        "A future on the current event loop (None without an event loop)."
+        loop = event_loop()
+        if loop is None:
+            return None
+        return loop.create_future()
+
+    def command_future(self, counter):
+        "A future resolved when batch counter is acknowledged (None without an event loop)."
+        future = self.new_future()
+        if future is None:
+            return None
+        self.resolve_futures([future], counter)
+        return future
+
+    def wait_future(self):
+        "A future resolved when all commands sent or queued so far are acknowledged."
+        if self.queued_commands:
+            future = self.new_future()
+            if future is not None:
+                self.queued_futures.append(future)
+            return future
+        return self.command_future(self.command_counter)
+
+    def resolve_futures(self, futures, counter):
+        "Resolve futures along with batch counter."
+        for future in futures:
+            if counter <= self.acknowledged_counter:
+                future.set_result(True)
+            elif counter <= self.expired_counter:
+                future.set_result(False)
+            else:
+                self.command_futures.setdefault(counter, []).append(future)
+
+    def handle_ack(self, counter):
+        "Javascript has executed command batches up to counter."
+        if counter <= self.acknowledged_counter:
+            # duplicate acknowledgement (for example from a second view).
+            return
+        self.acknowledged_counter = counter
+        self.in_flight_counters = [c for c in self.in_flight_counters if c > counter]
+        now = time.time()
+        send_times = self.send_times
+        for done in [c for c in send_times if c <= counter]:
+            latency = now - send_times.pop(done)
+            self.acks += 1
+            self.ack_seconds += latency
+            self.max_ack_seconds = max(self.max_ack_seconds, latency)
+        futures = self.command_futures
+        for done in [c for c in futures if c <= counter]:
+            for future in futures.pop(done):
+                if not future.done():
+                    future.set_result(True)
+        self.send_queued_commands()
+        if not self.in_flight_counters:
+            self.command_pending = False
+
+    def expire_commands(self, counter):
+        """
+        Give up on batch counter if it has not been acknowledged: resolve its futures
+        to False and free its place in the in flight window.
+        """
+        if counter <= self.acknowledged_counter:
+            return
+        self.expired_counter = max(self.expired_counter, counter)
+        self.send_times.pop(counter, None)
+        if counter in self.in_flight_counters:
+            self.in_flight_counters.remove(counter)
+        for future in self.command_futures.pop(counter, ()):
+            if not future.done():
+                future.set_result(False)
+        self.send_queued_commands()
+        if not self.in_flight_counters:
+            self.command_pending = False
+
+    def wait_for_commands(self, counter=None, timeout=None):
+        """
+        Awaitable for notebook coroutines which completes when javascript has executed
+        command batches up to counter (default: all batches sent or queued so far).
+        Raises asyncio.TimeoutError if that takes longer than timeout seconds.
+
+            await widget.wait_for_commands(timeout=1.0)
+        """
+        if counter is None:
+            future = self.wait_future()
+        else:
+            future = self.command_future(counter)
+        if future is None:
+            raise RuntimeError("waiting for commands requires asyncio and an event loop.")
+        return asyncio.wait_for(future, timeout)
+
+    def encode_commands(self, commands):
+        """
+        Prepare buffered commands for sending.  Numeric columns of batched commands
+        are replaced by references into the returned list of binary buffers.
+        """
+        buffers = []
+        encoded = []
+        for command in commands:
+            if ids.is_id_range(command.get("names")):
+                command = command.copy()
+                command["names"] = ids.wire_names(command["names"])
+            columns = command.get("columns")
+            if columns is not None:
+                digits = None
+                if command.get("command") in QUANTIZED_COMMANDS:
+                    digits = self.precision
+                command = command.copy()
+                command["columns"] = encode_columns(columns, self.column_dtype, buffers, digits)
+            encoded.append(command)
+        return (encoded, buffers)
         
-    def add_element(self, name, tagname, attribute_dict, style_dict=None, text=None, event_callback=None):
+    def add_element(self, name, tagname, attribute_dict, style_dict=None, text=None, event_callback=None,
+            parent=None):
         "Add an 'add_element' to the command buffer."
         if name is None:
             # Invent a name if None given.
@@ -365,6 +826,9 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
             name = str(tagname) + "_" + str(self.name_counter)
         if style_dict is None:
             style_dict = self.default_style
+        if parent is None:
+            parent = self.default_parent
+        attribute_dict = self.rounded(attribute_dict)
         command = {
             "command": "add_element",
             "name": name,
@@ -373,14 +837,80 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
             "style": style_dict,
             "text": text,
         }
+        if parent is not None:
+            command["parent"] = parent
         self.add_command(command)
+        self.element_count += 1
+        if self.scene is not None:
+            self.scene.add_element(name, tagname, attribute_dict, style_dict, text, parent)
         if event_callback:
             self.name_to_callback[name] = event_callback
+
+    def add_elements(self, names, tagname, columns, attribute_dict=None, style_dict=None, texts=None,
+            event_callbacks=None):
+        """
+        Add an 'add_elements' batch to the command buffer.  Numeric columns are sent
+        to the javascript side as binary typed array buffers.
+        """
+        if not ids.is_id_range(names):
+            names = list(names)
+            for (i, name) in enumerate(names):
+                if name is None:
+                    self.name_counter += 1
+                    names[i] = str(tagname) + "_" + str(self.name_counter)
+        if attribute_dict is None:
+            attribute_dict = {}
+        if style_dict is None:
+            style_dict = self.default_style
+        if is_sequence(texts):
+            texts = [text_value(text) for text in texts]
+        else:
+            texts = text_value(texts)
+        columns = self.rounded_columns(columns)
+        attribute_dict = self.rounded(attribute_dict)
+        command = {
+            "command": "add_elements",
+            "names": names,
+            "tag": tagname,
+            "columns": columns,
+            "atts": attribute_dict,
+            "style": style_dict,
+            "texts": texts,
+        }
+        parent = self.default_parent
+        if parent is not None:
+            command["parent"] = parent
+        self.add_command(command)
+        self.element_count += len(names)
+        if self.scene is not None:
+            self.scene.add_elements(names, tagname, columns, attribute_dict, style_dict, texts, parent)
+        if event_callbacks is not None:
+            n2c = self.name_to_callback
+            if is_sequence(event_callbacks):
+                for (name, callback) in zip(names, event_callbacks):
+                    if callback:
+                        n2c[name] = callback
+            else:
+                for name in names:
+                    n2c[name] = event_callbacks
         
+    def add_group(self, name, attribute_dict=None, style_dict=None, parent=None):
+        """
+        Add a named <g> group element.  Elements added while default_parent is the
+        group name are its children: they inherit its style and transform and
+        deleting the group deletes them.
+        """
+        if attribute_dict is None:
+            attribute_dict = {}
+        if style_dict is None:
+            style_dict = {}
+        self.add_element(name, "g", attribute_dict, style_dict, parent=parent)
+
     def change_element(self, name, attribute_dict, style_dict=None, text=None):
         "Add a 'change_element' to the command buffer for a named object."
         if style_dict is None:
             style_dict = self.default_style
+        attribute_dict = self.rounded(attribute_dict)
         command = {
             "command": "change_element",
             "name": name,
@@ -389,21 +919,110 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
             "text": text,
         }
         self.add_command(command)
+        if self.scene is not None:
+            self.scene.change_element(name, attribute_dict, style_dict, text)
         
+    def change_elements(self, names, columns, attribute_dict=None, style_dict=None, texts=None):
+        """
+        Add a 'change_elements' batch to the command buffer.  Numeric columns are sent
+        to the javascript side as binary typed array buffers.
+        """
+        if not ids.is_id_range(names):
+            names = list(names)
+        if attribute_dict is None:
+            attribute_dict = {}
+        if style_dict is None:
+            style_dict = self.default_style
+        if is_sequence(texts):
+            texts = [text_value(text) for text in texts]
+        else:
+            texts = text_value(texts)
+        columns = self.rounded_columns(columns)
+        attribute_dict = self.rounded(attribute_dict)
+        command = {
+            "command": "change_elements",
+            "names": names,
+            "columns": columns,
+            "atts": attribute_dict,
+            "style": style_dict,
+            "texts": texts,
+        }
+        self.add_command(command)
+        if self.scene is not None:
+            for (name, atts, text, _) in batch_rows(names, columns, attribute_dict, texts):
+                self.scene.change_element(name, atts, style_dict, text)
+
+    def define_timeline(self, name, timeline):
+        """
+        Add a command to send an animation.Timeline to javascript, replacing any
+        timeline with the same name.  It does not start playing.
+        """
+        self.timelines[name] = timeline
+        self.add_command(timeline.command(name))
+
+    def play_timeline(self, name, speed=1.0, seconds=None, callback=None):
+        """
+        Add a command to start (or resume) playing a timeline in the browser, optionally
+        from time seconds.  Callback(info) is called with info {"name": name, "time": t}
+        when a timeline which does not loop reaches its end.
+        """
+        self.timeline_callbacks[name] = callback
+        command = {"command": "play_timeline", "name": name, "speed": speed, "time": seconds}
+        self.add_command(command)
+
+    def pause_timeline(self, name):
+        "Add a command to pause a playing timeline."
+        self.add_command({"command": "pause_timeline", "name": name})
+
+    def seek_timeline(self, name, seconds):
+        "Add a command to move a timeline to time seconds (and set the attributes it animates)."
+        self.add_command({"command": "seek_timeline", "name": name, "time": seconds})
+        self.update_scene_timeline(name, seconds)
+
+    def delete_timeline(self, name):
+        "Add a command to stop and forget a timeline."
+        self.timelines.pop(name, None)
+        self.timeline_callbacks.pop(name, None)
+        self.add_command({"command": "delete_timeline", "name": name})
+
+    def handle_timeline_done(self, info):
+        name = info.get("name")
+        self.update_scene_timeline(name, info.get("time"))
+        callback = self.timeline_callbacks.get(name)
+        if callback is not None:
+            callback(info)
+
+    def update_scene_timeline(self, name, seconds):
+        "Record the attribute values of a timeline at time seconds in the retained scene."
+        timeline = self.timelines.get(name)
+        if self.scene is not None and timeline is not None and seconds is not None:
+            for (names, att, values) in timeline.values_at(seconds):
+                for (element_name, value) in zip(names, values.tolist()):
+                    self.scene.change_element(element_name, {att: value})
+
     def empty(self):
         "Add a command to empty the canvas to the command buffer."
         command = {"command": "empty"}
         self.add_command(command)
         self.name_to_callback = {}
+        self.element_count = 0
+        if self.scene is not None:
+            self.scene.empty()
+        if self.id_allocator is not None:
+            self.id_allocator.reset()
         
     def delete_names(self, names):
         "Add a command to remove named objects to the command buffer."
         command = {"command": "delete", "names": names}
         self.add_command(command)
+        self.element_count = max(self.element_count - len(names), 0)
+        if self.scene is not None:
+            self.scene.delete_names(names)
         n2c = self.name_to_callback
-        for name in names:
-            if name in n2c:
-                del n2c[name]
+        if n2c:
+            for name in names:
+                if name in n2c:
+                    del n2c[name]
 
     def fit(self, changeView=True):
         "add a 'fit' command to the command buffer (fit to bounding box)"
@@ -419,12 +1038,10 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
 
     def save_as_SVG_file(self, path="Diagram.svg"):
         print ("Saving as " + repr(path) + " asynchronously.") 
-        start = u'<svg preserveAspectRatio="none" viewBox="%s" width="%s" height="%s">' %(
-            self.viewBox, self.svg_width, self.svg_height
-        )
+        start = markup.svg_start(self.viewBox, self.svg_width, self.svg_height, self.get_style())
         f = open(path, "w")
         def callback(text):
-            L = [start, text, u"</svg>"]
+            L = [start, text, markup.SVG_END]
             for x in L:
                 f.write(x)
                 f.write(u"\n")
@@ -434,3 +1051,297 @@ class SVGCanvasWidget(widgets.DOMWidget, SVGHelperMixin):
     def get_style(self):
         "Get the current SVG style."
         return json.loads(self.svg_style)
+
+
+def format_points(points, digits=POINT_DIGITS, decimals=None):
+    """
+    Compact SVG points attribute text for a sequence of (x, y) pairs, with digits
+    significant digits or (if decimals is not None) rounded to decimals decimals.
+    """
+    flat = np.asarray(points, dtype=np.float64).ravel()
+    if decimals is not None:
+        flat = markup.js_strings(np.round(flat, decimals))
+        return " ".join(["%s,%s" % pair for pair in zip(flat[0::2], flat[1::2])])
+    flat = flat.tolist()
+    fmt = "%%.%sg,%%.%sg" % (digits, digits)
+    return " ".join([fmt % pair for pair in zip(flat[0::2], flat[1::2])])
+
+def round_value(value, digits):
+    """
+    Round floats in a value (and in dictionaries, lists and tuples) to digits decimals.
+    Integral results become ints so they encode without a fraction.
+    """
+    if digits is None:
+        return value
+    if isinstance(value, (float, np.floating)):
+        x = round(float(value), digits)
+        if x.is_integer():
+            return int(x)
+        return x
+    if isinstance(value, dict):
+        return dict((key, round_value(item, digits)) for (key, item) in value.items())
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [round_value(item, digits) for item in value]
+    return value
+
+def event_loop():
+    "The running asyncio event loop, or None (futures would never resolve without one)."
+    if asyncio is None:
+        return None
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def is_sequence(value):
+    "True for per-element lists, tuples and arrays (strings are single values)."
+    return isinstance(value, (list, tuple, np.ndarray))
+
+def text_value(text):
+    "Convert a text value for JSON encoding (None stays None)."
+    if text is None:
+        return None
+    return str(text)
+
+def column_value(value):
+    "Convert a numpy scalar column entry to a plain Python value."
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def batch_rows(names, columns, attribute_dict=None, texts=None, event_callbacks=None):
+    """
+    Expand a columnar batch into (name, attribute_dict, text, event_callback) rows.
+    """
+    if attribute_dict is None:
+        attribute_dict = {}
+    items = list(columns.items())
+    for (i, name) in enumerate(names):
+        atts = attribute_dict.copy()
+        for (att, values) in items:
+            atts[att] = column_value(values[i])
+        text = texts
+        if is_sequence(texts):
+            text = texts[i]
+        callback = event_callbacks
+        if is_sequence(event_callbacks):
+            callback = event_callbacks[i]
+        yield (name, atts, text, callback)
+
+def encode_columns(columns, dtype, buffers, digits=None):
+    """
+    Encode a dictionary of per-element columns for a widget message.
+    Numeric columns are appended to buffers as little endian binary data and
+    replaced by {"buffer": index, "dtype": name} references.  Other columns
+    become plain lists.  If digits is given, numeric columns are quantized to
+    int16 or int32 multiples of 10**-digits (when they fit) and the reference
+    includes the "divisor" 10**digits.
+    """
+    assert dtype in COLUMN_DTYPES, "unsupported column dtype " + repr(dtype)
+    encoded = {}
+    for (att, values) in columns.items():
+        array = np.asarray(values)
+        if array.dtype.kind in "biuf":
+            reference = {"buffer": len(buffers), "dtype": dtype}
+            data = None
+            if digits is not None and digits >= 0:
+                data = quantize(array, digits)
+                if data is not None:
+                    reference = {"buffer": len(buffers), "dtype": data.dtype.name, "divisor": 10 ** digits}
+            if data is None:
+                data = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+            encoded[att] = reference
+            buffers.append(memoryview(data))
+        else:
+            encoded[att] = [column_value(x) for x in values]
+    return encoded
+
+def quantize(array, digits):
+    """
+    Little endian int16 or int32 array of round(array * 10**digits), or None if some
+    value is not finite or does not fit.
+    """
+    scaled = np.round(np.asarray(array, dtype=np.float64) * 10 ** digits)
+    if len(scaled) == 0:
+        return scaled.astype("<i2")
+    if not np.isfinite(scaled).all():
+        return None
+    limit = max(-scaled.min(), scaled.max())
+    for wire_dtype in ("<i2", "<i4"):
+        if limit < np.iinfo(wire_dtype).max:
+            return scaled.astype(wire_dtype)
+    return None
+
+# Commands which only affect named elements.  Other commands (fit, get_SVG_text, ...)
+# observe the drawing, so compact_commands does not move element commands across them.
+ELEMENT_COMMANDS = ("add_element", "add_elements", "change_element", "change_elements", "delete", "empty")
+
+def compact_commands(commands):
+    """
+    A shorter list of commands with the same effect on the drawing:
+    element commands before an empty are dropped, successive changes to a name
+    are merged (into its add_element if it was added in the same list),
+    adjacent change_elements batches for the same names are merged,
+    and add_element/change_element commands for names deleted later are dropped
+    along with deletions of names known not to be on the canvas.
+    The add of a group which is the parent of later adds is never dropped, so
+    deleting the group also deletes its children.  (A name which is added again
+    while it is on the canvas replaces the original element, so dropping the
+    second add before a delete leaves the same drawing.)
+    """
+    result = []
+    # name --> index in result of the add command which created it
+    bindings = {}
+    # name --> index in result of the change_element for it since its add
+    changes = {}
+    # names deleted in this list and names added after an empty
+    unbound = set()
+    present = set()
+    cleared = False
+    def absent(name):
+        "Is the name known not to be on the canvas?"
+        return name in unbound or (cleared and name not in present)
+    # name --> was the name absent before the add command which created it?
+    fresh = {}
+    # names of groups used as the parent of adds since the group was added
+    parents = set()
+    # element commands before this index are not moved or dropped
+    window_start = 0
+    for command in commands:
+        kind = command.get("command")
+        if kind == "empty":
+            for i in range(window_start, len(result)):
+                if result[i] is not None and result[i]["command"] in ELEMENT_COMMANDS:
+                    result[i] = None
+            bindings.clear()
+            changes.clear()
+            unbound.clear()
+            present.clear()
+            fresh.clear()
+            parents.clear()
+            cleared = True
+            result.append(command)
+        elif kind == "add_element":
+            name = command["name"]
+            changes.pop(name, None)
+            bindings[name] = len(result)
+            fresh[name] = absent(name)
+            unbound.discard(name)
+            parents.discard(name)
+            if command.get("parent") is not None:
+                parents.add(command["parent"])
+            if cleared:
+                present.add(name)
+            result.append(command)
+        elif kind == "add_elements":
+            # set operations keep large batches (and identifier ranges) cheap.
+            names = set(command["names"])
+            for name in names.intersection(changes):
+                del changes[name]
+            for name in names.intersection(bindings):
+                del bindings[name]
+            unbound.difference_update(names)
+            parents.difference_update(names)
+            if command.get("parent") is not None:
+                parents.add(command["parent"])
+            if cleared:
+                present.update(names)
+            result.append(command)
+        elif kind == "change_element":
+            name = command["name"]
+            i = changes.get(name)
+            if i is None:
+                i = bindings.get(name)
+                if i is not None and result[i]["command"] != "add_element":
+                    i = None
+            if i is not None:
+                result[i] = merge_change(result[i], command)
+            else:
+                changes[name] = len(result)
+                result.append(command)
+        elif kind == "change_elements":
+            previous = len(result) - 1
+            while previous >= window_start and result[previous] is None:
+                previous -= 1
+            if previous >= window_start and result[previous]["command"] == "change_elements":
+                names = result[previous]["names"]
+                if names is command["names"] or names == command["names"]:
+                    result[previous] = merge_columns(result[previous], command)
+                    continue
+            if changes or bindings:
+                names = set(command["names"])
+                for name in names.intersection(changes):
+                    del changes[name]
+                for name in names.intersection(bindings):
+                    # later changes must not be merged into an add before this batch.
+                    del bindings[name]
+            result.append(command)
+        elif kind == "delete":
+            names = set(command["names"])
+            for name in names.intersection(changes):
+                result[changes.pop(name)] = None
+            known_absent = names.intersection(unbound)
+            if cleared:
+                known_absent.update(names.difference(present))
+                present.difference_update(names)
+            for name in names.intersection(bindings):
+                i = bindings.pop(name)
+                if name in parents:
+                    # keep the group add: the delete removes its children too.
+                    continue
+                if result[i] is not None and result[i]["command"] == "add_element":
+                    result[i] = None
+                    if fresh[name]:
+                        known_absent.add(name)
+            unbound.update(names)
+            if known_absent:
+                kept = [name for name in command["names"] if name not in known_absent]
+                if kept:
+                    command = command.copy()
+                    command["names"] = kept
+                    result.append(command)
+            elif names:
+                result.append(command)
+        else:
+            bindings.clear()
+            changes.clear()
+            parents.clear()
+            result.append(command)
+            window_start = len(result)
+    return [command for command in result if command is not None]
+
+def merge_change(command, change):
+    "Copy of an add_element or change_element command with a later change_element applied."
+    merged = command.copy()
+    for key in ("atts", "style"):
+        values = dict(command.get(key) or {})
+        values.update(change.get(key) or {})
+        merged[key] = values
+    if change.get("text"):
+        merged["text"] = change["text"]
+    return merged
+
+def merge_columns(command, change):
+    "Copy of a change_elements command with a later change_elements for the same names applied."
+    merged = command.copy()
+    (atts, columns) = (dict(command["atts"] or {}), dict(command["columns"]))
+    for att in change["atts"] or {}:
+        columns.pop(att, None)
+    for att in change["columns"]:
+        atts.pop(att, None)
+    atts.update(change["atts"] or {})
+    columns.update(change["columns"])
+    style = dict(command["style"] or {})
+    style.update(change["style"] or {})
+    (texts, later) = (command["texts"], change["texts"])
+    if is_sequence(later):
+        if not is_sequence(texts):
+            texts = [texts] * len(later)
+        texts = [b if b else a for (a, b) in zip(texts, later)]
+    elif later:
+        texts = later
+    merged.update(atts=atts, columns=columns, style=style, texts=texts)
+    return merged
@@ -7,12 +7,17 @@ Higher level conveniences for drawing SVG 2d figures supporting scaling and tran
 
 import numpy as np
 import math
+import time
+import contextlib
 from jp_svg_canvas import canvas
+from jp_svg_canvas import animation
+from jp_svg_canvas import ids
+from jp_svg_canvas import transforms2d
 from IPython.display import display
 
 def parameterized_points(f, min_t, max_t, npoints):
     t_values = np.linspace(min_t, max_t, npoints)
-    return np.array([f(t) for t in t_values], dtype=np.float)
+    return np.array([f(t) for t in t_values], dtype=float)
 
 class Cartesian(object):
 
@@ -28,6 +33,33 @@ class Cartesian(object):
     buffered = False
     events_callback = None
 
+    # Set False to send one add_element command per element instead of columnar batches.
+    columnar = True
+
+    # Set to a number of display pixels (for example 0.5) to reduce curves to the points
+    # needed to draw them at the current zoom level: dropped points are within
+    # decimation_tolerance pixels of the drawn curve.  Zooming in later (for example
+    # with pan_zoom in the browser) shows the dropped detail as artifacts, so curves
+    # are not decimated by default (None).
+    decimation_tolerance = None
+
+    # (input points, output points) for the last decimated curve.
+    last_decimation = None
+
+    # Set True to draw curves from sequence (and plot_*) as one line element per segment
+    # instead of one polyline element per continuous run of points.
+    curve_segments = False
+
+    # Set True to name elements with integer identifiers allocated by the target
+    # (see ids.py) instead of "prefix*count" strings.  Batches get contiguous
+    # identifier ranges which are sent as a start and count.
+    integer_ids = False
+
+    # Set True to draw the elements named with each prefix inside a <g> group element
+    # (with targets which have add_group and do not set supports_groups False), so delete, hide, show and restyle of a
+    # prefix are one command and the elements inherit the group style.
+    grouped = False
+
     def __init__(self, target_canvas, scaling=1.0, x_scaling=None, y_scaling=None,
         x_offset=0.0, y_offset=0.0):
         canvas.load_javascript_support()
@@ -41,6 +73,58 @@ class Cartesian(object):
         self.target = target_canvas
         self.prefix_to_names = {}
         self.prefix_to_count = {}
+        # prefix for integer identifiers (with integer_ids).
+        self.id_index = ids.RangeIndex()
+        # prefix --> (group name, group style) with grouped.
+        self.prefix_to_group = {}
+        # prefix --> names of elements outside the group of the prefix.
+        self.prefix_to_loose = {}
+        # prefix --> transform matrix (canvas coordinates) of the prefix elements.
+        self.prefix_to_transform = {}
+        # prefix --> prefix of the enclosing group (see nest).
+        self.prefix_to_parent = {}
+        self.reset_stats(target=False)
+
+    def reset_stats(self, target=True):
+        "Reset the performance counters reported by stats() (and those of the target if target)."
+        self.stats_start = time.time()
+        self.drawing_calls = 0
+        self.elements_drawn = 0
+        self.broadcast_seconds = 0.0
+        self.project_seconds = 0.0
+        self.command_seconds = 0.0
+        reset = getattr(self.target, "reset_stats", None)
+        if target and reset is not None:
+            reset()
+
+    def stats(self):
+        """
+        Dictionary of performance counters since creation or reset_stats(): drawing calls
+        and elements, and the time spent broadcasting arguments, projecting coordinates
+        and building target commands (which includes sending them if the buffer fills).
+        The counters of the target are included as "target" if it keeps them.
+        """
+        result = {
+            "elapsed_seconds": time.time() - self.stats_start,
+            "drawing_calls": self.drawing_calls,
+            "elements_drawn": self.elements_drawn,
+            "broadcast_seconds": self.broadcast_seconds,
+            "project_seconds": self.project_seconds,
+            "command_seconds": self.command_seconds,
+        }
+        stats = getattr(self.target, "stats", None)
+        if stats is not None:
+            result["target"] = stats()
+        return result
+
+    def broadcast_arguments(self, numeric, other):
+        "broadcast_arguments for a drawing call, counted in stats()."
+        start = time.time()
+        result = broadcast_arguments(numeric, other)
+        self.broadcast_seconds += time.time() - start
+        self.drawing_calls += 1
+        self.elements_drawn += result[0]
+        return result
 
     def enable_events(self, events_string, callback):
         self.target.watch_event = events_string
@@ -66,19 +150,173 @@ class Cartesian(object):
         info["point"] = point
         # get the cartesian group name
         name = info.get("name", "")
-        info["group_name"] = name.split("*")[0]
+        if isinstance(name, int):
+            group_name = self.id_index.get(name)
+        else:
+            group_name = name.split("*")[0]
+        info["group_name"] = group_name
+        # the point in the world coordinates the target element was drawn in (see set_transform).
+        info["group_point"] = point
+        if self.prefix_to_transform:
+            info["group_point"] = self.group_point(group_name, cx, cy)
         callback(info)
 
     def get_prefixed_name(self, prefix):
         if prefix is None:
             return None   # unnamed object, do not assign a name.
-        assert "*" not in prefix, "name prefix must not contain '*'"
-        count = self.prefix_to_count.get(prefix, 0) + 1
-        self.prefix_to_count[prefix] = count
-        result = "%s*%s" % (prefix, count)
-        self.prefix_to_names.setdefault(prefix, set()).add(result)
+        if self.integer_ids:
+            result = self.prefixed_ids(prefix, 1)[0]
+        else:
+            assert "*" not in prefix, "name prefix must not contain '*'"
+            count = self.prefix_to_count.get(prefix, 0) + 1
+            self.prefix_to_count[prefix] = count
+            result = "%s*%s" % (prefix, count)
+            self.prefix_to_names.setdefault(prefix, []).append(result)
+        if self.grouped:
+            # names for varying prefixes are not drawn in groups.
+            self.prefix_to_loose.setdefault(prefix, []).append(result)
         return result
 
+    @contextlib.contextmanager
+    def drawing_group(self, prefixes, style_dicts):
+        """
+        With grouped, add the elements drawn in the context to the group of a shared
+        prefix, creating the group with style_dicts as its style if needed.
+        Yields the style for the elements: empty if they inherit it from the group.
+        The time in the context is counted as command_seconds in stats().
+        """
+        start = time.time()
+        try:
+            target = self.target
+            if (not self.grouped or prefixes is None or is_varying(prefixes) or
+                    getattr(target, "add_group", None) is None or not getattr(target, "supports_groups", True)):
+                yield style_dicts
+                return
+            prefix = prefixes
+            if prefix not in self.prefix_to_group:
+                self.add_prefix_group(prefix, {} if is_varying(style_dicts) else dict(style_dicts or {}))
+            (name, style) = self.prefix_to_group[prefix]
+            if not is_varying(style_dicts) and dict(style_dicts or {}) == style:
+                style_dicts = {}
+            previous = target.default_parent
+            target.default_parent = name
+            try:
+                yield style_dicts
+            finally:
+                target.default_parent = previous
+        finally:
+            self.command_seconds += time.time() - start
+
+    def add_prefix_group(self, prefix, style):
+        "Add the group element for prefix (inside the group of its parent prefix, see nest)."
+        target = self.target
+        parent = self.prefix_to_parent.get(prefix)
+        if parent is not None:
+            if parent not in self.prefix_to_group:
+                self.add_prefix_group(parent, {})
+            parent = self.prefix_to_group[parent][0]
+        if self.integer_ids:
+            name = target.allocate_ids(1)[0]
+            self.id_index.add(range(name, name + 1), prefix)
+        else:
+            assert "*" not in prefix, "name prefix must not contain '*'"
+            # element names of the prefix count from 1.
+            name = "%s*0" % prefix
+        atts = {}
+        transform = self.prefix_to_transform.get(prefix)
+        if transform is not None:
+            atts["transform"] = transforms2d.svg_transform(transform)
+        target.add_group(name, atts, style, parent)
+        self.prefix_to_group[prefix] = (name, style)
+
+    def nest(self, prefix, parent_prefix):
+        """
+        With grouped, draw the group of prefix inside the group of parent_prefix so
+        it also moves with the transform of the parent.  Call before drawing with prefix.
+        """
+        if prefix in self.prefix_to_group:
+            raise ValueError("the group for %s is already drawn" % repr(prefix))
+        ancestor = parent_prefix
+        while ancestor is not None:
+            if ancestor == prefix:
+                raise ValueError("a group cannot be nested in itself")
+            ancestor = self.prefix_to_parent.get(ancestor)
+        self.prefix_to_parent[prefix] = parent_prefix
+
+    def projection(self):
+        "The transform matrix from world coordinates to canvas coordinates."
+        return transforms2d.compose(
+            transforms2d.scale(self.x_scaling, self.y_scaling),
+            transforms2d.translate(self.x_offset, self.y_offset))
+
+    def set_transform(self, prefixes, transform, world=True):
+        """
+        Move, rotate or rescale the elements named with prefixes in the browser by a
+        transforms2d matrix without resending their points: one command per group
+        with grouped, otherwise one change of the transform attribute of the elements.
+        The transform is in world coordinates unless world is False (canvas coordinates)
+        and replaces any earlier transform; None removes it.
+        """
+        [prefixes] = unify_shapes(prefixes)
+        if transform is not None and world:
+            transform = transforms2d.conjugate(transform, self.projection())
+        value = "" if transform is None else transforms2d.svg_transform(transform)
+        target = self.target
+        for prefix in prefixes:
+            if transform is None:
+                self.prefix_to_transform.pop(prefix, None)
+            else:
+                self.prefix_to_transform[prefix] = transform
+            group = self.prefix_to_group.get(prefix)
+            if group is None:
+                self.change_names(self.element_names([prefix]), {"transform": value})
+            else:
+                target.change_element(group[0], {"transform": value})
+                self.change_names(self.prefix_to_loose.get(prefix, ()), {"transform": value})
+        self.check_buffer()
+
+    def canvas_transform(self, prefix):
+        "Transform (in canvas coordinates) of the elements named with prefix, including enclosing groups."
+        transform = transforms2d.identity()
+        while prefix is not None:
+            local = self.prefix_to_transform.get(prefix)
+            if local is not None:
+                transform = transforms2d.compose(transform, local)
+            prefix = self.prefix_to_parent.get(prefix)
+        return transform
+
+    def group_point(self, prefix, cx, cy):
+        "World coordinates before the transforms of prefix (see set_transform) of the canvas point (cx, cy)."
+        inverse = transforms2d.inverse(self.canvas_transform(prefix))
+        (x, y) = transforms2d.tapply(inverse, cx, cy)
+        return self.rproject(x, y)
+
+    def prefixed_ids(self, prefix, count):
+        "Allocate a range of count integer identifiers for elements named with prefix."
+        identifiers = self.target.allocate_ids(count)
+        if count:
+            ranges = self.prefix_to_names.setdefault(prefix, [])
+            if ranges and ranges[-1].stop == identifiers.start:
+                # extend the last range of the prefix.
+                self.id_index.remove(ranges[-1])
+                ranges[-1] = range(ranges[-1].start, identifiers.stop)
+            else:
+                ranges.append(identifiers)
+            self.id_index.add(ranges[-1], prefix)
+        return identifiers
+
+    def element_names(self, prefixes):
+        "Names of elements drawn with the prefixes in drawing order (a range if they are contiguous)."
+        p2n = self.prefix_to_names
+        names = []
+        for prefix in prefixes:
+            names.extend(p2n.get(prefix, ()))
+        if self.integer_ids:
+            if len(names) == 1:
+                return names[0]
+            return [identifier for identifiers in names for identifier in identifiers]
+        return names
+
     def delete(self, prefixes, strict=False):
         [prefixes] = unify_shapes(prefixes)
         if len(prefixes) == 0:
@@ -86,26 +324,107 @@ class Cartesian(object):
         p2n = self.prefix_to_names
         target = self.target
         for prefix in prefixes:
-            if prefix in p2n:
-                names = list(p2n[prefix])
-                target.delete_names(names)
+            group = self.prefix_to_group.get(prefix)
+            if group is not None:
+                # one command deletes the group and the elements (and groups) inside it.
+                target.delete_names([group[0]])
+                for inner in self.nested_prefixes(prefix):
+                    self.forget_group(inner)
+            elif prefix in p2n:
+                self.prefix_to_loose.pop(prefix, None)
+                self.prefix_to_transform.pop(prefix, None)
+                if self.integer_ids:
+                    for identifiers in p2n[prefix]:
+                        target.delete_names(identifiers)
+                        target.free_ids(identifiers)
+                        self.id_index.remove(identifiers)
+                else:
+                    names = list(p2n[prefix])
+                    target.delete_names(names)
                 del p2n[prefix]
             else:
                 if strict:
                     raise KeyError("no extant objects with this prefix " + repr(prefix))
         self.check_buffer()
 
+    def nested_prefixes(self, prefix):
+        "The prefix and the prefixes with groups drawn inside its group."
+        result = [prefix]
+        for (inner, parent) in list(self.prefix_to_parent.items()):
+            if parent == prefix and inner in self.prefix_to_group:
+                result.extend(self.nested_prefixes(inner))
+        return result
+
+    def forget_group(self, prefix):
+        "Forget the names of prefix after its group is deleted (deleting elements outside the group)."
+        target = self.target
+        p2n = self.prefix_to_names
+        (name, _) = self.prefix_to_group.pop(prefix)
+        self.prefix_to_transform.pop(prefix, None)
+        loose = self.prefix_to_loose.pop(prefix, None)
+        if loose:
+            target.delete_names(loose)
+        if self.integer_ids:
+            target.free_ids([name])
+            self.id_index.remove(range(name, name + 1))
+            for identifiers in p2n.pop(prefix, ()):
+                target.free_ids(identifiers)
+                self.id_index.remove(identifiers)
+        else:
+            p2n.pop(prefix, None)
+
     def change(self, prefixes, **attribute_dict):
+        """
+        Change attributes of the elements named with prefixes.
+        An attribute value may be a sequence or array with one value per element,
+        aligned with the elements of the prefixes in the order they were drawn;
+        per-element values are sent to the canvas as one columnar update.
+        """
+        [prefixes] = unify_shapes(prefixes)
+        names = self.element_names(prefixes)
+        self.change_names(names, attribute_dict)
+        self.check_buffer()
+
+    def change_names(self, names, attribute_dict, style_dict=None):
+        "Change attributes (sequences give one value per element) and style of named elements."
+        if len(names):
+            atts = {}
+            columns = {}
+            for (att, value) in attribute_dict.items():
+                if canvas.is_sequence(value):
+                    if len(value) != len(names):
+                        raise ValueError("%s has %s values for %s elements" % (att, len(value), len(names)))
+                    columns[att] = value
+                else:
+                    atts[att] = value
+            target = self.target
+            if getattr(target, "change_elements", None) is not None:
+                target.change_elements(names, columns, atts, style_dict)
+            else:
+                for (name, element_atts, _, _) in canvas.batch_rows(names, columns, atts):
+                    target.change_element(name, element_atts, style_dict)
+
+    def restyle(self, prefixes, **style):
+        "Change the style of the elements named with prefixes (one command per prefix with grouped)."
         [prefixes] = unify_shapes(prefixes)
-        p2n = self.prefix_to_names
         target = self.target
         for prefix in prefixes:
-            if prefix in p2n:
-                names = list(p2n[prefix])
-                for name in names:
-                    target.change_element(name, attribute_dict)
+            group = self.prefix_to_group.get(prefix)
+            if group is None:
+                self.change_names(self.element_names([prefix]), {}, style)
+            else:
+                target.change_element(group[0], {}, style)
+                self.change_names(self.prefix_to_loose.get(prefix, ()), {}, style)
         self.check_buffer()
 
+    def hide(self, prefixes):
+        "Hide the elements named with prefixes."
+        self.restyle(prefixes, display="none")
+
+    def unhide(self, prefixes):
+        "Show the elements hidden by hide."
+        self.restyle(prefixes, display="inline")
+
     def flush(self):
         self.target.send_commands()
 
@@ -138,6 +457,48 @@ class Cartesian(object):
             other_attributes = self.other_attributes.copy()
         return (color, event_cb, style_dict, other_attributes)
 
+    def get_prefixed_names(self, prefixes, count):
+        "Prefixed names for count elements (prefixes may be shared or vary)."
+        if is_varying(prefixes):
+            return [self.get_prefixed_name(prefix) for prefix in prefixes]
+        if prefixes is None:
+            return [None] * count
+        prefix = prefixes
+        if self.integer_ids:
+            return self.prefixed_ids(prefix, count)
+        assert "*" not in prefix, "name prefix must not contain '*'"
+        start = self.prefix_to_count.get(prefix, 0)
+        self.prefix_to_count[prefix] = start + count
+        result = ["%s*%s" % (prefix, i) for i in range(start + 1, start + count + 1)]
+        self.prefix_to_names.setdefault(prefix, []).extend(result)
+        return result
+
+    def batch_target(self, style_dicts, other_attributes):
+        """
+        Return True if elements can be sent to the target as one columnar batch:
+        the target must support add_elements and the style and other attribute
+        dictionaries must be shared by every element.
+        """
+        if not self.columnar or getattr(self.target, "add_elements", None) is None:
+            return False
+        return not (is_varying(style_dicts) or is_varying(other_attributes))
+
+    def batch_columns(self, other_attributes, **values):
+        """
+        Split projected values into (shared attributes, per-element columns).
+        Constant numeric arrays and values which do not vary are shared.
+        """
+        atts = other_attributes.copy()
+        columns = {}
+        for (att, column) in values.items():
+            if not is_varying(column):
+                atts[att] = column
+            elif column.dtype.kind == "f" and len(column) and column.min() == column.max():
+                atts[att] = float(column[0])
+            else:
+                columns[att] = column
+        return (atts, columns)
+
     def update_extrema(self, x, y):
         "Update extrema in world coordinates (before projection)."
         for (combine, att, value) in [(min, "min_x", x), (max, "max_x", x), (min, "min_y", y), (max, "max_y", y)]:
@@ -154,43 +515,135 @@ class Cartesian(object):
             fills, event_cbs, style_dicts, other_attributes)
         if rotate is None:
             rotate = self.rotate
-        (names, xs, ys, texts, fills, event_cbs, style_dicts, other_attributes) = unify_shapes(
-            names, xs, ys, texts, fills, event_cbs, style_dicts, other_attributes)
-        if len(names) == 0:
+        (n, (xs, ys), (names, texts, fills, event_cbs, style_dicts, other_attributes)) = self.broadcast_arguments(
+            (xs, ys), (names, texts, fills, event_cbs, style_dicts, other_attributes))
+        if n == 0:
             return
         if update:
             self.update_extrema(xs.max(), ys.max())
             self.update_extrema(xs.min(), ys.min())
         (xs, ys) = self.project(xs, ys)
         target = self.target
-        for (i, name) in enumerate(names):
-            name = self.get_prefixed_name(name)
-            sd = style_dicts[i].copy()
-            oa = other_attributes[i].copy()
-            x = xs[i]
-            y = ys[i]
-            if rotate:
-                # Note: rotattion is inverted because Y is inverted.
-                rotation = "rotate(%s %s %s)" % (-rotate, x, y)
-                oa["transform"] = rotation
-            target.text(name, x, y, texts[i], fills[i], event_cbs[i], 
-                sd, **oa)
-        self.check_buffer()
+        with self.drawing_group(names, style_dicts) as style_dicts:
+            names = self.get_prefixed_names(names, n)
+            if self.batch_target(style_dicts, other_attributes):
+                (atts, columns) = self.batch_columns(other_attributes, x=xs, y=ys, fill=fills)
+                if rotate:
+                    # Note: rotattion is inverted because Y is inverted.
+                    columns["transform"] = ["rotate(%s %s %s)" % (-rotate, x, y) for (x, y) in zip(xs, ys)]
+                target.add_elements(names, "text", columns, atts, style_dicts.copy(), texts,
+                    event_callbacks=event_cbs)
+                self.check_buffer()
+                return
+            (xs, ys) = (xs.tolist(), ys.tolist())
+            for (i, name) in enumerate(names):
+                sd = element(style_dicts, i).copy()
+                oa = element(other_attributes, i).copy()
+                x = xs[i]
+                y = ys[i]
+                if rotate:
+                    # Note: rotattion is inverted because Y is inverted.
+                    rotation = "rotate(%s %s %s)" % (-rotate, x, y)
+                    oa["transform"] = rotation
+                target.text(name, x, y, element(texts, i), element(fills, i), element(event_cbs, i), 
+                    sd, **oa)
+            self.check_buffer()
 
     text = texts # alias
 
     def sequence(self, names, xs, ys, colors=None, widths=None,
-        event_cbs=None, style_dicts=None, other_attributes=None, update=True):
-        (xs, ys) = unify_shapes(xs, ys)
-        if len(xs) == 0:
+        event_cbs=None, style_dicts=None, other_attributes=None, update=True, segments=None):
+        """
+        Draw the curve through the points (xs, ys).  By default each continuous run of
+        finite points becomes one polyline element.  Per-segment line elements are used
+        if segments (or self.curve_segments) is true or any style argument varies per segment.
+        """
+        if segments is None:
+            segments = self.curve_segments
+        (n, (xs, ys), _) = self.broadcast_arguments((xs, ys), ())
+        if n == 0:
             return
-        x1s = xs[:-1]
-        y1s = ys[:-1]
-        x2s = xs[1:]
-        y2s = ys[1:]
+        per_segment = [colors, widths, event_cbs, style_dicts, other_attributes]
+        varying = any(canvas.is_sequence(x) and len(x) > 1 for x in per_segment)
+        if self.decimation_tolerance is not None and not varying:
+            (xs, ys) = self.decimate_curve(xs, ys)
+        if not (segments or varying):
+            if getattr(self.target, "polyline", None) is not None:
+                # length 1 sequences are shared by every segment.
+                (names, colors, widths, event_cbs, style_dicts, other_attributes) = [
+                    x[0] if canvas.is_sequence(x) and len(x) == 1 else x
+                    for x in [names] + per_segment]
+                return self.polylines(names, xs, ys, colors, widths, event_cbs, style_dicts,
+                    other_attributes, update)
+        # skip segments with a non-finite end point
+        finite = np.isfinite(xs) & np.isfinite(ys)
+        keep = finite[:-1] & finite[1:]
+        if not keep.all():
+            (colors, widths, event_cbs, style_dicts, other_attributes) = [
+                select_segments(x, keep) for x in per_segment]
+        x1s = xs[:-1][keep]
+        y1s = ys[:-1][keep]
+        x2s = xs[1:][keep]
+        y2s = ys[1:][keep]
         return self.lines(names, x1s, y1s, x2s, y2s, colors, widths,
             event_cbs, style_dicts, other_attributes, update)
 
+    def pixel_size(self):
+        "The size of one display pixel in canvas (viewBox) units, or None if unknown."
+        target = self.target
+        try:
+            [_, _, width, height] = [float(x) for x in target.viewBox.split()]
+        except (AttributeError, ValueError):
+            return None
+        display_width = getattr(target, "svg_width", None)
+        if display_width is None:
+            # fake_svg canvases scale the smaller side to the image dimension.
+            dimension = getattr(target, "dimension", None)
+            if dimension is None:
+                return None
+            display_width = dimension * width / min(width, height)
+        if not (width > 0 and display_width > 0):
+            return None
+        return width / float(display_width)
+
+    def decimate_curve(self, xs, ys):
+        """
+        Drop points of the curve (xs, ys) which do not change its appearance at the current
+        zoom, keeping the first, last, lowest and highest point in each
+        decimation_tolerance pixel wide column (or pixel cell if x is not monotone).
+        Records (input points, output points) in self.last_decimation.
+        """
+        pixel = self.pixel_size()
+        if pixel is None or len(xs) < 3:
+            return (xs, ys)
+        (pxs, pys) = self.project(xs, ys)
+        keep = decimation_indices(pxs, pys, pixel * self.decimation_tolerance)
+        self.last_decimation = (len(xs), len(keep))
+        return (xs[keep], ys[keep])
+
+    def polylines(self, names, xs, ys, color=None, width=None,
+        event_cb=None, style_dict=None, other_attributes=None, update=True):
+        "Draw one polyline element for each continuous run of finite points in (xs, ys)."
+        (color, event_cb, style_dict, other_attributes) = self.override_defaults(
+            color, event_cb, style_dict, other_attributes)
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        runs = finite_runs(xs, ys)
+        if not runs:
+            return
+        if update:
+            finite = np.isfinite(xs) & np.isfinite(ys)
+            self.update_extrema(xs[finite].max(), ys[finite].max())
+            self.update_extrema(xs[finite].min(), ys[finite].min())
+        (pxs, pys) = self.project(xs, ys)
+        points = np.column_stack([pxs, pys])
+        with self.drawing_group(names, style_dict) as style_dict:
+            names = self.get_prefixed_names(names, len(runs))
+            target = self.target
+            for (name, (start, end)) in zip(names, runs):
+                target.polyline(name, points[start:end], color, width, event_cb, style_dict, **other_attributes)
+            self.check_buffer()
+
     def parameterized_curve(self, name, f, min_t, max_t, npoints, color=None, width=None, style_dict=None):
         points = parameterized_points(f, min_t, max_t, npoints)
         xs = points[:,0]
@@ -220,9 +673,9 @@ class Cartesian(object):
         event_cbs=None, style_dicts=None, other_attributes=None, update=True):
         (colors, event_cbs, style_dicts, other_attributes) = self.override_defaults(
             colors, event_cbs, style_dicts, other_attributes)
-        (names, x1s, y1s, x2s, y2s, colors, widths, event_cbs, style_dicts, other_attributes) = unify_shapes(
-            names, x1s, y1s, x2s, y2s, colors, widths, event_cbs, style_dicts, other_attributes)
-        if len(names) == 0:
+        (n, (x1s, y1s, x2s, y2s), (names, colors, widths, event_cbs, style_dicts, other_attributes)) = (
+            self.broadcast_arguments((x1s, y1s, x2s, y2s), (names, colors, widths, event_cbs, style_dicts, other_attributes)))
+        if n == 0:
             return
         if update:
             for (xs, ys) in ((x1s, y1s), (x2s, y2s)):
@@ -231,36 +684,82 @@ class Cartesian(object):
         (x1s, y1s) = self.project(x1s, y1s)
         (x2s, y2s) = self.project(x2s, y2s)
         target = self.target
-        for (i, name) in enumerate(names):
-            name = self.get_prefixed_name(name)
-            target.line(name, x1s[i], y1s[i], x2s[i], y2s[i], colors[i], widths[i],
-                event_cbs[i], style_dicts[i], **other_attributes[i])
-        self.check_buffer()
+        with self.drawing_group(names, style_dicts) as style_dicts:
+            names = self.get_prefixed_names(names, n)
+            if not is_varying(widths) and self.batch_target(style_dicts, other_attributes):
+                (atts, columns) = self.batch_columns(other_attributes, x1=x1s, y1=y1s, x2=x2s, y2=y2s, stroke=colors)
+                if widths:
+                    atts[canvas.WIDTH] = widths
+                target.add_elements(names, "line", columns, atts, style_dicts, event_callbacks=event_cbs)
+                self.check_buffer()
+                return
+            (x1s, y1s, x2s, y2s) = (x1s.tolist(), y1s.tolist(), x2s.tolist(), y2s.tolist())
+            for (i, name) in enumerate(names):
+                target.line(name, x1s[i], y1s[i], x2s[i], y2s[i], element(colors, i), element(widths, i),
+                    element(event_cbs, i), element(style_dicts, i), **element(other_attributes, i))
+            self.check_buffer()
 
     line = lines # alias
 
     def change_circles(self, prefix, cx=None, cy=None, r=None, **other_attributes):
+        """
+        Change the circles named with prefix.  cx, cy, r and other attributes may be
+        arrays with one value per circle (see change); positions are projected in one operation.
+        """
         atts = other_attributes.copy()
-        # refactor???
         if cx is not None:
-            (cx, _) = self.project(cx, 0)
+            (cx, _) = self.project(numeric_values(cx), 0)
             atts["cx"] = cx
         if cy is not None:
-            (_, cy) = self.project(0, cy)
+            (_, cy) = self.project(0, numeric_values(cy))
             atts["cy"] = cy
         if r is not None:
-            (r, _) = self.scale(r, 0)
+            (r, _) = self.scale(numeric_values(r), 0)
             r = abs(r)
             atts["r"] = r
         self.change(prefix, **atts)
 
+    def animate_circles(self, prefix, times, cxs=None, cys=None, rs=None, name=None, loop=False,
+            easing="linear", play=True, callback=None, **other_attributes):
+        """
+        Animate the circles named with prefix in the browser: cxs, cys, rs and other
+        attributes give one entry per keyframe time, either a value shared by all
+        circles or an array with one value per circle.  Positions and radii are projected
+        in one operation.  The timeline is named name (default the prefix) and played
+        unless play is False.  Returns the animation.Timeline.
+        """
+        names = self.element_names([prefix])
+        timeline = animation.Timeline(loop=loop)
+        tracks = [("cx", cxs, 0), ("cy", cys, 1), ("r", rs, None)]
+        for (att, values, axis) in tracks:
+            if values is None:
+                continue
+            values = np.asarray(values, dtype=np.float64)
+            if axis is None:
+                values = np.abs(self.scale(values, 0)[0])
+            elif axis == 0:
+                values = self.project(values, 0)[0]
+            else:
+                values = self.project(0, values)[1]
+            timeline.track(names, att, times, values, easing)
+        for (att, values) in other_attributes.items():
+            timeline.track(names, att, times, values, easing)
+        if name is None:
+            name = prefix
+        target = self.target
+        target.define_timeline(name, timeline)
+        if play:
+            target.play_timeline(name, callback=callback)
+        self.check_buffer()
+        return timeline
+
     def circles(self, names, cxs, cys, rs, fills=None, event_cbs=None, style_dicts=None,
               other_attributes=None, update=True):
         (fills, event_cbs, style_dicts, other_attributes) = self.override_defaults(
             fills, event_cbs, style_dicts, other_attributes)
-        (names, cxs, cys, rs, fills, event_cbs, style_dicts, other_attributes) = unify_shapes(
-            names, cxs, cys, rs, fills, event_cbs, style_dicts, other_attributes)
-        if len(names) == 0:
+        (n, (cxs, cys, rs), (names, fills, event_cbs, style_dicts, other_attributes)) = self.broadcast_arguments(
+            (cxs, cys, rs), (names, fills, event_cbs, style_dicts, other_attributes))
+        if n == 0:
             return
         if update:
             self.update_extrema(cxs.max(), cys.max())
@@ -269,11 +768,18 @@ class Cartesian(object):
         # XXXX use x scaling to convert the radii???
         (rs, _) = map(np.abs, self.scale(rs, 0))
         target = self.target
-        for (i, name) in enumerate(names):
-            name = self.get_prefixed_name(name)
-            target.circle(name, cxs[i], cys[i], rs[i], fills[i], event_cbs[i], style_dicts[i],
-                **other_attributes[i])
-        self.check_buffer()
+        with self.drawing_group(names, style_dicts) as style_dicts:
+            names = self.get_prefixed_names(names, n)
+            if self.batch_target(style_dicts, other_attributes):
+                (atts, columns) = self.batch_columns(other_attributes, cx=cxs, cy=cys, r=rs, fill=fills)
+                target.add_elements(names, "circle", columns, atts, style_dicts, event_callbacks=event_cbs)
+                self.check_buffer()
+                return
+            (cxs, cys, rs) = (cxs.tolist(), cys.tolist(), rs.tolist())
+            for (i, name) in enumerate(names):
+                target.circle(name, cxs[i], cys[i], rs[i], element(fills, i), element(event_cbs, i),
+                    element(style_dicts, i), **element(other_attributes, i))
+            self.check_buffer()
 
     circle = circles # alias
 
@@ -283,31 +789,43 @@ class Cartesian(object):
             other_attributes=None, update=True):
         (fills, event_cbs, style_dicts, other_attributes) = self.override_defaults(
             fills, event_cbs, style_dicts, other_attributes)
-        (names, xs_w, ys_w, widths_w, heights_w, fills, event_cbs, style_dicts, other_attributes) = unify_shapes(
-            names, xs, ys, widths, heights, fills, event_cbs, style_dicts, other_attributes)
-        if len(names) == 0:
+        (n, (xs_w, ys_w, widths_w, heights_w), (names, fills, event_cbs, style_dicts, other_attributes)) = (
+            self.broadcast_arguments((xs, ys, widths, heights), (names, fills, event_cbs, style_dicts, other_attributes)))
+        if n == 0:
             return
         (xs, ys) = self.project(xs_w, ys_w)
         (widths, heights) = map(np.abs, self.scale(widths_w, heights_w))
         if self.y_scaling < 0:
             # invert the height
             ys = ys - heights
+        if update:
+            for (ex, ey) in ((xs_w + widths_w, ys_w + heights_w), (xs_w, ys_w)):
+                self.update_extrema(ex.max(), ey.max())
+                self.update_extrema(ex.min(), ey.min())
         target = self.target
-        for (i, name) in enumerate(names):
-            name = self.get_prefixed_name(name)
-            if update:
-                self.update_extrema(xs_w[i] + widths_w[i], ys_w[i] + heights_w[i])
-                self.update_extrema(xs_w[i], ys_w[i])
-            target.rect(name, xs[i], ys[i], widths[i], heights[i], fills[i], event_cbs[i], style_dicts[i],
-                **other_attributes[i])
-        self.check_buffer()
+        with self.drawing_group(names, style_dicts) as style_dicts:
+            names = self.get_prefixed_names(names, n)
+            if self.batch_target(style_dicts, other_attributes):
+                (atts, columns) = self.batch_columns(other_attributes, x=xs, y=ys, width=widths, height=heights,
+                    fill=fills)
+                target.add_elements(names, "rect", columns, atts, style_dicts, event_callbacks=event_cbs)
+                self.check_buffer()
+                return
+            (xs, ys, widths, heights) = (xs.tolist(), ys.tolist(), widths.tolist(), heights.tolist())
+            for (i, name) in enumerate(names):
+                target.rect(name, xs[i], ys[i], widths[i], heights[i], element(fills, i), element(event_cbs, i),
+                    element(style_dicts, i), **element(other_attributes, i))
+            self.check_buffer()
 
     rect = rects # alias
 
     def project(self, x, y):
         "Convert world space x and y to canvas coordinates"
+        start = time.time()
         (sx, sy) = self.scale(x, y)
-        return (sx + self.x_offset, sy + self.y_offset)
+        result = (sx + self.x_offset, sy + self.y_offset)
+        self.project_seconds += time.time() - start
+        return result
 
     def rproject(self, cx, cy):
         "Convert canvas coordinates to world space coordinates."
@@ -323,6 +841,16 @@ class Cartesian(object):
         "Inverse x, y scaling."
         return (sx / self.x_scaling, sy / self.y_scaling)
 
+    def view_extrema(self):
+        """
+        (min_x, min_y, max_x, max_y) in world coordinates of the region in the target
+        view (which follows pan and zoom in the browser with target.pan_zoom).
+        """
+        target = self.target
+        (x0, y0) = self.rproject(target.view_minx, target.view_miny)
+        (x1, y1) = self.rproject(target.view_minx + target.view_width, target.view_miny + target.view_height)
+        return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
     def fit(self):
         "fit the target to the drawn elements"
         self.target.fit()
@@ -417,6 +945,13 @@ class Cartesian(object):
 
     def empty(self):
         self.target.empty()
+        self.prefix_to_group = {}
+        self.prefix_to_loose = {}
+        self.prefix_to_transform = {}
+        if self.integer_ids:
+            # the target reset its identifiers: forget the old ranges.
+            self.prefix_to_names = {}
+            self.id_index.clear()
         self.check_buffer()
 
     def default_extrema(self, min_x, min_y, max_x, max_y):
@@ -430,87 +965,45 @@ class Cartesian(object):
             max_y = self.max_y
         return (min_x, min_y, max_x, max_y)
 
-    def plot_y(self, f_y, min_x=None, max_x=None, dx=None, npoints=200, min_y=None, max_y=None, name=None):
+    def plot_y(self, f_y, min_x=None, max_x=None, dx=None, npoints=200, min_y=None, max_y=None, name=None,
+        vectorized=None):
         """
         Plot y = f_y(x) between min_x and max_x, skipping exceptions.
+        f_y is applied to an array of all x values at once unless vectorized is False,
+        falling back to one call per x value if that fails (unless vectorized is True).
         """
-        xs = []
-        ys = []
         (min_x, min_y, max_x, max_y) = self.default_extrema(min_x, min_y, max_x, max_y)
         if dx is None:
             dx = (max_x - min_x) * 1.0 / npoints
-        def emit():
-            if xs:
-                self.sequence(name, xs, ys)
-            xs[:] = []
-            ys[:] = []
-        x = min_x
-        while x < max_x:
-            try:
-                y = f_y(x)
-            except Exception:
-                emit()
-            else:
-                if y > min_y and y < max_y:
-                    xs.append(x)
-                    ys.append(y)
-                else:
-                    emit()
-            x += dx
-        emit()
+        xs = sample_range(min_x, max_x, dx)
+        ys = vector_evaluate(f_y, xs, vectorized)
+        with np.errstate(invalid="ignore"):
+            ys[~((ys > min_y) & (ys < max_y))] = np.nan
+        self.sequence(name, xs, ys)
 
-    def plot_x(self, f_x, min_y=None, max_y=None, dy=None, npoints=200, min_x=None, max_x=None, name=None):
+    def plot_x(self, f_x, min_y=None, max_y=None, dy=None, npoints=200, min_x=None, max_x=None, name=None,
+        vectorized=None):
         """
-        Plot y = f_y(x) between min_x and max_x, skipping exceptions.
+        Plot x = f_x(y) between min_y and max_y, skipping exceptions.
+        See plot_y for the vectorized option.
         """
-        # XXX someday maybe refactor for common functionality
-        xs = []
-        ys = []
         (min_x, min_y, max_x, max_y) = self.default_extrema(min_x, min_y, max_x, max_y)
         if dy is None:
             dy = (max_y - min_y) * 1.0 / npoints
-        def emit():
-            if xs:
-                self.sequence(name, xs, ys)
-            xs[:] = []
-            ys[:] = []
-        y = min_y
-        while y < max_y:
-            try:
-                x = f_x(y)
-            except Exception:
-                emit()
-            else:
-                if x > min_x and x < max_x:
-                    xs.append(x)
-                    ys.append(y)
-                else:
-                    emit()
-            y += dy
-        emit()
+        ys = sample_range(min_y, max_y, dy)
+        xs = vector_evaluate(f_x, ys, vectorized)
+        with np.errstate(invalid="ignore"):
+            xs[~((xs > min_x) & (xs < max_x))] = np.nan
+        self.sequence(name, xs, ys)
 
-    def plot_t(self, f_xy, t0, dt, npoints, name=None):
+    def plot_t(self, f_xy, t0, dt, npoints, name=None, vectorized=None):
         """
         Parametric plot (x,y) = f_xy(t) for t from t0 incrementing dt npoints times.
+        See plot_y for the vectorized option (f_xy should then return a pair of arrays).
         """
-        xs = []
-        ys = []
-        def emit():
-            if xs:
-                self.sequence(name, xs, ys)
-            xs[:] = []
-            ys[:] = []
-        t = t0
-        for i in xrange(npoints):
-            try:
-                (x, y) = f_xy(t)
-            except Exception:
-                emit()
-            else:
-                xs.append(x)
-                ys.append(y)
-            t += dt
-        emit()
+        ts = t0 + dt * np.arange(npoints)
+        (xs, ys) = vector_evaluate(f_xy, ts, vectorized, width=2)
+        self.sequence(name, xs, ys)
 
 
 def doodle(xmin, ymin, xmax, ymax, html_width=500, html_height=None, margin=50, svg=None):
@@ -549,8 +1042,60 @@ def sdoodle(xmin, ymin, xmax, ymax, html_width=500, html_height=None, margin=50)
     return doodle(xmin, ymin, xmax, ymax, html_width, html_height, margin, svg=svg)
 
 # utilities
+def is_varying(value):
+    "True if value is a per-element array produced by broadcast_arguments."
+    return isinstance(value, np.ndarray)
+
+def numeric_values(value):
+    "Float array for a sequence of numbers (other values are returned as is)."
+    if canvas.is_sequence(value):
+        return np.asarray(value, dtype=np.float64)
+    return value
+
+def element(value, i):
+    "The i'th element of a broadcast argument (shared values are returned as is)."
+    if isinstance(value, np.ndarray):
+        return value[i]
+    return value
+
+def broadcast_arguments(numeric, other):
+    """
+    Broadcast drawing arguments to a common length without boxing numbers.
+
+    Each numeric argument becomes a contiguous float array of the common length.
+    Other arguments (names, colors, callbacks, dictionaries) which are not lists,
+    tuples or arrays are shared and returned unchanged; length 1 sequences are
+    unwrapped and shared, and only longer sequences become object arrays.
+
+    Returns (length, numeric_arrays, other_values).
+    """
+    numeric = [np.ravel(np.asarray(x, dtype=np.float64)) for x in numeric]
+    other = list(other)
+    lengths = set(len(x) for x in numeric)
+    for (i, x) in enumerate(other):
+        if isinstance(x, (list, tuple, np.ndarray)):
+            if len(x) == 1:
+                other[i] = x[0]
+            else:
+                lengths.add(len(x))
+    lengths.discard(1)
+    if not lengths:
+        length = 1
+    elif len(lengths) == 1:
+        [length] = lengths
+    else:
+        raise ValueError("arguments cannot be broadcast to a common length: " + repr(sorted(lengths)))
+    numeric = [np.ascontiguousarray(np.broadcast_to(x, (length,))) for x in numeric]
+    for (i, x) in enumerate(other):
+        if isinstance(x, (list, tuple, np.ndarray)):
+            z = np.empty((length,), dtype=object)
+            for (j, value) in enumerate(x):
+                z[j] = value
+            other[i] = z
+    return (length, numeric, other)
+
 def unify_shapes(*args):
-    arrays = [np.array(x, np.object) for x in args]
+    arrays = [np.array(x, object) for x in args]
     max_shape = ()
     for a in arrays:
         s = a.shape
@@ -566,6 +1111,100 @@ def unify_shapes(*args):
         result.append(z)
     return result
 
+def select_segments(value, keep):
+    "Select the entries of a per-segment argument where keep is true (shared values pass through)."
+    if canvas.is_sequence(value) and len(value) > 1:
+        return [x for (x, k) in zip(value, keep) if k]
+    return value
+
+def sample_range(start, stop, step):
+    "Values start + i * step which are less than stop (computed without accumulated drift)."
+    count = max(int(math.ceil((stop - start) * 1.0 / step)), 0)
+    values = start + step * np.arange(count + 1, dtype=np.float64)
+    return values[values < stop]
+
+def vector_evaluate(f, values, vectorized=None, width=None):
+    """
+    Evaluate f at every entry of values as a float array with NaN where f fails.
+    If width is given f returns width-tuples and the result has shape (width, len(values)).
+    f is first applied to the whole array unless vectorized is False; if that raises
+    or gives the wrong shape f is applied to one value at a time unless vectorized is True.
+    """
+    shape = values.shape
+    if width is not None:
+        shape = (width,) + shape
+    if vectorized is not False:
+        try:
+            with np.errstate(all="ignore"):
+                result = np.asarray(f(values), dtype=np.float64)
+            if result.shape != shape:
+                raise ValueError("vectorized result shape %s, expected %s" % (result.shape, shape))
+            return result.copy()
+        except Exception:
+            if vectorized:
+                raise
+    result = np.empty(shape[::-1], dtype=np.float64)
+    for (i, value) in enumerate(values.tolist()):
+        try:
+            result[i] = f(value)
+        except Exception:
+            result[i] = np.nan
+    return result.T.copy()
+
+def decimation_indices(xs, ys, tolerance):
+    """
+    Indices of the points of the curve (xs, ys) needed to draw it to within tolerance.
+    Runs of finite points with monotone xs keep the first, last, minimum and maximum y
+    point of each tolerance wide column of x.  Other runs drop consecutive points in
+    the same tolerance / sqrt(2) sized cell.  The first non-finite point between runs
+    is kept as a break.
+    """
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    breaks = np.flatnonzero(~finite & np.concatenate([[True], finite[:-1]]))
+    indices = [breaks]
+    for (start, end) in finite_runs(xs, ys):
+        rx = xs[start:end]
+        ry = ys[start:end]
+        dx = np.diff(rx)
+        if (dx >= 0).all() or (dx <= 0).all():
+            columns = np.floor(np.abs(rx - rx[0]) / tolerance)
+            kept = column_extrema(columns, ry)
+        else:
+            cell = tolerance / math.sqrt(2)
+            cx = np.floor(rx / cell)
+            cy = np.floor(ry / cell)
+            moved = (np.diff(cx) != 0) | (np.diff(cy) != 0)
+            kept = np.concatenate([[0], np.flatnonzero(moved) + 1, [end - start - 1]])
+        indices.append(kept + start)
+    # isolated finite points draw nothing but keep them as they were.
+    isolated = finite & ~np.concatenate([[False], finite[:-1]]) & ~np.concatenate([finite[1:], [False]])
+    indices.append(np.flatnonzero(isolated))
+    return np.unique(np.concatenate(indices).astype(np.intp))
+
+def column_extrema(columns, ys):
+    "Indices of the first, last, minimum and maximum ys for each run of equal (sorted) columns."
+    starts = np.flatnonzero(np.concatenate([[True], np.diff(columns) != 0]))
+    ends = np.concatenate([starts[1:], [len(columns)]]) - 1
+    counts = ends - starts + 1
+    result = [starts, ends]
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(ys, starts), counts)
+        hits = np.flatnonzero(ys == extreme)
+        (_, first) = np.unique(np.repeat(np.arange(len(starts)), counts)[hits], return_index=True)
+        result.append(hits[first])
+    return np.concatenate(result)
+
+def finite_runs(xs, ys):
+    """
+    (start, end) index pairs of the runs of at least 2 consecutive points
+    where both xs and ys are finite.
+    """
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    edges = np.diff(np.concatenate([[0], finite.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [(start, end) for (start, end) in zip(starts.tolist(), ends.tolist()) if end - start > 1]
+
 def tick(x, y, maxlen=10):
     "Compute axis tick locations."
     assert x < y
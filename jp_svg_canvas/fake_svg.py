@@ -13,13 +13,28 @@ Notebooks.
 
 from IPython.display import display, HTML
 from . import canvas
+import numpy as np
+import base64
 import json
 
+try:
+    unicode
+except NameError:
+    # Python 3
+    unicode = str
+
 EMBEDDING_COUNT = [0]
 
+# Most primitives merged into one canvas path before it is stroked or filled.
+MAX_PATH_LENGTH = 1000
+
 class FakeCanvasWidget(object):
 
-    def __init__(self, viewBox, filename="diagram.png", format="image/png", dimension=800):
+    # Number of decimals (in viewBox units) kept for numeric arguments, or None for full precision.
+    precision = None
+
+    def __init__(self, viewBox, filename="diagram.png", format="image/png", dimension=800,
+            typed_arrays=False):
         """
         Fake SVG canvas which writes to an HTML5 canvas.
         This object is "write once" and does not support updates or interactions.
@@ -40,6 +55,10 @@ class FakeCanvasWidget(object):
 
         dimension: int 
             The size of the largest dimension for the image.
+
+        typed_arrays: bool
+            If true, primitive geometry is embedded once as base64 Float32Array
+            data drawn by loops in the page instead of one statement per call.
         """
         self.dimension = dimension
         self.viewBox = viewBox
@@ -50,18 +69,96 @@ class FakeCanvasWidget(object):
         self.font_style = ""
         self.filename = filename
         self.format = format
+        # context property --> value last assigned (to skip redundant assignments)
+        self.context_state = {}
+        # (painting command, style) of the open path which primitives are merged into, or None
+        self.path_key = None
+        self.path_length = 0
+        self.typed_arrays = typed_arrays
+        # geometry numbers for typed array mode and the pending (draw function, start) run
+        self.geometry = []
+        self.geometry_run = None
 
     def _add(self, command, *args):
+        self._end_geometry()
         self.canvas_commands.append(self._call(command, *args))
 
+    def _geometry(self, draw, *values):
+        """
+        Add primitive geometry drawn by the page function draw (see DRAW_TEMPLATE).
+        Consecutive values for the same function are drawn by one loop.
+        """
+        run = self.geometry_run
+        if run is None or run[0] != draw:
+            self._end_geometry()
+            self.geometry_run = (draw, len(self.geometry))
+        self.geometry.extend(values)
+
+    def _end_geometry(self):
+        "Add the statement drawing the pending geometry run."
+        run = self.geometry_run
+        if run is not None:
+            self.geometry_run = None
+            (draw, start) = run
+            self.canvas_commands.append("%s(%s, %s);" % (draw, start, len(self.geometry)))
+
+    def geometry_data(self):
+        "Base64 little endian Float32Array data of the geometry for typed array mode."
+        data = np.asarray(self.geometry, dtype="<f4")
+        return base64.b64encode(data.tobytes()).decode("ascii")
+
     def _call(self, command, *args):
-        arglist = ", ".join(repr(arg) for arg in args)
+        digits = self.precision
+        arglist = ", ".join(repr(canvas.round_value(arg, digits)) for arg in args)
         fmt = "%s(%s);" % (command, arglist)
         return fmt
 
     def _assign(self, lhs, rhs):
+        self._end_geometry()
         self.canvas_commands.append(self._assignment(lhs, rhs))
 
+    def _set(self, lhs, rhs):
+        "Assign a context property unless it already has the value."
+        state = self.context_state
+        if lhs not in state or state[lhs] != rhs:
+            state[lhs] = rhs
+            self._assign(lhs, rhs)
+
+    def _set_line_dash(self, dash):
+        state = self.context_state
+        if state.get("lineDash") != dash:
+            state["lineDash"] = dash
+            self._add("ctx.setLineDash", dash)
+
+    def _begin_path(self, painter, style):
+        """
+        Start a primitive painted by painter ("ctx.stroke" or "ctx.fill") with style,
+        a tuple of the context settings it needs.  Consecutive primitives with the
+        same painter and style share a path (except translucent ones, where merging
+        would change how overlaps are blended).  Returns True if the caller must set
+        the style because a new path was started.
+        """
+        key = (painter, style)
+        if key == self.path_key and self.path_length < MAX_PATH_LENGTH:
+            self.path_length += 1
+            return False
+        self._end_path()
+        self._add("ctx.beginPath")
+        if not any(translucent(value) for value in style):
+            self.path_key = key
+            self.path_length = 1
+        else:
+            # paint right away on the next primitive.
+            self.path_key = (painter, None)
+        return True
+
+    def _end_path(self):
+        "Paint the open path, if any."
+        if self.path_key is not None:
+            self._add(self.path_key[0])
+            self.path_key = None
+            self.path_length = 0
+
     def _assignment(self, lhs, rhs):
         if type(rhs) is unicode:
             rhs = str(rhs)
@@ -100,18 +197,19 @@ class FakeCanvasWidget(object):
         fs = self.font_style = style_dict.get("font-style", self.font_style)
         w = self.font_weight = style_dict.get("font-weight", self.font_weight)
         s = self.font_size = style_dict.get("font-size", self.font_size)
-        self._assign("ctx.font", "%s %s %spx %s" % (fs, w, s, f))
-        self._assign("ctx.fillStyle", fill)
+        self._end_path()
+        self._set("ctx.font", "%s %s %spx %s" % (fs, w, s, f))
+        self._set("ctx.fillStyle", fill)
         ta = style_dict.get("text-anchor", "start")
         if ta == "middle":
             ta = "center"
-        self._assign("ctx.textAlign", ta)
+        self._set("ctx.textAlign", ta)
         self._add("ctx.fillText", text, x, y)
         stroke = style_dict.get("stroke")
         stroke_width = style_dict.get("stroke-width")
         if stroke and stroke_width:
-            self._assign("ctx.lineWidth", stroke_width)
-            self._assign("ctx.strokeStyle", stroke)
+            self._set("ctx.lineWidth", stroke_width)
+            self._set("ctx.strokeStyle", stroke)
             self._add("ctx.strokeText", text, x, y)
 
     def line(self, name, x1, y1, x2, y2, color="black", width=1, 
@@ -127,33 +225,74 @@ class FakeCanvasWidget(object):
             color = other_attributes[canvas.STROKE]
         if canvas.WIDTH in other_attributes:
             width = other_attributes[canvas.WIDTH]
-        self._add("ctx.beginPath")
-        self._assign("ctx.strokeStyle", color)
-        self._add("ctx.setLineDash", json.loads(dash))
-        self._assign("ctx.lineWidth", width)
+        self._stroke_style(color, dash, width)
+        if self.typed_arrays:
+            self._geometry("draw_lines", x1, y1, x2, y2)
+            return
         self._add("ctx.moveTo", x1, y1)
         self._add("ctx.lineTo", x2, y2)
-        self._add("ctx.stroke")
+
+    def _stroke_style(self, color, dash, width):
+        "Begin (or continue) a stroked path with the given stroke settings."
+        if self._begin_path("ctx.stroke", (color, dash, width)):
+            self._set("ctx.strokeStyle", color)
+            self._set_line_dash(json.loads(dash))
+            self._set("ctx.lineWidth", width)
+
+    def polyline(self, name, points, color="black", width=1, event_cb=None, style_dict=None,
+            **other_attributes):
+        dash = "[]"
+        if canvas.DASHARRAY in other_attributes:
+            array_str = other_attributes[canvas.DASHARRAY]
+            dash = "[%s]" % array_str
+        if canvas.WIDTH in other_attributes:
+            width = other_attributes[canvas.WIDTH]
+        if not width:
+            width = 1
+        points = [(float(x), float(y)) for (x, y) in points]
+        if not points:
+            return
+        self._stroke_style(color, dash, width)
+        if self.typed_arrays:
+            # one run per polyline: the run delimits the points.
+            self._end_geometry()
+            self._geometry("draw_polyline", *[z for point in points for z in point])
+            self._end_geometry()
+            return
+        (x0, y0) = points[0]
+        self._add("ctx.moveTo", x0, y0)
+        for (x, y) in points[1:]:
+            self._add("ctx.lineTo", x, y)
 
     def circle(self, name, cx, cy, r, fill="black", event_cb=None, style_dict=None,
               **other_attributes):
         if not style_dict:
             style_dict = {}
-        self._add("ctx.beginPath")
-        self._assign("ctx.fillStyle", fill)
+        self._fill_style(fill)
+        if self.typed_arrays:
+            self._geometry("draw_circles", cx, cy, r)
+            return
+        # start a new sub path at the start of the arc.
+        self._add("ctx.moveTo", cx + r, cy)
         self._add("ctx.arc", cx, cy, r, 0, symb("Math.PI * 2"))
-        self._add("ctx.fill")
 
     def rect(self, name, x, y, width, height, fill="black", event_cb=None, style_dict=None,
             **other_attributes):
         if not style_dict:
             style_dict = {}
-        self._add("ctx.beginPath")
-        self._assign("ctx.fillStyle", fill)
+        self._fill_style(fill)
+        if self.typed_arrays:
+            self._geometry("draw_rects", x, y, width, height)
+            return
         self._add("ctx.rect", x, y, width, height)
-        self._add("ctx.fill")
+
+    def _fill_style(self, fill):
+        "Begin (or continue) a filled path with the given fill."
+        if self._begin_path("ctx.fill", (fill,)):
+            self._set("ctx.fillStyle", fill)
 
     def embedding(self, preview=True):
+        self._end_path()
         c = EMBEDDING_COUNT[0] = EMBEDDING_COUNT[0] + 1
         identifier = "jp_svg_canvas_fake_svg_" + str(c)
         [x0, y0, width, height] = map(float, self.viewBox.split())
@@ -162,9 +301,13 @@ class FakeCanvasWidget(object):
         scale = dimension * 1.0/minside
         swidth = scale * width
         sheight = scale * height
-        scaling = self._call("ctx.scale", scale, scale)
-        translation = self._call("ctx.translate", -x0, -y0)
-        commands = "\n    ".join([scaling, translation] + self.canvas_commands)
+        # the transform is not subject to the precision policy.
+        scaling = "ctx.scale(%r, %r);" % (scale, scale)
+        translation = "ctx.translate(%r, %r);" % (-x0, -y0)
+        prologue = [scaling, translation]
+        if self.typed_arrays:
+            prologue.append(DRAW_TEMPLATE % self.geometry_data())
+        commands = "\n    ".join(prologue + self.canvas_commands)
         visible = "true"
         if not preview:
             visible = "false"
@@ -180,6 +323,14 @@ class FakeCanvasWidget(object):
     def embed(self, preview=True):
         display(HTML(self.embedding(preview=preview)))
 
+def translucent(value):
+    "True if value looks like a color with an alpha channel."
+    if not isinstance(value, str):
+        return False
+    value = value.strip().lower()
+    return value.startswith(("rgba", "hsla")) or value == "transparent" or (
+        value.startswith("#") and len(value) in (5, 9)) or "/" in value
+
 class symb:
     "unquoted symbolic javascript fragment"
 
@@ -189,6 +340,40 @@ class symb:
     def __repr__(self):
         return self.rep
 
+# Geometry decoding and draw loops for typed array mode (%s is the base64 data).
+DRAW_TEMPLATE = """var data = (function (text) {
+        var bytes = atob(text);
+        var view = new Uint8Array(bytes.length);
+        for (var i=0; i<bytes.length; i++) {
+            view[i] = bytes.charCodeAt(i);
+        }
+        return new Float32Array(view.buffer);
+    })("%s");
+    var draw_lines = function (start, stop) {
+        for (var i=start; i<stop; i+=4) {
+            ctx.moveTo(data[i], data[i+1]);
+            ctx.lineTo(data[i+2], data[i+3]);
+        }
+    };
+    var draw_polyline = function (start, stop) {
+        ctx.moveTo(data[start], data[start+1]);
+        for (var i=start+2; i<stop; i+=2) {
+            ctx.lineTo(data[i], data[i+1]);
+        }
+    };
+    var draw_circles = function (start, stop) {
+        for (var i=start; i<stop; i+=3) {
+            // start a new sub path at the start of the arc.
+            ctx.moveTo(data[i] + data[i+2], data[i+1]);
+            ctx.arc(data[i], data[i+1], data[i+2], 0, Math.PI * 2);
+        }
+    };
+    var draw_rects = function (start, stop) {
+        for (var i=start; i<stop; i+=4) {
+            ctx.rect(data[i], data[i+1], data[i+2], data[i+3]);
+        }
+    };"""
+
 EMBED_TEMPLATE = """
 <canvas id="{identifier}" width="{width}" height="{height}" style="border:1px solid #d3d3d3;">
 Your browser does not support the HTML5 canvas tag.</canvas>
@@ -0,0 +1,120 @@
+"""
+Dense integer element identifiers.
+
+In integer ID mode elements are named by small non negative integers instead of
+strings.  Batches of elements get contiguous ranges of identifiers, so a batch
+name list is a Python range which is sent to canvas.js as {"start": s, "count": n}
+and canvas.js keeps elements in an array indexed by identifier.
+"""
+
+import bisect
+
+
+class IdAllocator(object):
+    "Allocate contiguous ranges of integer identifiers, reusing freed ranges."
+
+    def __init__(self):
+        # identifiers at or above top have never been allocated
+        self.top = 0
+        # sorted disjoint free intervals below top as parallel start and stop lists
+        self.starts = []
+        self.stops = []
+
+    def __len__(self):
+        "Number of allocated identifiers."
+        return self.top - sum(stop - start for (start, stop) in zip(self.starts, self.stops))
+
+    def allocate(self, count):
+        "Allocate count contiguous identifiers: returns a range."
+        (starts, stops) = (self.starts, self.stops)
+        for i in range(len(starts)):
+            start = starts[i]
+            if stops[i] - start >= count:
+                if stops[i] - start == count:
+                    del starts[i]
+                    del stops[i]
+                else:
+                    starts[i] = start + count
+                return range(start, start + count)
+        start = self.top
+        if stops and stops[-1] == self.top:
+            # grow the last free interval into new identifiers
+            start = starts.pop()
+            stops.pop()
+        self.top = start + count
+        return range(start, self.top)
+
+    def free(self, identifiers):
+        """
+        Free a range (or sequence) of identifiers.  Freeing identifiers which are
+        already free has no effect.
+        """
+        if not isinstance(identifiers, range) or identifiers.step != 1:
+            for identifier in identifiers:
+                self.free(range(identifier, identifier + 1))
+            return
+        start = identifiers.start
+        stop = min(identifiers.stop, self.top)
+        if start >= stop:
+            return
+        (starts, stops) = (self.starts, self.stops)
+        # merge with every overlapping or adjacent free interval
+        low = bisect.bisect_left(stops, start)
+        high = bisect.bisect_right(starts, stop)
+        if low < high:
+            start = min(start, starts[low])
+            stop = max(stop, stops[high - 1])
+        starts[low:high] = [start]
+        stops[low:high] = [stop]
+        if stop == self.top:
+            # forget free identifiers at the top
+            self.top = start
+            starts.pop()
+            stops.pop()
+
+    def reset(self):
+        "Free all identifiers."
+        self.__init__()
+
+
+def is_id_range(names):
+    "True if names is a range of integer identifiers (sent as a start and count)."
+    return isinstance(names, range) and names.step == 1
+
+
+def wire_names(names):
+    'Names for a command message: ranges become {"start": s, "count": n}.'
+    if is_id_range(names):
+        return {"start": names.start, "count": len(names)}
+    return list(names)
+
+
+class RangeIndex(object):
+    "Map integer identifiers to the key (prefix) of the range which contains them."
+
+    def __init__(self):
+        self.starts = []
+        self.stops = []
+        self.keys = []
+
+    def add(self, identifiers, key):
+        i = bisect.bisect_left(self.starts, identifiers.start)
+        self.starts.insert(i, identifiers.start)
+        self.stops.insert(i, identifiers.stop)
+        self.keys.insert(i, key)
+
+    def remove(self, identifiers):
+        i = bisect.bisect_left(self.starts, identifiers.start)
+        if i < len(self.starts) and self.starts[i] == identifiers.start:
+            del self.starts[i]
+            del self.stops[i]
+            del self.keys[i]
+
+    def get(self, identifier, default=None):
+        i = bisect.bisect_right(self.starts, identifier) - 1
+        if i >= 0 and identifier < self.stops[i]:
+            return self.keys[i]
+        return default
+
+    def clear(self):
+        self.__init__()
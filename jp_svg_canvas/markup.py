@@ -0,0 +1,153 @@
+"""
+SVG markup text for drawing commands, formatted the way the browser serializes
+elements created by canvas.js (attribute values as javascript String(value),
+style entries as "name: value;").
+"""
+
+import math
+import numpy as np
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+
+
+def js_string(value):
+    "Format a value the way javascript String(value) would."
+    if value is None:
+        return "null"
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return js_number(float(value))
+    return str(value)
+
+
+def js_number(x):
+    "Shortest round trip javascript representation of a float."
+    if math.isnan(x):
+        return "NaN"
+    if math.isinf(x):
+        return "Infinity" if x > 0 else "-Infinity"
+    if x == int(x) and abs(x) < 1e21:
+        return str(int(x))
+    text = repr(x)
+    if "e" in text:
+        # python writes 1e-07 where javascript writes 1e-7
+        (mantissa, exponent) = text.split("e")
+        sign = "-" if exponent.startswith("-") else "+"
+        text = "%se%s%s" % (mantissa, sign, exponent.lstrip("+-").lstrip("0"))
+    return text
+
+
+def escape_text(text):
+    "Escape character data."
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def escape_attribute(text):
+    "Escape an attribute value for a double quoted attribute."
+    return escape_text(text).replace('"', "&quot;")
+
+
+def style_text(style):
+    "Inline style attribute value for a style dictionary."
+    return " ".join("%s: %s;" % (name, js_string(value)) for (name, value) in style.items())
+
+
+def element_start(tag, atts, style=None):
+    "Start tag for an element with attributes and (optional) inline style."
+    parts = [tag]
+    for (name, value) in atts.items():
+        parts.append('%s="%s"' % (name, escape_attribute(js_string(value))))
+    if style:
+        parts.append('style="%s"' % escape_attribute(style_text(style)))
+    return "<%s>" % " ".join(parts)
+
+
+def element_markup(tag, atts, style=None, text=None, content=""):
+    "Markup for a complete element.  Content is already formatted child markup."
+    if text:
+        content = escape_text(js_string(text)) + content
+    return "%s%s</%s>" % (element_start(tag, atts, style), content, tag)
+
+
+def js_strings(values):
+    "Format a column of values like js_string, quickly for numeric arrays."
+    array = np.asarray(values)
+    if array.dtype.kind in "iub":
+        return [js_string(x) for x in array.tolist()]
+    if array.dtype.kind != "f":
+        return [js_string(x) for x in values]
+    values = array.tolist()
+    result = [str(int(x)) if x.is_integer() and abs(x) < 1e21 else repr(x) for x in values]
+    with np.errstate(invalid="ignore"):
+        magnitude = np.abs(array)
+        rare = ~np.isfinite(array) | ((magnitude < 1e-4) & (magnitude > 0)) | (magnitude >= 1e16)
+    for i in np.flatnonzero(rare).tolist():
+        # exponents and non-finite values need javascript specific formatting.
+        result[i] = js_number(values[i])
+    return result
+
+
+def batch_markup(tag, columns, atts=None, style=None, texts=None, start=0, stop=None):
+    """
+    Markup for elements start..stop of a batch with shared attributes atts and
+    per-element attribute columns, as a list of strings (one per element).
+    Attribute order matches expanding each row with canvas.batch_rows.
+    """
+    atts = atts or {}
+    if stop is None:
+        lengths = [len(column) for column in columns.values()]
+        if isinstance(texts, (list, tuple, np.ndarray)):
+            lengths.append(len(texts))
+        stop = max(lengths) if lengths else 1
+    order = list(atts) + [att for att in columns if att not in atts]
+    parts = [tag]
+    formatted = []
+    for att in order:
+        if att in columns:
+            values = columns[att][start:stop]
+            if np.asarray(values).dtype.kind in "iubf":
+                formatted.append(js_strings(values))
+            else:
+                formatted.append([escape_attribute(js_string(x)) for x in values])
+            parts.append('%s="%%s"' % att)
+        else:
+            parts.append(('%s="%s"' % (att, escape_attribute(js_string(atts[att])))).replace("%", "%%"))
+    if style:
+        parts.append(('style="%s"' % escape_attribute(style_text(style))).replace("%", "%%"))
+    template = "<" + " ".join(parts) + ">%s</" + tag + ">"
+    count = stop - start
+    if isinstance(texts, (list, tuple, np.ndarray)):
+        content = [escape_text(js_string(text)) if text else "" for text in texts[start:stop]]
+    else:
+        content = [escape_text(js_string(texts)) if texts else ""] * count
+    formatted.append(content)
+    return [template % row for row in zip(*formatted)]
+
+
+def svg_start(viewBox, width, height, style=None):
+    "Start tag for the enclosing svg element of a saved drawing."
+    atts = {
+        "xmlns": SVG_NAMESPACE,
+        "preserveAspectRatio": "none",
+        "viewBox": viewBox,
+        "width": width,
+        "height": height,
+    }
+    return element_start("svg", atts, style)
+
+
+SVG_END = "</svg>"
+
+
+def box_viewBox(box):
+    "viewBox text for a (min_x, min_y, max_x, max_y) box, or None if the box is empty."
+    if box is None:
+        return None
+    (min_x, min_y, max_x, max_y) = box
+    (width, height) = (max_x - min_x, max_y - min_y)
+    if width <= 0 or height <= 0:
+        return None
+    return " ".join(js_string(x) for x in (min_x, min_y, width, height))
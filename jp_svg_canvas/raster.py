@@ -0,0 +1,476 @@
+"""
+A substitute for jp_svg_canvas.fake_svg.FakeCanvasWidget
+which rasterizes drawing operations directly into a NumPy RGBA
+buffer and writes PNG images without a browser.
+
+Primitives are recorded as they are drawn and rasterized together:
+consecutive primitives with the same style are converted to arrays and
+their antialiased pixel coverage is computed with vectorized operations
+over small pixel stamps (circles, rectangles, text) or pixel columns along
+each line.  The time grows with the pixels sampled, not just the primitive
+count: on a typical machine 1M short (about 10 pixel) line segments render in
+about 6 seconds and 1M circles up to 16 pixels across in about 13 seconds,
+while long strokes run at a few million pixels of line length per second
+(10K lines averaging 400 pixels take about 1.5 seconds, so 1M such lines take
+minutes).  Text uses a basic 5x8 bitmap font.
+"""
+
+# XXXX Like fake_svg this supports the features used by the other
+# modules of the package, not the full canvas or SVG model.
+
+from IPython.display import display, Image
+from . import canvas
+import base64
+import numpy as np
+import struct
+import zlib
+
+# Maximum number of pixel samples computed at once.
+CHUNK_SAMPLES = 1 << 21
+
+# Basic named colors (see also #rgb, #rrggbb and rgb()/rgba() forms).
+NAMED_COLORS = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "red": (255, 0, 0),
+    "green": (0, 128, 0), "lime": (0, 255, 0), "blue": (0, 0, 255),
+    "yellow": (255, 255, 0), "cyan": (0, 255, 255), "aqua": (0, 255, 255),
+    "magenta": (255, 0, 255), "fuchsia": (255, 0, 255), "gray": (128, 128, 128),
+    "grey": (128, 128, 128), "silver": (192, 192, 192), "maroon": (128, 0, 0),
+    "olive": (128, 128, 0), "navy": (0, 0, 128), "purple": (128, 0, 128),
+    "teal": (0, 128, 128), "orange": (255, 165, 0), "pink": (255, 192, 203),
+    "brown": (165, 42, 42), "gold": (255, 215, 0), "violet": (238, 130, 238),
+    "indigo": (75, 0, 130), "salmon": (250, 128, 114), "cornflowerblue": (100, 149, 237),
+    "lightgray": (211, 211, 211), "lightgrey": (211, 211, 211), "darkgray": (169, 169, 169),
+    "darkgrey": (169, 169, 169), "lightblue": (173, 216, 230), "darkblue": (0, 0, 139),
+    "darkgreen": (0, 100, 0), "darkred": (139, 0, 0),
+}
+
+# 5x8 bitmap font for ASCII 32..126: 5 column bytes per glyph, bit 0 is the top row.
+FONT_5X8 = """
+0000000000 00005f0000 0007000700 147f147f14 242a7f2a12 2313086462 3649562050 0008070300
+001c224100 0041221c00 2a1c7f1c2a 08083e0808 0080703000 0808080808 0000606000 2010080402
+3e5149453e 00427f4000 7249494946 2141494d33 1814127f10 2745454539 3c4a494931 4121110907
+3649494936 464949291e 0000140000 0040340000 0008142241 1414141414 0041221408 0201590906
+3e415d594e 7c1211127c 7f49494936 3e41414122 7f4141413e 7f49494941 7f09090901 3e41415173
+7f0808087f 00417f4100 204041403f 7f08142241 7f40404040 7f021c027f 7f0408107f 3e4141413e
+7f09090906 3e4151215e 7f09192946 2649494932 03017f0103 3f4040403f 1f2040201f 3f4038403f
+6314081463 0304780403 61594d4d43 007f414141 0204081020 004141417f 0402010204 4040404040
+0003070800 2054547840 7f28444438 3844444428 384444287f 3854545418 00087e0902 18a4a49c78
+7f08040478 00447d4000 2040403d00 7f10284400 00417f4000 7c04780478 7c08040478 3844444438
+fc18242418 18242418fc 7c08040408 4854545424 04043f4424 3c4040207c 1c2040201c 3c4030403c
+4428102844 4c9090907c 4464544c44 0008364100 0000770000 0041360800 0201020402
+""".split()
+
+
+def parse_color(color):
+    "(r, g, b, alpha) with components in 0..1 for a CSS color, or None for none/transparent."
+    if color is None:
+        return None
+    text = str(color).strip().lower()
+    if text in ("none", "transparent", ""):
+        return None
+    alpha = 1.0
+    if text.startswith("#"):
+        digits = text[1:]
+        if len(digits) in (3, 4):
+            digits = "".join(d + d for d in digits)
+        rgb = [int(digits[i:i + 2], 16) for i in (0, 2, 4)]
+        if len(digits) == 8:
+            alpha = int(digits[6:8], 16) / 255.0
+    elif text.startswith("rgb"):
+        inside = text[text.index("(") + 1:text.rindex(")")]
+        parts = [p.strip() for p in inside.split(",")]
+        rgb = [float(p[:-1]) * 2.55 if p.endswith("%") else float(p) for p in parts[:3]]
+        if len(parts) > 3:
+            alpha = float(parts[3])
+    else:
+        rgb = NAMED_COLORS.get(text, (0, 0, 0))
+    return (rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0, alpha)
+
+
+def parse_dash(dasharray, scale):
+    "Dash pattern in pixels (even length) for an SVG stroke-dasharray value, or None."
+    if dasharray is None:
+        return None
+    values = [float(v) * scale for v in str(dasharray).replace(",", " ").split()]
+    if not values or sum(values) <= 0:
+        return None
+    if len(values) % 2:
+        values = values * 2
+    return np.array(values)
+
+
+def png_bytes(rgba):
+    "PNG file contents for an (height, width, 4) uint8 array."
+    (height, width, _) = rgba.shape
+    rows = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 0] = 0   # filter type None for every row
+    rows[:, 1:] = rgba.reshape((height, width * 4))
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xffffffff)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", header),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
+
+
+class RasterCanvas(object):
+
+    def __init__(self, viewBox, filename="diagram.png", format="image/png", dimension=800, background=None):
+        """
+        Fake SVG canvas which rasterizes into a NumPy RGBA array.
+        This object is "write once" and does not support updates or interactions.
+
+        Parameters
+        ----------
+
+        viewBox: str
+            The SVG viewBox parameter to emulate.
+
+        filename: str
+            The filename used by save() when no path is given.
+
+        format: str
+            The MIME type of the image (only image/png is supported).
+
+        dimension: int
+            The size of the smallest dimension for the image (as for FakeCanvasWidget).
+
+        background: str
+            Optional background color (default transparent).
+        """
+        assert format == "image/png", "only image/png is supported"
+        self.dimension = dimension
+        self.viewBox = viewBox
+        self.filename = filename
+        self.format = format
+        self.background = background
+        self.font = "Arial"  # ignored: text uses the bitmap font.
+        self.font_size = 10
+        # recorded primitives: (kind, style key, geometry tuple)
+        self.primitives = []
+        [x0, y0, width, height] = [float(x) for x in viewBox.split()]
+        self.scale = dimension * 1.0 / min(width, height)
+        self.x0 = x0
+        self.y0 = y0
+        self.width = int(round(self.scale * width))
+        self.height = int(round(self.scale * height))
+        self.rgba = None
+
+    def set_event_callback(self, *args):
+        raise NotImplementedError
+
+    def send_commands(self):
+        # do nothing
+        pass
+
+    def change_element(self, *args, **kw):
+        raise NotImplementedError
+    def empty(self, *args, **kw):
+        raise NotImplementedError
+    def delete_names(self, *args, **kw):
+        raise NotImplementedError
+    def fit(self, *args, **kw):
+        raise NotImplementedError
+
+    def text(self, name, x, y, text, fill="black", event_cb=None, style_dict=None, **other_attributes):
+        if not style_dict:
+            style_dict = {}
+        style_dict = style_dict.copy()
+        style_dict.update(other_attributes)
+        size = style_dict.get("font-size", self.font_size)
+        size = float(str(size).replace("px", ""))
+        anchor = style_dict.get("text-anchor", "start")
+        self.primitives.append(("text", (fill,), (x, y, str(text), size, anchor)))
+
+    def line(self, name, x1, y1, x2, y2, color="black", width=1,
+             event_cb=None, style_dict=None, **other_attributes):
+        dash = other_attributes.get(canvas.DASHARRAY)
+        color = other_attributes.get(canvas.STROKE, color)
+        width = other_attributes.get(canvas.WIDTH, width)
+        if not width:
+            width = 1
+        self.primitives.append(("line", (color, float(width), dash), (x1, y1, x2, y2)))
+
+    def polyline(self, name, points, color="black", width=1, event_cb=None, style_dict=None,
+            **other_attributes):
+        points = [(float(x), float(y)) for (x, y) in points]
+        for ((x1, y1), (x2, y2)) in zip(points[:-1], points[1:]):
+            self.line(name, x1, y1, x2, y2, color, width, **other_attributes)
+
+    def circle(self, name, cx, cy, r, fill="black", event_cb=None, style_dict=None,
+              **other_attributes):
+        self.primitives.append(("circle", (fill,), (cx, cy, r)))
+
+    def rect(self, name, x, y, width, height, fill="black", event_cb=None, style_dict=None,
+            **other_attributes):
+        self.primitives.append(("rect", (fill,), (x, y, width, height)))
+
+    def render(self):
+        "Rasterize all recorded primitives; returns the (height, width, 4) uint8 RGBA array."
+        # premultiplied color and alpha
+        self.color = np.zeros((self.height * self.width, 3), dtype=np.float32)
+        self.alpha = np.zeros((self.height * self.width,), dtype=np.float32)
+        # coverage of the current run and the range of flat indices it touches
+        self.coverage = np.zeros((self.height * self.width,), dtype=np.float32)
+        self.touched = (self.coverage.size, 0)
+        if self.background is not None:
+            self.fill_rects((self.background,), np.array([[self.x0, self.y0,
+                self.width / self.scale, self.height / self.scale]]))
+            self.composite(self.background)
+        primitives = self.primitives
+        start = 0
+        count = len(primitives)
+        while start < count:
+            (kind, style, _) = primitives[start]
+            end = start + 1
+            while end < count and primitives[end][0] == kind and primitives[end][1] == style:
+                end += 1
+            if kind == "text":
+                self.draw_texts(style, [p[2] for p in primitives[start:end]])
+            else:
+                geometry = np.array([p[2] for p in primitives[start:end]], dtype=np.float64)
+                if kind == "line":
+                    self.draw_lines(style, geometry)
+                elif kind == "circle":
+                    self.fill_circles(style, geometry)
+                else:
+                    self.fill_rects(style, geometry)
+            self.composite(style[0])
+            start = end
+        alpha = self.alpha.reshape((self.height, self.width, 1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rgb = np.where(alpha > 0, self.color.reshape((self.height, self.width, 3)) / alpha, 0)
+        rgba = np.concatenate([rgb, alpha], axis=2)
+        self.rgba = np.clip(np.round(rgba * 255), 0, 255).astype(np.uint8)
+        return self.rgba
+
+    def png(self):
+        "PNG file contents for the drawing."
+        return png_bytes(self.render())
+
+    def save(self, path=None):
+        "Write the drawing as a PNG file."
+        if path is None:
+            path = self.filename
+        with open(path, "wb") as f:
+            f.write(self.png())
+
+    def embedding(self, preview=True):
+        "HTML img tag with the PNG image as a data URL."
+        data = base64.b64encode(self.png()).decode("ascii")
+        return '<img src="data:%s;base64,%s" width="%s" height="%s"/>' % (
+            self.format, data, self.width, self.height)
+
+    def embed(self, preview=True):
+        display(Image(data=self.png(), format="png"))
+
+    # rasterization
+
+    def pixels(self, xs, ys):
+        "Convert canvas coordinates to (fractional) pixel coordinates."
+        return ((xs - self.x0) * self.scale, (ys - self.y0) * self.scale)
+
+    def accumulate(self, indices, coverage):
+        """
+        Add coverage in 0..1 for pixels with flat indices to the current run.
+        Overlapping coverage from primitives of the same run combines by maximum.
+        """
+        touched = coverage > 0
+        (indices, coverage) = (indices[touched], coverage[touched])
+        if len(indices):
+            np.maximum.at(self.coverage, indices, coverage.astype(np.float32))
+            self.touched = (min(self.touched[0], indices.min()), max(self.touched[1], indices.max() + 1))
+
+    def composite(self, color):
+        "Paint color over the pixels covered by the current run and reset the coverage."
+        (low, high) = self.touched
+        if low >= high:
+            return
+        coverage = self.coverage[low:high]
+        pixels = np.flatnonzero(coverage)
+        a = coverage[pixels]
+        coverage[:] = 0
+        self.touched = (self.coverage.size, 0)
+        rgba = parse_color(color)
+        if rgba is None:
+            return
+        a = a * rgba[3]
+        pixels = pixels + low
+        self.color[pixels] = self.color[pixels] * (1 - a)[:, None] + np.outer(a, rgba[:3])
+        self.alpha[pixels] = self.alpha[pixels] * (1 - a) + a
+
+    def stamps(self, x0, y0, size):
+        """
+        Generate (flat indices, pixel center xs, pixel center ys, primitive numbers) for size x size
+        pixel stamps with top left corners (x0, y0), clipped to the image, in chunks.
+        """
+        offsets = np.arange(size)
+        (ox, oy) = [a.ravel() for a in np.meshgrid(offsets, offsets)]
+        per_chunk = max(CHUNK_SAMPLES // (size * size), 1)
+        for start in range(0, len(x0), per_chunk):
+            sx = x0[start:start + per_chunk, None] + ox[None, :]
+            sy = y0[start:start + per_chunk, None] + oy[None, :]
+            numbers = np.broadcast_to(np.arange(start, start + len(sx))[:, None], sx.shape)
+            inside = (sx >= 0) & (sx < self.width) & (sy >= 0) & (sy < self.height)
+            (sx, sy, numbers) = (sx[inside], sy[inside], numbers[inside])
+            yield (sy * self.width + sx, sx.astype(np.float32) + 0.5, sy.astype(np.float32) + 0.5, numbers)
+
+    def size_classes(self, extents):
+        "Group primitives by stamp size (powers of 2) to bound wasted samples: yields (size, selection)."
+        sizes = np.maximum(np.ceil(extents).astype(np.int64) + 2, 1)
+        classes = np.ceil(np.log2(sizes)).astype(np.int64)
+        for c in np.unique(classes).tolist():
+            yield (2 ** c, np.flatnonzero(classes == c))
+
+    def fill_circles(self, style, geometry):
+        (cx, cy) = self.pixels(geometry[:, 0], geometry[:, 1])
+        r = np.abs(geometry[:, 2]) * self.scale
+        for (size, selection) in self.size_classes(2 * r):
+            (scx, scy, sr) = (cx[selection], cy[selection], r[selection])
+            x0 = np.floor(scx - sr).astype(np.int64) - 1
+            y0 = np.floor(scy - sr).astype(np.int64) - 1
+            for (indices, px, py, numbers) in self.stamps(x0, y0, size):
+                distance = np.hypot(px - scx[numbers], py - scy[numbers])
+                coverage = np.clip(sr[numbers] - distance + 0.5, 0, 1)
+                self.accumulate(indices, coverage)
+
+    def fill_rects(self, style, geometry):
+        (x, y) = self.pixels(geometry[:, 0], geometry[:, 1])
+        (w, h) = (geometry[:, 2] * self.scale, geometry[:, 3] * self.scale)
+        # normalize negative sizes
+        (x, w) = (np.where(w < 0, x + w, x), np.abs(w))
+        (y, h) = (np.where(h < 0, y + h, y), np.abs(h))
+        for (size, selection) in self.size_classes(np.maximum(w, h)):
+            (sx0, sy0, sx1, sy1) = (x[selection], y[selection], x[selection] + w[selection], y[selection] + h[selection])
+            if size > 64:
+                # large rectangles: separable coverage over the clipped bounding box.
+                for i in range(len(selection)):
+                    self.fill_rect_box(style, sx0[i], sy0[i], sx1[i], sy1[i])
+                continue
+            for (indices, px, py, numbers) in self.stamps(np.floor(sx0).astype(np.int64),
+                    np.floor(sy0).astype(np.int64), size):
+                cover_x = np.clip(np.minimum(sx1[numbers], px + 0.5) - np.maximum(sx0[numbers], px - 0.5), 0, 1)
+                cover_y = np.clip(np.minimum(sy1[numbers], py + 0.5) - np.maximum(sy0[numbers], py - 0.5), 0, 1)
+                self.accumulate(indices, cover_x * cover_y)
+
+    def fill_rect_box(self, style, x0, y0, x1, y1):
+        columns = np.arange(max(int(np.floor(x0)), 0), min(int(np.ceil(x1)), self.width))
+        rows = np.arange(max(int(np.floor(y0)), 0), min(int(np.ceil(y1)), self.height))
+        if len(columns) == 0 or len(rows) == 0:
+            return
+        cover_x = np.clip(np.minimum(x1, columns + 1.0) - np.maximum(x0, columns * 1.0), 0, 1)
+        cover_y = np.clip(np.minimum(y1, rows + 1.0) - np.maximum(y0, rows * 1.0), 0, 1)
+        indices = (rows[:, None] * self.width + columns[None, :]).ravel()
+        self.accumulate(indices, np.outer(cover_y, cover_x).ravel())
+
+    def draw_lines(self, style, geometry):
+        """
+        Stroke line segments.  Each segment is sampled by pixel columns along its major
+        axis (x or y, whichever it moves along more), a few pixels across the line in
+        each column, so the samples grow with the length of the segments in pixels.
+        """
+        (color, width, dasharray) = style
+        half = np.float32(max(width * self.scale, 1.0) / 2.0)
+        # thin lines are drawn one pixel wide with reduced coverage.
+        thin = min(width * self.scale, 1.0)
+        dash = parse_dash(dasharray, self.scale)
+        if dash is not None:
+            bounds = np.cumsum(dash)
+        (x1, y1) = self.pixels(geometry[:, 0], geometry[:, 1])
+        (x2, y2) = self.pixels(geometry[:, 2], geometry[:, 3])
+        (dx, dy) = (x2 - x1, y2 - y1)
+        length = np.hypot(dx, dy)
+        # zero length segments have no direction and draw nothing
+        drawn = length > 0
+        (x1, y1, dx, dy, length) = (x1[drawn], y1[drawn], dx[drawn], dy[drawn], length[drawn])
+        (ux, uy) = (dx / length, dy / length)
+        (px1, py1, pux, puy, plength) = [a.astype(np.float32) for a in (x1, y1, ux, uy, length)]
+        for (sx, sy, numbers) in self.line_samples(x1, y1, dx, dy, half):
+            (rx, ry) = (sx.astype(np.float32) + 0.5 - px1[numbers], sy.astype(np.float32) + 0.5 - py1[numbers])
+            (cx, cy) = (pux[numbers], puy[numbers])
+            along = rx * cx + ry * cy
+            coverage = np.clip(half + 0.5 - np.abs(rx * cy - ry * cx), 0, 1)
+            # butt caps
+            coverage *= np.clip(along + 0.5, 0, 1)
+            coverage *= np.clip(plength[numbers] - along + 0.5, 0, 1)
+            if dash is not None:
+                interval = np.searchsorted(bounds, np.mod(along, bounds[-1]), side="right")
+                coverage *= ((interval % 2) == 0)
+            if thin < 1:
+                coverage *= thin
+            self.accumulate(sy * self.width + sx, coverage)
+
+    def line_samples(self, x1, y1, dx, dy, half):
+        """
+        Generate (pixel xs, pixel ys, segment numbers) in chunks for the pixels near
+        segments from (x1, y1) to (x1 + dx, y1 + dy) in pixel coordinates, for lines
+        half pixels wide on each side.
+        """
+        steep = np.abs(dy) > np.abs(dx)
+        # pixels within half + 0.5 of the line are at most (half + 0.5) * sqrt(2) away across a column.
+        across = int(np.ceil((half + 0.5) * np.sqrt(2)))
+        margin = int(np.ceil(half + 0.5)) + 1
+        offsets = np.arange(-across, across + 1)
+        per_chunk = max(CHUNK_SAMPLES // len(offsets), 1)
+        for is_steep in (False, True):
+            selection = np.flatnonzero(steep == is_steep)
+            # (major, minor) coordinates of the first end points and their changes
+            (major, minor, dmajor, dminor) = (x1, y1, dx, dy)
+            (major_limit, minor_limit) = (self.width, self.height)
+            if is_steep:
+                (major, minor, dmajor, dminor) = (y1, x1, dy, dx)
+                (major_limit, minor_limit) = (self.height, self.width)
+            (major, minor, dmajor, dminor) = [a[selection] for a in (major, minor, dmajor, dminor)]
+            first = np.floor(np.minimum(major, major + dmajor)).astype(np.int64) - margin
+            columns = np.ceil(np.abs(dmajor)).astype(np.int64) + 2 * margin + 1
+            ends = np.cumsum(columns)
+            start = 0
+            while start < len(columns):
+                # segments start:stop have about per_chunk columns in total.
+                base = ends[start] - columns[start]
+                stop = max(int(np.searchsorted(ends, base + per_chunk, side="right")), start + 1)
+                counts = columns[start:stop]
+                numbers = np.repeat(np.arange(start, stop), counts)
+                step = np.arange(len(numbers)) - np.repeat(np.cumsum(counts) - counts, counts)
+                column = first[numbers] + step
+                t = np.clip((column + 0.5 - major[numbers]) / dmajor[numbers], 0, 1)
+                row = np.floor(minor[numbers] + t * dminor[numbers]).astype(np.int64)
+                column = np.repeat(column, len(offsets))
+                row = (row[:, None] + offsets[None, :]).ravel()
+                numbers = np.repeat(selection[numbers], len(offsets))
+                inside = (column >= 0) & (column < major_limit) & (row >= 0) & (row < minor_limit)
+                (column, row, numbers) = (column[inside], row[inside], numbers[inside])
+                if is_steep:
+                    yield (row, column, numbers)
+                else:
+                    yield (column, row, numbers)
+                start = stop
+
+    def draw_texts(self, style, texts):
+        "Draw texts with the bitmap font as unit rectangles."
+        boxes = []
+        for (x, y, text, size, anchor) in texts:
+            unit = size / 8.0
+            advance = 6 * unit
+            width = advance * len(text)
+            if anchor == "middle":
+                x = x - width / 2.0
+            elif anchor == "end":
+                x = x - width
+            top = y - 7 * unit
+            for (k, char) in enumerate(text):
+                code = ord(char) - 32
+                if not (0 <= code < len(FONT_5X8)):
+                    continue
+                glyph = FONT_5X8[code]
+                for column in range(5):
+                    bits = int(glyph[2 * column:2 * column + 2], 16)
+                    for row in range(8):
+                        if bits & (1 << row):
+                            boxes.append((x + k * advance + column * unit, top + row * unit, unit, unit))
+        if boxes:
+            self.fill_rects(style, np.array(boxes, dtype=np.float64))
@@ -0,0 +1,337 @@
+"""
+A retained Python side copy of the drawing on an SVG canvas.
+
+The browser DOM is the only authoritative copy of a widget drawing.  A SceneModel
+mirrors the drawing commands (add_element, add_elements, change_element,
+delete_names, empty) so the drawing can be serialized, measured and compared
+without a browser round trip.
+
+Batches of elements are stored as they arrive (shared attributes plus per-element
+columns) and individual elements are only materialized when they are changed,
+so large columnar drawings stay cheap.
+"""
+
+import bisect
+import numpy as np
+from jp_svg_canvas import markup
+
+
+class SceneBatch(object):
+    "Elements with a shared tag added by one add_element or add_elements command."
+
+    __slots__ = ("tag", "names", "columns", "atts", "style", "texts", "parent", "alive", "live", "changes")
+
+    def __init__(self, tag, names, columns, atts, style, texts, parent=None):
+        self.tag = tag
+        self.names = names
+        self.columns = columns
+        self.atts = atts
+        self.style = style
+        self.texts = texts
+        # name of the enclosing group element (None for the top level)
+        self.parent = parent
+        self.alive = np.ones((len(names),), dtype=bool)
+        self.live = len(names)
+        # index --> [attribute dict, style dict, text] for changed elements
+        self.changes = {}
+
+    def element(self, i):
+        "(tag, attribute dict, style dict, text) for element i."
+        atts = self.atts.copy()
+        for (att, values) in self.columns.items():
+            atts[att] = column_item(values, i)
+        style = dict(self.style or {})
+        text = self.texts
+        if isinstance(text, (list, tuple, np.ndarray)):
+            text = text[i]
+        change = self.changes.get(i)
+        if change is not None:
+            (change_atts, change_style, change_text) = change
+            atts.update(change_atts)
+            style.update(change_style)
+            if change_text:
+                text = change_text
+        return (self.tag, atts, style, text)
+
+    def change(self, i, atts, style, text):
+        change = self.changes.get(i)
+        if change is None:
+            change = self.changes[i] = [{}, {}, None]
+        if atts:
+            change[0].update(atts)
+        if style:
+            change[1].update(style)
+        if text:
+            change[2] = text
+
+
+class SceneModel(object):
+    "Retained copy of the elements on a canvas keyed by name."
+
+    def __init__(self):
+        self.empty()
+
+    def empty(self):
+        "Forget all elements."
+        self.batches = []
+        # batch number for element identifiers starting at self.starts[batch number]
+        self.starts = []
+        self.next_id = 0
+        # name --> element identifier
+        self.index = {}
+        # number of batches with no live elements
+        self.dead = 0
+        # group name --> batches of child elements
+        self.children = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def names(self):
+        "Names of all elements in drawing order."
+        return [name for (name, _, _, _, _) in self.elements()]
+
+    def add_element(self, name, tag, atts, style=None, text=None, parent=None):
+        self.add_elements([name], tag, {}, atts, style, text, parent)
+
+    def add_elements(self, names, tag, columns, atts=None, style=None, texts=None, parent=None):
+        "Record a batch (children of the group named parent if it is given).  Numeric columns are kept as float arrays."
+        names = list(names)
+        columns = dict((att, compact_column(values)) for (att, values) in columns.items())
+        batch = SceneBatch(tag, names, columns, dict(atts or {}), style, texts, parent)
+        if parent is not None:
+            self.children.setdefault(parent, []).append(batch)
+        start = self.next_id
+        index = self.index
+        # a new element replaces the element with its name (canvas.js register_element deletes it too).
+        self.delete_names([name for name in names if name in index])
+        index.update(zip(names, range(start, start + len(names))))
+        self.batches.append(batch)
+        self.starts.append(start)
+        self.next_id = start + len(names)
+
+    def _locate(self, name):
+        identifier = self.index[name]
+        b = bisect.bisect_right(self.starts, identifier) - 1
+        return (self.batches[b], identifier - self.starts[b])
+
+
+    def change_element(self, name, atts, style=None, text=None):
+        if name in self.index:
+            (batch, i) = self._locate(name)
+            batch.change(i, atts, style, text)
+
+    def delete_names(self, names):
+        "Delete named elements (and the elements inside deleted groups)."
+        index = self.index
+        if self.children:
+            names = list(names)
+            names.extend(self.descendants(names))
+        identifiers = np.array([index.pop(name) for name in names if name in index], dtype=np.int64)
+        if len(identifiers) == 0:
+            return
+        numbers = np.searchsorted(self.starts, identifiers, side="right") - 1
+        order = np.argsort(numbers, kind="stable")
+        (numbers, identifiers) = (numbers[order], identifiers[order])
+        splits = np.flatnonzero(np.diff(numbers)) + 1
+        for group in np.split(np.arange(len(numbers)), splits):
+            b = numbers[group[0]]
+            batch = self.batches[b]
+            killed = identifiers[group] - self.starts[b]
+            batch.alive[killed] = False
+            batch.live -= len(killed)
+            if batch.live == 0:
+                self.dead += 1
+            if batch.changes:
+                for i in killed.tolist():
+                    batch.changes.pop(i, None)
+        self._prune()
+
+    def descendants(self, names):
+        "Names of live elements inside the named groups (forgetting the groups)."
+        children = self.children
+        result = []
+        pending = [name for name in names if name in children]
+        while pending:
+            for batch in children.pop(pending.pop()):
+                for i in np.flatnonzero(batch.alive).tolist():
+                    name = batch.names[i]
+                    result.append(name)
+                    if name in children:
+                        pending.append(name)
+        return result
+
+    def _prune(self):
+        "Drop batches with no live elements once they are the majority."
+        if self.dead * 2 > len(self.batches):
+            pairs = [(start, batch) for (start, batch) in zip(self.starts, self.batches) if batch.live]
+            self.starts = [start for (start, _) in pairs]
+            self.batches = [batch for (_, batch) in pairs]
+            self.dead = 0
+
+    def element(self, name):
+        "(tag, attribute dict, style dict, text) for a named element."
+        (batch, i) = self._locate(name)
+        return batch.element(i)
+
+    def elements(self):
+        "Generate (name, tag, attribute dict, style dict, text) for live elements in drawing order."
+        for batch in self.batches:
+            if not batch.live:
+                continue
+            names = batch.names
+            for i in np.flatnonzero(batch.alive).tolist():
+                (tag, atts, style, text) = batch.element(i)
+                yield (names[i], tag, atts, style, text)
+
+    def svg_text(self, separator="\n"):
+        "SVG markup for all elements (the content of the svg element)."
+        return separator.join(self.markup())
+
+    def markup(self):
+        "Generate SVG markup for each top level element in drawing order (with group content nested)."
+        if not self.children:
+            for (name, tag, atts, style, text) in self.elements():
+                yield markup.element_markup(tag, atts, style, text)
+            return
+        parents = {}
+        for batch in self.batches:
+            if batch.live and batch.parent is not None:
+                for i in np.flatnonzero(batch.alive).tolist():
+                    parents[batch.names[i]] = batch.parent
+        nested = {}
+        for element in self.elements():
+            parent = parents.get(element[0])
+            if parent not in self.index:
+                parent = None
+            nested.setdefault(parent, []).append(element)
+        for text in self.nested_markup(nested, None):
+            yield text
+
+    def nested_markup(self, nested, parent):
+        for (name, tag, atts, style, text) in nested.get(parent, ()):
+            content = "".join(self.nested_markup(nested, name)) if name in nested else ""
+            yield markup.element_markup(tag, atts, style, text, content)
+
+    def bounding_box(self):
+        """
+        (min_x, min_y, max_x, max_y) of element geometry in canvas coordinates, or None
+        if nothing has geometry.  Transforms and stroke widths are ignored and text
+        elements contribute only their anchor point.
+        """
+        boxes = []
+        for batch in self.batches:
+            changed = np.zeros(batch.alive.shape, dtype=bool)
+            changed[list(batch.changes)] = True
+            plain = batch.alive & ~changed
+            if batch.tag in POINTS_TAGS:
+                # points are text: measure each element
+                changed = batch.alive
+                plain = np.zeros(batch.alive.shape, dtype=bool)
+            if plain.any():
+                get = batch_getter(batch, plain)
+                box = geometry_bounds(batch.tag, get)
+                if box is not None:
+                    boxes.append(box)
+            for i in np.flatnonzero(batch.alive & changed).tolist():
+                (tag, atts, _, _) = batch.element(i)
+                box = geometry_bounds(tag, element_getter(atts))
+                if box is not None:
+                    boxes.append(box)
+        if not boxes:
+            return None
+        boxes = np.array(boxes, dtype=np.float64)
+        return (float(boxes[:, 0].min()), float(boxes[:, 1].min()), float(boxes[:, 2].max()), float(boxes[:, 3].max()))
+
+    def diff(self, other):
+        """
+        Compare with another scene: returns (added, deleted, changed) name lists where
+        added names are in other but not self.
+        """
+        mine = dict((name, (tag, atts, style, text)) for (name, tag, atts, style, text) in self.elements())
+        added = []
+        changed = []
+        for (name, tag, atts, style, text) in other.elements():
+            if name not in mine:
+                added.append(name)
+            else:
+                if mine.pop(name) != (tag, atts, style, text):
+                    changed.append(name)
+        deleted = list(mine)
+        return (added, deleted, changed)
+
+
+def compact_column(values):
+    "Keep numeric columns as float arrays and other columns as lists."
+    array = np.asarray(values)
+    if array.dtype.kind in "biuf":
+        return np.array(array, dtype=np.float64)
+    return list(values)
+
+
+def column_item(values, i):
+    value = values[i]
+    if isinstance(value, np.generic):
+        value = value.item()
+    return value
+
+
+# tags with geometry given by a points attribute
+POINTS_TAGS = ("polyline", "polygon")
+
+
+def batch_getter(batch, selection):
+    "Look up numeric attribute values for the selected elements of a batch."
+    return columns_getter(batch.columns, batch.atts, selection)
+
+
+def columns_getter(columns, atts, selection=slice(None)):
+    "Look up numeric attribute values from per-element columns or shared attributes."
+    def get(att):
+        if att in columns:
+            return np.asarray(columns[att], dtype=np.float64)[selection]
+        return float(atts[att])
+    return get
+
+
+def element_getter(atts):
+    def get(att, raw=False):
+        if raw:
+            return atts[att]
+        return float(atts[att])
+    return get
+
+
+def parse_points(points):
+    "Array of (x, y) pairs from an SVG points attribute value."
+    return np.array(points.replace(",", " ").split(), dtype=np.float64).reshape((-1, 2))
+
+
+def geometry_bounds(tag, get):
+    "(min_x, min_y, max_x, max_y) for the geometry of elements of a tag, or None."
+    try:
+        if tag == "circle":
+            (cx, cy, r) = (get("cx"), get("cy"), get("r"))
+            (xs, ys) = ([cx - r, cx + r], [cy - r, cy + r])
+        elif tag == "rect":
+            (x, y, w, h) = (get("x"), get("y"), get("width"), get("height"))
+            (xs, ys) = ([x, x + w], [y, y + h])
+        elif tag == "line":
+            (xs, ys) = ([get("x1"), get("x2")], [get("y1"), get("y2")])
+        elif tag == "text":
+            (xs, ys) = ([get("x")], [get("y")])
+        elif tag in POINTS_TAGS:
+            points = parse_points(get("points", raw=True))
+            (xs, ys) = ([points[:, 0]], [points[:, 1]])
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    xs = np.concatenate([np.ravel(x) for x in xs])
+    ys = np.concatenate([np.ravel(y) for y in ys])
+    if xs.size == 0:
+        return None
+    return (xs.min(), ys.min(), xs.max(), ys.max())
@@ -5,23 +5,50 @@ of an SVG canvas representation of SVGCanvasWidget.
 This is intended to allow embeddings that will be visible
 under nbviewer which supports all non-interactive features
 of SVGCanvasWidget.
+
+By default the embedding is a script which replays the drawing commands
+in the browser.  A StaticCanvas created with inline=True keeps a retained
+scene instead and embeds the final <svg> markup, which needs no script.
 """
 
 from IPython.display import display, HTML
 from jp_svg_canvas import canvas
+from jp_svg_canvas import ids
+from jp_svg_canvas import markup
+import numpy as np
+import base64
 import json
+import re
 import time
 
 COUNTER = [int(time.time()) % 1000000]
 
+# Consecutive add_element calls with the same tag, style and attribute names are
+# embedded as one columnar add_elements command when there are at least this many.
+MIN_RUN_LENGTH = 2
+
 # XXX not sure styles are handled consistently
 
 class StaticCanvas(canvas.SVGHelperMixin):
 
-    def __init__(self, viewBox="0 0 500 500", *pargs, **kwargs):
+    # Embed element batches as columns replayed by a loop in the page (False embeds
+    # one add_element call per element).
+    columnar = True
+
+    # Numeric columns are embedded as base64 little endian typed arrays of this dtype
+    # (quantized to int16/int32 under a precision policy), or as JSON arrays if None.
+    column_dtype = "float32"
+
+    def __init__(self, viewBox="0 0 500 500", inline=False, *pargs, **kwargs):
         super(StaticCanvas, self).__init__(*pargs, **kwargs)
         self.viewBox = viewBox
         self.command_list = []
+        # run of compatible add_element calls not yet embedded (see add_element).
+        self.run = None
+        # embed inline <svg> markup from the retained scene by default.
+        self.inline = inline
+        if inline:
+            self.retain_scene()
 
     def set_event_callback(self, callback):
         # doesn't maks sense: ignore???
@@ -31,22 +58,109 @@ class StaticCanvas(canvas.SVGHelperMixin):
         pass
 
     def add_element(self, name, tagname, attribute_dict, style_dict=None, text=None, event_callback=None):
-        return self.add_js_command("add_element", [name, tagname, attribute_dict, style_dict, text])
+        if self.scene is not None:
+            # record the values embedded under the precision policy.
+            self.scene.add_element(name, tagname, self.rounded(attribute_dict), style_dict, text)
+        if not self.columnar:
+            return self.add_js_command("add_element", [name, tagname, attribute_dict, style_dict, text])
+        # collect runs of elements with the same tag, style and attribute names as columns.
+        key = (tagname, json.dumps(style_dict, sort_keys=True), tuple(sorted(attribute_dict)))
+        run = self.run
+        if run is None or run.key != key:
+            self.flush_run()
+            run = self.run = ElementRun(key, tagname, style_dict)
+        run.append(name, attribute_dict, text)
+
+    def flush_run(self):
+        "Embed the pending run of add_element calls."
+        run = self.run
+        if run is None:
+            return
+        self.run = None
+        if len(run.names) < MIN_RUN_LENGTH:
+            for (i, name) in enumerate(run.names):
+                atts = dict((att, values[i]) for (att, values) in run.columns.items())
+                self.add_js_command("add_element", [name, run.tagname, atts, run.style_dict, run.texts[i]])
+        else:
+            texts = run.texts
+            if all(text is None for text in texts):
+                texts = None
+            self.add_batch_command(run.names, run.tagname, run.columns, {}, run.style_dict, texts)
+
+    def add_elements(self, names, tagname, columns, attribute_dict=None, style_dict=None, texts=None,
+            event_callbacks=None):
+        """
+        Embed a batch of elements as one add_elements command with column data.
+        """
+        if not self.columnar:
+            return super(StaticCanvas, self).add_elements(
+                names, tagname, columns, attribute_dict, style_dict, texts, event_callbacks)
+        if not ids.is_id_range(names):
+            names = list(names)
+        if attribute_dict is None:
+            attribute_dict = {}
+        if self.scene is not None:
+            self.scene.add_elements(names, tagname, self.rounded_columns(columns), self.rounded(attribute_dict),
+                style_dict, texts)
+        self.add_batch_command(names, tagname, columns, attribute_dict, style_dict, texts)
+
+    def add_batch_command(self, names, tagname, columns, attribute_dict, style_dict, texts):
+        shared = dict(attribute_dict)
+        encoded = {}
+        for (att, values) in self.rounded_columns(columns).items():
+            values = np.asarray(values)
+            if len(values) and values.dtype.kind not in "biuf" and (values == values[0]).all():
+                # constant non numeric columns (like fill colors) are shared attributes.
+                shared[att] = canvas.column_value(values[0])
+            else:
+                encoded[att] = self.encode_column(values)
+        if texts is not None and (isinstance(texts, str) or not hasattr(texts, "__len__")):
+            texts = canvas.text_value(texts)
+        elif texts is not None:
+            texts = [canvas.text_value(text) for text in texts]
+        self.add_js_command("add_elements", [compact_names(names), tagname, encoded, shared, style_dict, texts])
+
+    def encode_column(self, values):
+        """
+        Embedding of a column: {"base64": data, "dtype": name[, "divisor": d]} for
+        numeric columns (see canvas.encode_columns) or a list.
+        """
+        if self.column_dtype is None or values.dtype.kind not in "biuf":
+            return [canvas.column_value(x) for x in values]
+        buffers = []
+        [reference] = canvas.encode_columns({"": values}, self.column_dtype, buffers, self.precision).values()
+        del reference["buffer"]
+        reference["base64"] = base64.b64encode(buffers[0].tobytes()).decode("ascii")
+        return reference
 
     def change_element(self, name, attribute_dict, style_dict=None, text=None):
+        if self.scene is not None:
+            self.scene.change_element(name, self.rounded(attribute_dict), style_dict, text)
         return self.add_js_command("change_element", [name, attribute_dict, style_dict, text])
 
     def empty(self):
+        if self.scene is not None:
+            self.scene.empty()
+        if self.id_allocator is not None:
+            self.id_allocator.reset()
         return self.add_js_command("empty", [])
 
     def fit(self):
+        if self.scene is not None:
+            # fit in Python too, for inline markup.
+            viewBox = markup.box_viewBox(self.scene.bounding_box())
+            if viewBox is not None:
+                self.viewBox = viewBox
         return self.add_js_command("fit", [])
 
     def delete_names(self, names):
-        return self.add_js_command("delete_names", [names])
+        if self.scene is not None:
+            self.scene.delete_names(names)
+        return self.add_js_command("delete_names", [list(names)])
 
     def add_js_command(self, function_name, args):
-        args_json = [json.dumps(x) for x in args]
+        self.flush_run()
+        args_json = [json.dumps(self.rounded(x)) for x in args]
         arg_string = ", ".join(args_json)
         cmd = "%s(%s)" % (function_name, arg_string)
         self.command_list.append(cmd)
@@ -55,7 +169,16 @@ class StaticCanvas(canvas.SVGHelperMixin):
         COUNTER[0] += 1
         return "jp_svg_canvas_static_" + str(COUNTER[0])
 
-    def embedding(self):
+    def embedding(self, inline=None):
+        """
+        HTML for the drawing: a script replaying the drawing commands or,
+        if inline (by default self.inline), the <svg> markup of the retained scene.
+        """
+        if inline is None:
+            inline = self.inline
+        if inline:
+            return self.svg_markup()
+        self.flush_run()
         identifier = self.new_div_name()
         commands_string = ";\n    ".join(self.command_list)
         return JS_TEMPLATE.format(
@@ -66,8 +189,55 @@ class StaticCanvas(canvas.SVGHelperMixin):
             height = self.svg_height
             )
 
-    def embed(self):
-        display(HTML(self.embedding()))
+    def svg_markup(self, separator="\n"):
+        "<svg> markup for the retained scene (fit() sets the viewBox from its geometry)."
+        if self.scene is None:
+            raise ValueError("inline markup needs a retained scene: use StaticCanvas(inline=True).")
+        start = markup.svg_start(self.viewBox, self.svg_width, self.svg_height, self.get_style())
+        return separator.join([start, self.scene.svg_text(separator), markup.SVG_END])
+
+    def embed(self, inline=None):
+        display(HTML(self.embedding(inline)))
+
+
+class ElementRun(object):
+    "Consecutive add_element calls with the same tag, style and attribute names as columns."
+
+    def __init__(self, key, tagname, style_dict):
+        self.key = key
+        self.tagname = tagname
+        self.style_dict = style_dict
+        self.names = []
+        self.columns = dict((att, []) for att in key[2])
+        self.texts = []
+
+    def append(self, name, attribute_dict, text):
+        self.names.append(name)
+        for (att, values) in self.columns.items():
+            values.append(attribute_dict[att])
+        self.texts.append(text)
+
+
+def compact_names(names):
+    """
+    Embedding of a name list: a range or a run of names "prefix" + str(k) for
+    consecutive k becomes {"start": s, "count": n[, "prefix": p]}.
+    """
+    if ids.is_id_range(names):
+        return ids.wire_names(names)
+    names = list(names)
+    if len(names) < 2 or not all(isinstance(name, str) for name in names):
+        return names
+    match = NUMBERED_NAME.match(names[0])
+    if match is None:
+        return names
+    (prefix, start) = (match.group(1), int(match.group(2)))
+    for (k, name) in enumerate(names):
+        if name != prefix + str(start + k):
+            return names
+    return {"prefix": prefix, "start": start, "count": len(names)}
+
+NUMBERED_NAME = re.compile(r"^(.*?)(0|[1-9][0-9]*)$")
 
 JS_TEMPLATE = """
 <div id="{identifier}"/>
@@ -88,19 +258,72 @@ JS_TEMPLATE = """
     svg.setAttribute("viewBox", "{viewBox}");
     var add_element = function (name, tagname, attribute_dict, style_dict, text) {{
         var element = svg_elt(tagname);
-        var $element = $(element);
-        update_element($element, attribute_dict, style_dict, text);
-        $div.named_elements[name] = $element;
-        $svg.append($element);
+        update_element(element, attribute_dict, style_dict, text);
+        $div.named_elements[name] = element;
+        svg.appendChild(element);
+    }};
+    var TYPED_ARRAYS = {{
+        "float32": Float32Array, "float64": Float64Array, "int16": Int16Array, "int32": Int32Array
+    }};
+    var decode_column = function (column) {{
+        // base64 little endian typed array (see StaticCanvas.encode_column) or a list.
+        if (column.base64 === undefined) {{
+            return column;
+        }}
+        var bytes = atob(column.base64);
+        var data = new Uint8Array(bytes.length);
+        for (var i=0; i<bytes.length; i++) {{
+            data[i] = bytes.charCodeAt(i);
+        }}
+        var values = new TYPED_ARRAYS[column.dtype](data.buffer);
+        if (column.divisor) {{
+            var scaled = new Float64Array(values.length);
+            for (var i=0; i<values.length; i++) {{
+                scaled[i] = values[i] / column.divisor;
+            }}
+            values = scaled;
+        }}
+        return values;
+    }};
+    var expand_names = function (names) {{
+        // {{"start": s, "count": n[, "prefix": p]}} (see compact_names) or a list.
+        if (names.count === undefined) {{
+            return names;
+        }}
+        var result = new Array(names.count);
+        for (var i=0; i<names.count; i++) {{
+            result[i] = (names.prefix === undefined) ? names.start + i : names.prefix + (names.start + i);
+        }}
+        return result;
+    }};
+    var add_elements = function (names, tagname, columns, attribute_dict, style_dict, texts) {{
+        names = expand_names(names);
+        var atts = [];
+        var values = [];
+        for (var att in columns) {{
+            atts.push(att);
+            values.push(decode_column(columns[att]));
+        }}
+        var shared_text = (texts !== null && typeof texts !== "object") ? texts : null;
+        var fragment = document.createDocumentFragment();
+        for (var i=0; i<names.length; i++) {{
+            var element = svg_elt(tagname);
+            update_element(element, attribute_dict, style_dict, (texts && shared_text === null) ? texts[i] : shared_text);
+            for (var j=0; j<atts.length; j++) {{
+                element.setAttribute(atts[j], values[j][i]);
+            }}
+            $div.named_elements[names[i]] = element;
+            fragment.appendChild(element);
+        }}
+        svg.appendChild(fragment);
     }};
     var change_element = function (name, attribute_dict, style_dict, text) {{
-        var $element = $div.named_elements[name];
-        if ($element) {{
-            update_element($element, attribute_dict, style_dict, text);
+        var element = $div.named_elements[name];
+        if (element) {{
+            update_element(element, attribute_dict, style_dict, text);
         }}
     }};
-    var update_element = function ($element, atts, style, text) {{
-        var element = $element[0];
+    var update_element = function (element, atts, style, text) {{
         if (atts) {{
             for (var att in atts) {{
                 element.setAttribute(att, atts[att]);
@@ -112,9 +335,10 @@ JS_TEMPLATE = """
             }}
         }}
         if (text) {{
-            $element.empty();
-            var node = document.createTextNode(text);
-            $element.append(node);
+            while (element.firstChild) {{
+                element.removeChild(element.firstChild);
+            }}
+            element.appendChild(document.createTextNode(text));
         }}
     }};
     var empty = function () {{
@@ -124,10 +348,10 @@ JS_TEMPLATE = """
     var delete_names = function (names) {{
         for (var i=0; i<names.length; i++) {{
             var name = names[i];
-            var $element = $div.named_elements[name];
-            if ($element) {{
-                $element.remove();
-                delete that.named_elements[name];
+            var element = $div.named_elements[name];
+            if (element) {{
+                $(element).remove();
+                delete $div.named_elements[name];
             }}
         }}
     }};
@@ -0,0 +1,260 @@
+"""
+A substitute for jp_svg_canvas.canvas.SVGCanvasWidget
+which writes SVG markup directly to a file without a browser.
+This is intended for batch rendering of figures on servers with no notebook.
+
+By default the drawing is kept in a retained scene and written when the
+canvas is closed, so elements may be changed, deleted and grouped as on a
+widget.  With stream=True elements are streamed to the file as they are
+drawn, so memory use does not grow with the number of elements, but drawn
+elements cannot be changed or deleted.
+
+The output has the same layout as SVGCanvasWidget.save_as_SVG_file.
+"""
+
+from jp_svg_canvas import canvas
+from jp_svg_canvas import markup
+from jp_svg_canvas import scene
+
+# Number of elements of a batch formatted at a time.
+CHUNK_SIZE = 10000
+
+# Width reserved for the viewBox in the header so fit() can rewrite it in place.
+VIEWBOX_FIELD_WIDTH = 100
+
+
+class SVGFileCanvas(canvas.SVGHelperMixin):
+
+    # add new elements to this named group element (None for the top level of the svg).
+    default_parent = None
+
+    def __init__(self, file, viewBox="0 0 500 500", width=500, height=500, style=None, stream=False,
+            *pargs, **kwargs):
+        """
+        SVG file writer.  The file is complete when close() is called.
+
+        Parameters
+        ----------
+
+        file: str or file object
+            The path or open text file to write.
+
+        viewBox: str
+            The SVG viewBox.  With stream it may be changed until the first element
+            is drawn, or by fit() if the file is seekable.
+
+        width, height: number
+            The SVG width and height.
+
+        style: dict
+            Inline style for the svg element.
+
+        stream: bool
+            Write elements as they are drawn instead of when the file is closed.
+            Streamed elements cannot be changed or deleted (and are not grouped).
+        """
+        super(SVGFileCanvas, self).__init__(*pargs, **kwargs)
+        self.viewBox = viewBox
+        self.svg_width = width
+        self.svg_height = height
+        if style is not None:
+            self.set_style(style)
+        self.stream = stream
+        # streamed elements are written before they could be put in a group (see Cartesian.grouped).
+        self.supports_groups = not stream
+        if not stream:
+            self.retain_scene()
+        self.owns_file = not hasattr(file, "write")
+        if self.owns_file:
+            file = open(file, "w")
+        self.file = file
+        self.header_position = None
+        # length of the viewBox field written in the header (see header).
+        self.viewBox_field = None
+        self.fit_view = False
+        self.closed = False
+        self.element_count = 0
+        # running (min_x, min_y, max_x, max_y) of element geometry for fit().
+        self.bounds = None
+
+    def set_event_callback(self, callback):
+        # no events in a file: ignore.
+        pass
+
+    def send_commands(self):
+        pass
+
+    def header(self, viewBox):
+        """
+        svg start tag.  When streaming to a seekable file the viewBox is padded to a
+        fixed width field so fit() can rewrite it in place.
+        """
+        if self.viewBox_field is None:
+            self.viewBox_field = len(viewBox)
+            if self.stream and self.seekable():
+                self.viewBox_field = max(len(viewBox), VIEWBOX_FIELD_WIDTH)
+        if len(viewBox) > self.viewBox_field:
+            raise ValueError("viewBox %s does not fit in the %s characters reserved in the header." % (
+                repr(viewBox), self.viewBox_field))
+        padded = viewBox.ljust(self.viewBox_field)
+        return markup.svg_start(padded, self.svg_width, self.svg_height, self.get_style())
+
+    def start(self):
+        "Write the svg header if it has not been written."
+        if self.header_position is None:
+            if self.closed:
+                raise ValueError("SVG file is closed.")
+            try:
+                self.header_position = self.file.tell()
+            except (AttributeError, IOError, OSError):
+                self.header_position = -1
+            self.file.write(self.header(self.viewBox))
+            self.file.write(u"\n")
+
+    def seekable(self):
+        "Can the header of the file be rewritten?"
+        if self.header_position is not None:
+            return self.header_position >= 0
+        seekable = getattr(self.file, "seekable", None)
+        return seekable is not None and seekable()
+
+    def write(self, text):
+        self.start()
+        self.file.write(text)
+        self.element_count += 1
+
+    def update_bounds(self, box):
+        if box is not None:
+            if self.bounds is None:
+                self.bounds = box
+            else:
+                (a, b) = (self.bounds, box)
+                self.bounds = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+    def add_element(self, name, tagname, attribute_dict, style_dict=None, text=None, event_callback=None,
+            parent=None):
+        if style_dict is None:
+            style_dict = self.default_style
+        if parent is None:
+            parent = self.default_parent
+        attribute_dict = self.rounded(attribute_dict)
+        if self.scene is not None:
+            self.scene.add_element(name, tagname, attribute_dict, style_dict, text, parent)
+        if not self.stream:
+            return
+        self.update_bounds(scene.geometry_bounds(tagname, scene.element_getter(attribute_dict)))
+        self.write(markup.element_markup(tagname, attribute_dict, style_dict, text))
+
+    def add_elements(self, names, tagname, columns, attribute_dict=None, style_dict=None, texts=None,
+            event_callbacks=None):
+        if attribute_dict is None:
+            attribute_dict = {}
+        if style_dict is None:
+            style_dict = self.default_style
+        columns = self.rounded_columns(columns)
+        attribute_dict = self.rounded(attribute_dict)
+        if self.scene is not None:
+            self.scene.add_elements(names, tagname, columns, attribute_dict, style_dict, texts,
+                self.default_parent)
+        if not self.stream:
+            return
+        if tagname in scene.POINTS_TAGS:
+            for (_, atts, _, _) in canvas.batch_rows(names, columns, attribute_dict):
+                self.update_bounds(scene.geometry_bounds(tagname, scene.element_getter(atts)))
+        else:
+            self.update_bounds(scene.geometry_bounds(tagname, scene.columns_getter(columns, attribute_dict)))
+        self.start()
+        count = len(names)
+        for start in range(0, count, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, count)
+            elements = markup.batch_markup(tagname, columns, attribute_dict, style_dict, texts, start, stop)
+            self.file.write(u"".join(elements))
+            self.element_count += len(elements)
+
+    def add_group(self, name, attribute_dict=None, style_dict=None, parent=None):
+        "Add a named <g> group element (see SVGCanvasWidget.add_group)."
+        self.check_retained("grouped")
+        self.add_element(name, "g", attribute_dict or {}, style_dict or {}, parent=parent)
+
+    def check_retained(self, operation):
+        if self.stream:
+            raise ValueError(
+                "elements streamed to an SVG file cannot be %s: use SVGFileCanvas(..., stream=False)." % operation)
+
+    def change_element(self, name, attribute_dict, style_dict=None, text=None):
+        self.check_retained("changed")
+        self.scene.change_element(name, self.rounded(attribute_dict), style_dict, text)
+
+    def change_elements(self, names, columns, attribute_dict=None, style_dict=None, texts=None):
+        self.check_retained("changed")
+        columns = self.rounded_columns(columns)
+        attribute_dict = self.rounded(attribute_dict)
+        for (name, atts, text, _) in canvas.batch_rows(names, columns, attribute_dict, texts):
+            self.scene.change_element(name, atts, style_dict, text)
+
+    def delete_names(self, names):
+        self.check_retained("deleted")
+        self.scene.delete_names(names)
+
+    def empty(self):
+        self.check_retained("deleted")
+        self.scene.empty()
+        if self.id_allocator is not None:
+            self.id_allocator.reset()
+
+    def fit(self, changeView=True):
+        "Set the viewBox to the bounding box of the drawing when the file is closed."
+        if changeView:
+            if self.stream and not self.seekable():
+                raise ValueError("fit() of a streamed SVG file requires a seekable file.")
+            self.fit_view = True
+
+    def fit_viewBox(self):
+        "viewBox text for the bounding box of the drawing (or None if nothing has geometry)."
+        if self.stream:
+            return markup.box_viewBox(self.bounds)
+        return markup.box_viewBox(self.scene.bounding_box())
+
+    def close(self):
+        "Finish the SVG markup (and close the file if it was opened from a path)."
+        if self.closed:
+            return
+        viewBox = None
+        if self.fit_view:
+            viewBox = self.fit_viewBox()
+        try:
+            if self.stream:
+                self.close_stream(viewBox)
+            else:
+                if viewBox is not None:
+                    self.viewBox = viewBox
+                # the same layout as streamed elements.
+                for text in self.scene.markup():
+                    self.write(text)
+                self.start()
+                self.file.write(u"\n" + markup.SVG_END + u"\n")
+        finally:
+            self.closed = True
+            if self.owns_file:
+                self.file.close()
+            else:
+                self.file.flush()
+
+    def close_stream(self, viewBox):
+        "Finish streamed markup, rewriting the viewBox in the header for fit()."
+        self.start()
+        self.file.write(u"\n" + markup.SVG_END + u"\n")
+        if viewBox is not None:
+            # raises ValueError if the header has no room for the viewBox (the file keeps the original).
+            header = self.header(viewBox)
+            end = self.file.tell()
+            self.file.seek(self.header_position)
+            self.file.write(header)
+            self.file.seek(end)
+            self.viewBox = viewBox
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
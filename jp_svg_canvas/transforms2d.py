@@ -5,6 +5,7 @@ Matrix math for supporting 2d affine transformations.
 
 import numpy as np
 import math
+from jp_svg_canvas import markup
 
 #  https://developer.mozilla.org/en-US/docs/Web/SVG/Attribute/transform
 
@@ -13,7 +14,10 @@ def transform_matrix(a=1, c=0, e=0, b=0, d=1, f=0):
         [a, c, e],
         [b, d, f],
         [0, 0, 1]
-        ], np.float)
+        ], float)
+
+def identity():
+    return transform_matrix()
 
 def translate(x, y):
     "Translate by scalars."
@@ -52,7 +56,7 @@ def skewY(radians):
     return transform_matrix(b=math.tan(radians))
 
 def tapply(transform, x, y, epsilon=1e-10):
-    v3 = np.array([x, y, 1], np.float)
+    v3 = np.array([x, y, 1], float)
     vout = transform.dot(v3)
     assert abs(1 - vout[2]) < epsilon
     return vout[:2]
@@ -67,8 +71,28 @@ def compose(t1, t2):
 def vapply(transform, v):
     return tapply(transform, v[0], v[1])
 
+def tapply_arrays(transform, xs, ys):
+    "Apply transform to arrays of x and y values: returns (xs, ys)."
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    [[a, c, e], [b, d, f], _] = transform
+    return (a * xs + c * ys + e, b * xs + d * ys + f)
+
+def conjugate(transform, frame):
+    """
+    The motion of the space which frame maps to that matches transform in the
+    space it maps from (frame * transform * inverse(frame)).
+    """
+    return compose(compose(inverse(frame), transform), frame)
+
 def vector2d(x, y):
-    return np.array([x, y], np.float)
+    return np.array([x, y], float)
+
+def svg_transform(transform):
+    "SVG transform attribute value for a transform matrix."
+    [[a, c, e], [b, d, f], _] = transform
+    # rounding drops floating point noise like cos(pi/2) = 6e-17 (and + 0.0 drops -0.0).
+    return "matrix(%s)" % " ".join(markup.js_number(round(float(x), 12) + 0.0) for x in (a, b, c, d, e, f))
 
 def test(verbose=False):
     def assert_very_close(v1, v2, epsilon=1e-10):
@@ -82,8 +106,13 @@ def test(verbose=False):
     t1 = compose(translate(-3, -2), compose(rotate_degrees(90), translate(3,2)))
     t2 = compose(rotate_degrees(90), translate(5, -1))
     assert_very_close(vapply(t1, P1), vapply(t2, P1))
+    assert svg_transform(compose(scale(2), translate(3, -1))) == "matrix(2 0 0 2 3 -1)"
+    frame = compose(scale(2, -3), translate(10, 5))
+    assert_very_close(vapply(conjugate(t2, frame), vapply(frame, P)), vapply(frame, vapply(t2, P)))
+    (xs, ys) = tapply_arrays(t1, [P[0], P1[0]], [P[1], P1[1]])
+    assert_very_close(np.array([xs[1], ys[1]]), vapply(t1, P1))
     if verbose:
-        print "tests pass"
+        print("tests pass")
 
 if __name__ == "__main__":
     test(True)
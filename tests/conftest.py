@@ -0,0 +1,12 @@
+import pytest
+from jp_svg_canvas import canvas
+
+
+@pytest.fixture
+def widget():
+    "A rendered SVGCanvasWidget which records the messages it sends instead of sending them."
+    result = canvas.SVGCanvasWidget()
+    result.sent = []
+    result.send = lambda message, buffers=None: result.sent.append((message, buffers))
+    result.rendered = True
+    return result
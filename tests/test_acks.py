@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def ack(widget, counter):
+    widget.handle_custom_message(widget, {"indicator": "ack", "payload": counter})
+
+def test_no_futures_without_running_loop(widget):
+    widget.add_element("c", "circle", {"cx": 0})
+    assert widget.send_commands() is None
+    assert len(widget.sent) == 1
+    with pytest.raises(RuntimeError):
+        widget.wait_for_commands()
+
+def test_futures_resolve_on_ack(widget):
+    async def main():
+        widget.add_element("a", "circle", {"cx": 0})
+        first = widget.send_commands()
+        widget.add_element("b", "circle", {"cx": 1})
+        second = widget.send_commands()
+        waiting = widget.wait_for_commands(timeout=1.0)
+        ack(widget, 1)
+        assert first.result() is True
+        assert not second.done()
+        ack(widget, 2)
+        assert second.result() is True
+        assert await waiting is True
+        assert widget.in_flight == 0 and not widget.command_pending
+        # an acknowledged counter resolves immediately.
+        assert await widget.wait_for_commands(1) is True
+    run(main())
+
+def test_futures_resolve_false_on_timeout(widget):
+    async def main():
+        widget.command_timeout = 0.01
+        widget.add_element("a", "circle", {"cx": 0})
+        future = widget.send_commands()
+        assert await future is False
+        assert widget.in_flight == 0
+        assert widget.expired_counter == 1
+        # a late acknowledgement is still accepted, and later waits succeed.
+        ack(widget, 1)
+        assert await widget.wait_for_commands(1) is True
+    run(main())
+
+def test_wait_for_commands_times_out(widget):
+    async def main():
+        widget.command_timeout = None
+        widget.add_element("a", "circle", {"cx": 0})
+        widget.send_commands()
+        with pytest.raises(asyncio.TimeoutError):
+            await widget.wait_for_commands(timeout=0.01)
+    run(main())
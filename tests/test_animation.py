@@ -0,0 +1,51 @@
+import io
+import numpy as np
+import pytest
+from jp_svg_canvas import animation
+from jp_svg_canvas import svg_file
+
+
+def test_linear_interpolation_at_seek_times():
+    timeline = animation.Timeline()
+    timeline.track(["a", "b"], "cx", [0, 1, 3], [[0, 10], [10, 10], [30, 0]])
+    assert timeline.duration == 3.0
+    for (t, expected) in [(-1, [0, 10]), (0.5, [5, 10]), (2, [20, 5]), (3, [30, 0]), (9, [30, 0])]:
+        [(names, att, values)] = timeline.values_at(t)
+        assert (names, att) == (["a", "b"], "cx")
+        assert np.allclose(values, expected)
+
+def test_easings_and_loop():
+    timeline = animation.Timeline(loop=True)
+    timeline.track(["a"], "r", [0, 2], [0, 8], easing="ease-in-out")
+    timeline.track(["a"], "cx", [0, 2], [0, 8], easing="step")
+    # colors change in steps.
+    timeline.track(["a"], "fill", [0, 1], ["red", "blue"])
+    [(_, _, r), (_, _, cx), (_, _, fill)] = timeline.values_at(0.5)
+    assert np.allclose(r, [8 * 0.15625]) and np.allclose(cx, [0])
+    assert list(fill) == ["red"]
+    # the loop wraps time 2.5 to 0.5.
+    [(_, _, r), _, _] = timeline.values_at(2.5)
+    assert np.allclose(r, [8 * 0.15625])
+    [(_, _, r), (_, _, cx), (_, _, fill)] = timeline.values_at(1.999999)
+    assert np.allclose(cx, [0]) and list(fill) == ["blue"]
+    assert np.allclose(animation.ease("ease-in-out", 0.5), 0.5)
+
+def test_track_checks_shapes():
+    timeline = animation.Timeline()
+    with pytest.raises(ValueError):
+        timeline.track(["a", "b"], "cx", [0, 1], [[0, 1, 2], [0, 1, 2]])
+    with pytest.raises(AssertionError):
+        timeline.track(["a"], "cx", [1, 0], [0, 1])
+
+def test_fallback_play_lands_on_end_state():
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100")
+    target.add_elements(["a", "b"], "circle", {"cx": [0, 0]}, {"r": 1})
+    timeline = animation.Timeline()
+    timeline.track(["a", "b"], "cx", [0, 2], [[0, 0], [20, 40]])
+    target.define_timeline("move", timeline)
+    target.seek_timeline("move", 1.0)
+    assert [target.scene.element(name)[1]["cx"] for name in "ab"] == [10, 20]
+    done = []
+    target.play_timeline("move", callback=done.append)
+    assert [target.scene.element(name)[1]["cx"] for name in "ab"] == [20, 40]
+    assert done == [{"name": "move", "time": 2.0}]
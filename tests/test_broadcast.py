@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from jp_svg_canvas import cartesian_svg
+
+CASES = [
+    # (numeric arguments, other arguments)
+    ((1, 2, 3), ("name", "red", None, {"opacity": 0.5})),
+    (([1, 2, 3], 4, [5.5, 6, 7]), ("name", ["red", "green", "blue"], None, {})),
+    ((np.arange(4), np.ones(4), 2), (["a", "b", "c", "d"], "black", [None] * 4, [{"x": i} for i in range(4)])),
+    (([2, 3], [1]), (["only"], ["red"], None, [{"a": 1}])),
+    ((np.array([1.5]), 2), ([None], "blue", None, None)),
+]
+
+@pytest.mark.parametrize("numeric, other", CASES)
+def test_broadcast_matches_unify_shapes(numeric, other):
+    (n, arrays, values) = cartesian_svg.broadcast_arguments(numeric, other)
+    unified = cartesian_svg.unify_shapes(*(list(numeric) + list(other)))
+    assert n == len(unified[0])
+    for (array, reference) in zip(arrays, unified[:len(numeric)]):
+        assert array.dtype == np.float64
+        assert array.tolist() == [float(x) for x in reference]
+    for (value, reference) in zip(values, unified[len(numeric):]):
+        assert [cartesian_svg.element(value, i) for i in range(n)] == list(reference)
+
+def test_shared_values_stay_unboxed():
+    (n, _, [name, style]) = cartesian_svg.broadcast_arguments(([1, 2],), ("name", {"fill": "red"}))
+    assert n == 2
+    assert name == "name" and style == {"fill": "red"}
+    assert not cartesian_svg.is_varying(name)
+
+def test_length_one_sequences_broadcast_in_any_order():
+    # unify_shapes fails when a length 1 sequence comes first.
+    (n, [xs, ys], _) = cartesian_svg.broadcast_arguments(([1], [2, 3]), ())
+    assert n == 2
+    assert xs.tolist() == [1.0, 1.0]
+
+def test_incompatible_lengths():
+    with pytest.raises(ValueError):
+        cartesian_svg.broadcast_arguments(([1, 2], [1, 2, 3]), ())
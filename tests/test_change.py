@@ -0,0 +1,63 @@
+import io
+import numpy as np
+import pytest
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import svg_file
+
+
+def make_cartesian():
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100")
+    return (target, cartesian_svg.Cartesian(target, scaling=2.0, y_offset=50.0))
+
+def attribute(target, names, att):
+    return [target.scene.element(name)[1][att] for name in names]
+
+def test_change_per_element_values_in_drawing_order():
+    (target, C) = make_cartesian()
+    C.circles("c", [0, 1], 0, 1)
+    C.circles("d", 2, 0, 1)
+    C.circles("c", 3, 0, 1)
+    names = C.element_names(["c", "d"])
+    assert names == ["c*1", "c*2", "c*3", "d*1"]
+    C.change(["c", "d"], fill=["red", "green", "blue", "black"], opacity=0.5)
+    assert attribute(target, names, "fill") == ["red", "green", "blue", "black"]
+    assert attribute(target, names, "opacity") == [0.5] * 4
+
+def test_change_circles_projects_arrays():
+    (target, C) = make_cartesian()
+    C.circles("c", [0, 1, 2], 0, 1)
+    C.change_circles("c", cx=np.array([5, 6, 7]), cy=1, r=[1, 2, 3])
+    names = C.element_names(["c"])
+    assert attribute(target, names, "cx") == [10, 12, 14]
+    assert attribute(target, names, "cy") == [52] * 3
+    assert attribute(target, names, "r") == [2, 4, 6]
+
+def test_change_widget_sends_one_columnar_command(widget):
+    C = cartesian_svg.Cartesian(widget)
+    C.circles("c", [0, 1, 2], 0, 1)
+    C.flush()
+    widget.sent = []
+    C.change("c", fill=["red", "green", "blue"])
+    C.flush()
+    [((_, [command]), _)] = widget.sent
+    assert command["command"] == "change_elements"
+    assert list(command["names"]) == C.element_names(["c"])
+    assert command["columns"] == {"fill": ["red", "green", "blue"]}
+
+def test_change_element_fallback():
+    (target, C) = make_cartesian()
+    C.circles("c", [0, 1, 2], 0, 1)
+    # a target without batched changes gets one change_element per element.
+    target.change_elements = None
+    C.change("c", fill=["red", "green", "blue"], stroke="black")
+    names = C.element_names(["c"])
+    assert attribute(target, names, "fill") == ["red", "green", "blue"]
+    assert attribute(target, names, "stroke") == ["black"] * 3
+
+def test_change_mismatched_lengths():
+    (target, C) = make_cartesian()
+    C.circles("c", [0, 1, 2], 0, 1)
+    with pytest.raises(ValueError):
+        C.change("c", fill=["red", "green"])
+    with pytest.raises(ValueError):
+        C.change_circles("c", cx=[1, 2, 3, 4])
@@ -0,0 +1,86 @@
+import numpy as np
+from jp_svg_canvas import canvas
+
+
+def decode(reference, buffers):
+    "The values canvas.js decodes from a column reference."
+    values = np.frombuffer(buffers[reference["buffer"]], dtype=np.dtype(reference["dtype"]).newbyteorder("<"))
+    divisor = reference.get("divisor")
+    if divisor:
+        return values / float(divisor)
+    return values
+
+def test_encode_columns_numeric_and_other():
+    buffers = []
+    encoded = canvas.encode_columns({"cx": [1.5, 2.5], "n": np.array([1, 2]), "fill": ["red", "blue"]},
+        "float32", buffers)
+    assert encoded["cx"] == {"buffer": 0, "dtype": "float32"}
+    assert encoded["n"] == {"buffer": 1, "dtype": "float32"}
+    assert encoded["fill"] == ["red", "blue"]
+    assert len(buffers) == 2
+    assert decode(encoded["cx"], buffers).tolist() == [1.5, 2.5]
+    assert memoryview(buffers[0]).nbytes == 8
+
+def test_encode_columns_little_endian():
+    buffers = []
+    canvas.encode_columns({"x": np.array([1.0], dtype=">f8")}, "float64", buffers)
+    assert bytes(buffers[0]) == np.array([1.0], dtype="<f8").tobytes()
+
+def test_widget_sends_binary_buffers(widget):
+    widget.add_elements(["a", "b"], "circle", {"cx": np.array([1.0, 2.0])}, {"r": 3})
+    widget.send_commands()
+    [(message, buffers)] = widget.sent
+    [command] = message[1]
+    assert command["columns"]["cx"] == {"buffer": 0, "dtype": "float32"}
+    assert decode(command["columns"]["cx"], buffers).tolist() == [1.0, 2.0]
+    assert command["atts"] == {"r": 3}
+
+def test_batch_rows():
+    rows = list(canvas.batch_rows(["a", "b"], {"cx": np.array([1.0, 2.0])}, {"r": 3}, ["x", "y"]))
+    assert rows == [("a", {"r": 3, "cx": 1.0}, "x", None), ("b", {"r": 3, "cx": 2.0}, "y", None)]
+    assert type(rows[0][1]["cx"]) is float
+
+def test_quantize_int16_int32_and_fallback():
+    assert canvas.quantize(np.array([1.25, -3.5]), 2).dtype == np.dtype("<i2")
+    assert canvas.quantize(np.array([1.25, 400.0]), 2).dtype == np.dtype("<i4")
+    assert canvas.quantize(np.array([1e12]), 2) is None
+    assert canvas.quantize(np.array([np.nan]), 2) is None
+    assert len(canvas.quantize(np.array([]), 2)) == 0
+
+def test_encode_columns_quantized():
+    buffers = []
+    values = np.array([1 / 3.0, 2 / 3.0, 100.0])
+    encoded = canvas.encode_columns({"cx": values}, "float32", buffers, digits=2)
+    assert encoded["cx"] == {"buffer": 0, "dtype": "int16", "divisor": 100}
+    assert decode(encoded["cx"], buffers).tolist() == [0.33, 0.67, 100.0]
+    # values which do not fit are sent with the column dtype.
+    encoded = canvas.encode_columns({"cx": np.array([1e12])}, "float64", buffers, digits=2)
+    assert encoded["cx"] == {"buffer": 1, "dtype": "float64"}
+
+def test_round_value():
+    assert canvas.round_value({"x": 1 / 3.0, "n": [2.0004, "a"]}, 2) == {"x": 0.33, "n": [2, "a"]}
+    assert type(canvas.round_value(2.0004, 2)) is int
+    assert canvas.round_value(1 / 3.0, None) == 1 / 3.0
+
+def test_set_pixel_precision(widget):
+    widget.viewBox = "0 0 1000 1000"
+    widget.svg_width = 500
+    # a pixel is 2 units: resolving a tenth of a pixel (0.2) needs 1 decimal.
+    assert widget.set_pixel_precision(10) == 1
+    widget.viewBox = "0 0 1 1"
+    assert widget.set_pixel_precision(10) == 4
+
+def test_precision_reduces_payload(widget):
+    rng = np.random.RandomState(0)
+    (xs, ys) = rng.uniform(0, 500, (2, 1000))
+    widget.add_element("c", "circle", {"cx": 1 / 3.0})
+    widget.add_elements(range(1000), "circle", {"cx": xs, "cy": ys})
+    full = widget.encode_commands(widget.buffered_commands)
+    widget.buffered_commands = None
+    widget.set_pixel_precision()
+    widget.add_element("c", "circle", {"cx": 1 / 3.0})
+    widget.add_elements(range(1000), "circle", {"cx": xs, "cy": ys})
+    (commands, buffers) = widget.encode_commands(widget.buffered_commands)
+    assert commands[0]["atts"]["cx"] == 0.3
+    assert commands[1]["columns"]["cx"]["dtype"] == "int16"
+    assert sum(memoryview(b).nbytes for b in buffers) * 2 == sum(memoryview(b).nbytes for b in full[1])
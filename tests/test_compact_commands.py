@@ -0,0 +1,108 @@
+from jp_svg_canvas import canvas
+from jp_svg_canvas import cartesian_svg
+
+
+def circles(cartesian, prefix):
+    cartesian.circles(prefix, [1, 2], [1, 2], [3, 3])
+
+def sent_commands(widget):
+    return [command for (message, _) in widget.sent for command in message[1]]
+
+def test_grouped_delete_keeps_group_add(widget):
+    cartesian = cartesian_svg.Cartesian(widget)
+    cartesian.grouped = True
+    cartesian.buffered = True
+    circles(cartesian, "p")
+    cartesian.delete("p")
+    cartesian.flush()
+    commands = sent_commands(widget)
+    adds = [c for c in commands if c["command"] == "add_element"]
+    assert [c["name"] for c in adds] == ["p*0"]
+    assert commands[-1] == {"command": "delete", "names": ["p*0"]}
+
+def test_grouped_delete_then_redraw(widget):
+    cartesian = cartesian_svg.Cartesian(widget)
+    cartesian.grouped = True
+    cartesian.buffered = True
+    for frame in range(3):
+        cartesian.delete("p")
+        circles(cartesian, "p")
+    cartesian.flush()
+    # every batch of children is added to a group which is on the canvas when it is added.
+    live = set()
+    for command in sent_commands(widget):
+        kind = command["command"]
+        if kind == "add_element":
+            live.add(command["name"])
+        elif kind == "add_elements":
+            assert command["parent"] in live
+        elif kind == "delete":
+            live.difference_update(command["names"])
+    assert live == set(["p*0"])
+
+def test_nested_group_parent_kept():
+    commands = [
+        {"command": "add_element", "name": "a", "tag": "g", "atts": {}, "style": {}, "text": None},
+        {"command": "add_element", "name": "b", "tag": "g", "atts": {}, "style": {}, "text": None, "parent": "a"},
+        {"command": "add_element", "name": "c", "tag": "circle", "atts": {}, "style": {}, "text": None, "parent": "b"},
+        {"command": "delete", "names": ["a"]},
+    ]
+    assert canvas.compact_commands(commands) == commands
+
+def test_dead_add_and_change_dropped():
+    commands = [
+        {"command": "add_element", "name": "a", "tag": "circle", "atts": {"r": 1}, "style": {}, "text": None},
+        {"command": "change_element", "name": "a", "atts": {"r": 2}, "style": {}, "text": None},
+        {"command": "delete", "names": ["a"]},
+    ]
+    # "a" may have been on the canvas before, so the delete is kept.
+    assert canvas.compact_commands(commands) == [{"command": "delete", "names": ["a"]}]
+
+def test_changes_merged_into_add():
+    commands = [
+        {"command": "add_element", "name": "a", "tag": "circle", "atts": {"r": 1}, "style": {}, "text": None},
+        {"command": "change_element", "name": "a", "atts": {"cx": 2}, "style": {"fill": "red"}, "text": None},
+    ]
+    [merged] = canvas.compact_commands(commands)
+    assert merged["command"] == "add_element"
+    assert merged["atts"] == {"r": 1, "cx": 2}
+    assert merged["style"] == {"fill": "red"}
+
+def test_commands_before_empty_dropped():
+    commands = [
+        {"command": "add_element", "name": "a", "tag": "circle", "atts": {}, "style": {}, "text": None},
+        {"command": "empty"},
+        {"command": "delete", "names": ["a"]},
+    ]
+    assert canvas.compact_commands(commands) == [{"command": "empty"}]
+
+def test_fit_is_a_barrier():
+    add = {"command": "add_element", "name": "a", "tag": "circle", "atts": {}, "style": {}, "text": None}
+    commands = [add, {"command": "fit", "changeView": True}, {"command": "delete", "names": ["a"]}]
+    assert canvas.compact_commands(commands) == commands
+
+def test_change_elements_batches_merged():
+    first = {"command": "change_elements", "names": ["a", "b"], "columns": {"cx": [1, 2]},
+        "atts": {}, "style": {}, "texts": None}
+    second = {"command": "change_elements", "names": ["a", "b"], "columns": {"cy": [3, 4]},
+        "atts": {"r": 5}, "style": {}, "texts": None}
+    [merged] = canvas.compact_commands([first, second])
+    assert merged["columns"] == {"cx": [1, 2], "cy": [3, 4]}
+    assert merged["atts"] == {"r": 5}
+
+def test_deleted_fresh_name_after_empty():
+    commands = [
+        {"command": "empty"},
+        {"command": "add_element", "name": "a", "tag": "circle", "atts": {}, "style": {}, "text": None},
+        {"command": "delete", "names": ["a", "b"]},
+    ]
+    # neither name can be on the canvas after the empty.
+    assert canvas.compact_commands(commands) == [{"command": "empty"}]
+
+def test_widget_counts_eliminated_commands(widget):
+    for frame in range(5):
+        widget.change_element("c", {"cx": frame})
+    widget.send_commands()
+    [(message, _)] = widget.sent
+    assert len(message[1]) == 1
+    assert widget.stats()["commands_eliminated"] == 4
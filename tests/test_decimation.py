@@ -0,0 +1,36 @@
+import numpy as np
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import svg_file
+import io
+
+
+def dense_curve(C):
+    xs = np.linspace(0, 10, 100000)
+    C.sequence("curve", xs, np.sin(xs))
+
+def points(target):
+    [(_, _, atts, _, _)] = list(target.scene.elements())
+    return len(atts["points"].split())
+
+def test_not_decimated_by_default():
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100")
+    C = cartesian_svg.doodle(0, -1, 10, 1, svg=target)
+    dense_curve(C)
+    assert points(target) == 100000
+    assert C.last_decimation is None
+
+def test_decimation_opt_in():
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100")
+    C = cartesian_svg.doodle(0, -1, 10, 1, svg=target)
+    C.decimation_tolerance = 0.5
+    dense_curve(C)
+    (before, after) = C.last_decimation
+    assert before == 100000
+    assert after == points(target) < 5000
+
+def test_decimation_indices_keep_extrema_and_breaks():
+    xs = np.arange(10.0)
+    ys = np.array([0, 5, -5, 1, np.nan, 2, 3, 9, 4, 4])
+    keep = cartesian_svg.decimation_indices(xs, ys, 100.0)
+    # both ends and extrema of each run, and the break between the runs.
+    assert keep.tolist() == [0, 1, 2, 3, 4, 5, 7, 9]
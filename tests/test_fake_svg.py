@@ -0,0 +1,105 @@
+import ast
+import numpy as np
+from jp_svg_canvas import fake_svg
+
+
+def draw(fake):
+    fake.line("a", 0, 0, 1, 1, "red")
+    fake.line("b", 1, 1, 2, 0.1, "red")
+    fake.line("c", 2, 0, 3, 1, "blue", 2, **{"stroke-dasharray": "2,1"})
+    fake.polyline("p", [(0, 0), (1, 2), (3, 1)], "blue", 2, **{"stroke-dasharray": "2,1"})
+    fake.circle("d", 5, 5, 1.5, "green")
+    fake.circle("e", 6, 5, 1, "green")
+    fake.rect("f", 1, 2, 3, 4, "green")
+    fake.text("t", 1, 1, "label", "green")
+    fake.rect("g", 0, 0, 1, 1, "yellow")
+
+def statements(fake):
+    fake._end_path()
+    fake._end_geometry()
+    return fake.canvas_commands
+
+def context_calls(fake):
+    """
+    The context calls and assignments made by the embedded statements, with draw
+    loops of typed array mode expanded like DRAW_TEMPLATE (numbers as float32).
+    """
+    data = np.frombuffer(np.asarray(fake.geometry, dtype="<f4").tobytes(), dtype="<f4").tolist()
+    calls = []
+    def call(name, *args):
+        calls.append((name,) + tuple(float(np.float32(x)) if isinstance(x, float) else x for x in args))
+    for statement in statements(fake):
+        statement = statement.rstrip(";").replace("Math.PI * 2", repr(2 * np.pi))
+        if " = " in statement:
+            (lhs, rhs) = statement.split(" = ")
+            calls.append((lhs, ast.literal_eval(rhs)))
+            continue
+        (name, args) = statement.split("(", 1)
+        args = ast.literal_eval("(%s,)" % args[:-1]) if args[:-1] else ()
+        if name == "draw_lines":
+            for i in range(args[0], args[1], 4):
+                call("ctx.moveTo", data[i], data[i+1])
+                call("ctx.lineTo", data[i+2], data[i+3])
+        elif name == "draw_polyline":
+            (start, stop) = args
+            call("ctx.moveTo", data[start], data[start+1])
+            for i in range(start + 2, stop, 2):
+                call("ctx.lineTo", data[i], data[i+1])
+        elif name == "draw_circles":
+            for i in range(args[0], args[1], 3):
+                call("ctx.moveTo", data[i] + data[i+2], data[i+1])
+                call("ctx.arc", data[i], data[i+1], data[i+2], 0, 2 * np.pi)
+        elif name == "draw_rects":
+            for i in range(args[0], args[1], 4):
+                call("ctx.rect", *data[i:i+4])
+        else:
+            call(name, *[float(x) if isinstance(x, int) and not isinstance(x, bool) else x for x in args])
+    return calls
+
+def names(fake):
+    return [statement.split("(")[0].split(" = ")[0] for statement in statements(fake)]
+
+def test_redundant_state_is_not_assigned():
+    fake = fake_svg.FakeCanvasWidget("0 0 10 10")
+    draw(fake)
+    calls = names(fake)
+    assert calls.count("ctx.strokeStyle") == 2
+    assert calls.count("ctx.setLineDash") == 2
+    # the text uses the fill color of the circles and rects.
+    assert calls.count("ctx.fillStyle") == 2
+
+def test_paths_split_at_style_changes_and_text():
+    fake = fake_svg.FakeCanvasWidget("0 0 10 10")
+    draw(fake)
+    calls = names(fake)
+    # red lines, blue dashed lines, green fills, yellow rect.
+    assert calls.count("ctx.beginPath") == 4
+    assert calls.count("ctx.stroke") == 2 and calls.count("ctx.fill") == 2
+    assert calls.index("ctx.fill") < calls.index("ctx.fillText")
+
+def test_max_path_length(monkeypatch):
+    monkeypatch.setattr(fake_svg, "MAX_PATH_LENGTH", 3)
+    fake = fake_svg.FakeCanvasWidget("0 0 10 10")
+    for i in range(7):
+        fake.line(str(i), i, 0, i, 1)
+    calls = names(fake)
+    assert calls.count("ctx.beginPath") == calls.count("ctx.stroke") == 3
+    assert calls.count("ctx.strokeStyle") == 1
+
+def test_translucent_colors_are_not_merged():
+    fake = fake_svg.FakeCanvasWidget("0 0 10 10")
+    for i in range(3):
+        fake.circle(str(i), i, 0, 2, "rgba(255, 0, 0, 0.5)")
+    calls = names(fake)
+    assert calls.count("ctx.beginPath") == calls.count("ctx.fill") == 3
+    assert [fake_svg.translucent(color) for color in
+        ("#f008", "#ff000080", "hsla(0, 0%, 0%, 0.1)", "transparent", "rgb(0 0 0 / 50%)")] == [True] * 5
+    assert [fake_svg.translucent(color) for color in ("red", "#f00", "#ff0000", "rgb(1, 2, 3)", 3)] == [False] * 5
+
+def test_typed_arrays_make_the_same_calls():
+    (plain, typed) = (fake_svg.FakeCanvasWidget("0 0 10 10"), fake_svg.FakeCanvasWidget("0 0 10 10", typed_arrays=True))
+    for fake in (plain, typed):
+        draw(fake)
+    assert len(statements(typed)) < len(statements(plain))
+    assert context_calls(typed) == context_calls(plain)
+    assert "var draw_lines" in typed.embedding()
@@ -0,0 +1,74 @@
+import random
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import ids
+
+
+def test_allocate_contiguous_ranges():
+    allocator = ids.IdAllocator()
+    assert allocator.allocate(3) == range(0, 3)
+    assert allocator.allocate(2) == range(3, 5)
+    assert len(allocator) == 5
+
+def test_freed_ranges_reused_and_merged():
+    allocator = ids.IdAllocator()
+    allocator.allocate(10)
+    allocator.free(range(2, 4))
+    allocator.free(range(4, 6))
+    allocator.free([6])
+    assert (allocator.starts, allocator.stops) == ([2], [7])
+    # the first free interval large enough is used.
+    assert allocator.allocate(5) == range(2, 7)
+    assert allocator.allocate(1) == range(10, 11)
+
+def test_free_at_top_and_twice():
+    allocator = ids.IdAllocator()
+    allocator.allocate(10)
+    allocator.free(range(5, 10))
+    allocator.free(range(5, 10))
+    assert allocator.top == 5
+    assert allocator.starts == []
+    allocator.free(range(0, 5))
+    assert len(allocator) == 0
+    assert allocator.allocate(3) == range(0, 3)
+
+def test_random_allocations_are_disjoint():
+    rng = random.Random(0)
+    allocator = ids.IdAllocator()
+    live = []
+    for step in range(2000):
+        if live and rng.random() < 0.45:
+            allocator.free(live.pop(rng.randrange(len(live))))
+        else:
+            live.append(allocator.allocate(rng.randint(1, 20)))
+        used = sorted(i for identifiers in live for i in identifiers)
+        assert len(used) == len(set(used)) == len(allocator)
+
+def test_wire_names():
+    assert ids.wire_names(range(4, 7)) == {"start": 4, "count": 3}
+    assert ids.wire_names(("a", "b")) == ["a", "b"]
+    assert not ids.is_id_range(range(0, 10, 2))
+
+def test_range_index():
+    index = ids.RangeIndex()
+    index.add(range(10, 20), "b")
+    index.add(range(0, 5), "a")
+    assert [index.get(i) for i in (0, 4, 5, 10, 19, 20)] == ["a", "a", None, "b", "b", None]
+    index.remove(range(0, 5))
+    assert index.get(0, "missing") == "missing"
+
+def test_cartesian_integer_ids(widget):
+    C = cartesian_svg.Cartesian(widget)
+    C.integer_ids = True
+    C.buffered = True
+    C.circles("a", [1, 2, 3], [1, 2, 3], 1)
+    C.circles("b", [1, 2], [1, 2], 1)
+    C.circles("a", [4], [4], 1)
+    assert C.element_names(["a"]) == [0, 1, 2, 5]
+    C.delete("a")
+    assert C.id_index.get(0) is None
+    # freed identifiers are reused.
+    C.circles("c", [1, 2, 3], [1, 2, 3], 1)
+    assert C.element_names(["c"]) == range(0, 3)
+    C.flush()
+    command = [c for c in widget.sent[-1][0][1] if c["command"] == "add_elements"][-1]
+    assert command["names"] == {"start": 0, "count": 3}
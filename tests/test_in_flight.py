@@ -0,0 +1,61 @@
+import asyncio
+
+def test_batches_sent_immediately_by_default(widget):
+    # a synchronous animation loop: no acknowledgement can arrive in between.
+    for frame in range(10):
+        widget.add_element("c", "circle", {"cx": frame})
+        widget.send_commands()
+    assert len(widget.sent) == 10
+    assert widget.queue_depth == 0
+
+def test_window_queues_and_coalesces(widget):
+    widget.max_in_flight = 2
+    for frame in range(5):
+        widget.change_element("c", {"cx": frame})
+        widget.send_commands()
+    assert len(widget.sent) == 2
+    assert widget.queue_depth == 3
+    widget.handle_ack(2)
+    assert len(widget.sent) == 3
+    [(message, _)] = widget.sent[2:]
+    # the queued changes of one element are compacted into one command.
+    assert message[1] == [{"command": "change_element", "name": "c", "atts": {"cx": 4},
+        "style": {}, "text": None}]
+    assert widget.stats()["batches_coalesced"] == 2
+
+def test_timeout_frees_a_slot(widget):
+    async def main():
+        widget.max_in_flight = 1
+        widget.command_timeout = 0.01
+        widget.add_element("a", "circle", {"cx": 0})
+        first = widget.send_commands()
+        widget.add_element("b", "circle", {"cx": 1})
+        second = widget.send_commands()
+        assert len(widget.sent) == 1 and widget.queue_depth == 1
+        assert await first is False
+        # the expired batch gave its place to the queued one.
+        assert len(widget.sent) == 2 and widget.queue_depth == 0
+        assert widget.in_flight == 1
+        widget.handle_ack(2)
+        assert await second is True
+    asyncio.run(main())
+
+def test_coalesced_futures_resolve_with_their_batch(widget):
+    async def main():
+        widget.max_in_flight = 1
+        widget.command_timeout = None
+        widget.add_element("a", "circle", {"cx": 0})
+        first = widget.send_commands()
+        queued = []
+        for frame in range(3):
+            widget.change_element("a", {"cx": frame})
+            queued.append(widget.send_commands())
+        assert len(widget.sent) == 1
+        widget.handle_ack(1)
+        assert first.result() is True
+        # the three queued batches went out as batch 2.
+        assert len(widget.sent) == 2 and widget.sent[1][0][0] == 2
+        assert not any(future.done() for future in queued)
+        widget.handle_ack(2)
+        assert [future.result() for future in queued] == [True, True, True]
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Pixel comparisons of RasterCanvas drawings with the checked in PNG images in
+tests/reference.  Set JP_SVG_CANVAS_REGENERATE=1 to rewrite the references
+after an intended rendering change (and inspect them before committing).
+"""
+
+import os
+import struct
+import zlib
+import numpy as np
+import pytest
+from jp_svg_canvas import raster
+
+REFERENCE_DIR = os.path.join(os.path.dirname(__file__), "reference")
+
+# allowed difference of a channel (rounding) and fraction of pixels which may differ by more.
+CHANNEL_TOLERANCE = 2
+PIXEL_FRACTION = 0.001
+
+
+def read_png(data):
+    "(height, width, 4) uint8 array for an RGBA PNG written by raster.png_bytes (filter type 0 rows)."
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    position = 8
+    idat = []
+    while position < len(data):
+        (length,) = struct.unpack(">I", data[position:position + 4])
+        kind = data[position + 4:position + 8]
+        body = data[position + 8:position + 8 + length]
+        if kind == b"IHDR":
+            (width, height) = struct.unpack(">II", body[:8])
+        elif kind == b"IDAT":
+            idat.append(body)
+        position += length + 12
+    rows = np.frombuffer(zlib.decompress(b"".join(idat)), dtype=np.uint8).reshape((height, width * 4 + 1))
+    assert (rows[:, 0] == 0).all()
+    return rows[:, 1:].reshape((height, width, 4))
+
+def draw_line(target):
+    target.line(None, 5, 10, 90, 40, "black", 1)
+    target.line(None, 10, 90, 30, 15, "blue", 3)
+    target.line(None, 50, 50, 95, 95, "red", 0.2)
+
+def draw_circle(target):
+    target.circle(None, 30, 30, 20, "blue")
+    target.circle(None, 70, 60, 8.5, "#ff8000")
+    target.circle(None, 50, 90, 0.7, "black")
+
+def draw_rect(target):
+    target.rect(None, 10.25, 10.5, 30, 20, "green")
+    target.rect(None, 90, 90, -35.5, -20.25, "navy")
+
+def draw_text(target):
+    target.text(None, 5, 20, "Hello, World!", "black")
+    target.text(None, 50, 60, "middle", "red", style_dict={"font-size": 16, "text-anchor": "middle"})
+
+def draw_dashes(target):
+    target.line(None, 5, 20, 95, 20, "black", 2, **{"stroke-dasharray": "6 3"})
+    target.line(None, 5, 40, 95, 80, "purple", 1, **{"stroke-dasharray": "4"})
+    target.polyline(None, [(5, 95), (50, 60), (95, 95)], "teal", 1.5, **{"stroke-dasharray": "2,1"})
+
+def draw_fills(target):
+    target.rect(None, 10, 10, 60, 60, "rgba(255, 0, 0, 0.5)")
+    target.circle(None, 60, 60, 30, "#0000ff80")
+    target.circle(None, 40, 40, 10, "none")
+    target.rect(None, 60, 10, 30, 30, "rgb(0%, 50%, 0%)")
+
+DRAWINGS = {
+    "line": draw_line,
+    "circle": draw_circle,
+    "rect": draw_rect,
+    "text": draw_text,
+    "dashes": draw_dashes,
+    "fills": (draw_fills, "white"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(DRAWINGS))
+def test_reference_image(name):
+    draw = DRAWINGS[name]
+    background = None
+    if isinstance(draw, tuple):
+        (draw, background) = draw
+    target = raster.RasterCanvas("0 0 100 100", dimension=100, background=background)
+    draw(target)
+    data = target.png()
+    path = os.path.join(REFERENCE_DIR, name + ".png")
+    if os.environ.get("JP_SVG_CANVAS_REGENERATE"):
+        with open(path, "wb") as f:
+            f.write(data)
+    with open(path, "rb") as f:
+        expected = read_png(f.read()).astype(int)
+    actual = read_png(data).astype(int)
+    assert actual.shape == expected.shape
+    different = (np.abs(actual - expected) > CHANNEL_TOLERANCE).any(axis=2)
+    assert different.mean() <= PIXEL_FRACTION, "%s pixels differ" % different.sum()
+
+def test_png_round_trip():
+    rgba = np.arange(3 * 5 * 4, dtype=np.uint8).reshape((3, 5, 4))
+    assert (read_png(raster.png_bytes(rgba)) == rgba).all()
+
+def test_parse_color():
+    assert raster.parse_color("none") is None
+    assert raster.parse_color("#f00") == (1.0, 0.0, 0.0, 1.0)
+    assert raster.parse_color("rgba(0, 0, 255, 0.5)") == (0.0, 0.0, 1.0, 0.5)
+
+def test_many_short_lines():
+    # a smoke test of chunked line sampling: every segment leaves ink.
+    rng = np.random.RandomState(0)
+    target = raster.RasterCanvas("0 0 100 100", dimension=200)
+    old_chunk = raster.CHUNK_SAMPLES
+    raster.CHUNK_SAMPLES = 1000
+    try:
+        for (x, y) in rng.uniform(5, 95, (500, 2)):
+            target.line(None, x, y, x + 1, y + 0.5, "black", 1)
+        rgba = target.render()
+    finally:
+        raster.CHUNK_SAMPLES = old_chunk
+    assert rgba[..., 3].sum() > 0
+    reference = raster.RasterCanvas("0 0 100 100", dimension=200)
+    reference.primitives = target.primitives
+    assert np.abs(reference.render().astype(int) - rgba.astype(int)).max() <= 1
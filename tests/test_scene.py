@@ -0,0 +1,82 @@
+import numpy as np
+from jp_svg_canvas import scene
+
+
+def make_scene():
+    model = scene.SceneModel()
+    model.add_elements(["a", "b", "c"], "circle", {"cx": np.array([1.0, 2.5, 3.0])}, {"r": 1},
+        {"fill": "red"})
+    model.add_element("t", "text", {"x": 0, "y": 10}, {}, "hello & <bye>")
+    return model
+
+def test_markup():
+    model = make_scene()
+    assert model.svg_text() == "\n".join([
+        '<circle r="1" cx="1" style="fill: red;"></circle>',
+        '<circle r="1" cx="2.5" style="fill: red;"></circle>',
+        '<circle r="1" cx="3" style="fill: red;"></circle>',
+        '<text x="0" y="10">hello &amp; &lt;bye&gt;</text>',
+    ])
+
+def test_change_delete_and_readd():
+    model = make_scene()
+    model.change_element("b", {"cx": 7}, {"fill": "blue"})
+    model.delete_names(["a", "missing"])
+    assert model.names() == ["b", "c", "t"]
+    assert model.element("b") == ("circle", {"r": 1, "cx": 7}, {"fill": "blue"}, None)
+    # a new element replaces an existing name binding.
+    model.add_element("c", "rect", {"x": 0})
+    assert model.names() == ["b", "t", "c"]
+    assert len(model) == 3
+    model.empty()
+    assert len(model) == 0 and model.svg_text() == ""
+
+def test_groups_nest_and_delete_children():
+    model = scene.SceneModel()
+    model.add_element("g", "g", {}, {"fill": "red"})
+    model.add_element("h", "g", {}, {}, parent="g")
+    model.add_elements(["a", "b"], "circle", {"cx": [1, 2]}, {"r": 1}, parent="h")
+    model.add_element("z", "rect", {"x": 0})
+    assert model.svg_text() == "\n".join([
+        '<g style="fill: red;"><g><circle r="1" cx="1"></circle><circle r="1" cx="2"></circle></g></g>',
+        '<rect x="0"></rect>',
+    ])
+    model.delete_names(["g"])
+    assert model.names() == ["z"]
+
+def test_readd_group_replaces_its_content():
+    # canvas.js register_element also deletes the replaced element and its children.
+    model = scene.SceneModel()
+    model.add_element("g", "g", {}, {})
+    model.add_element("a", "circle", {"cx": 1}, {}, parent="g")
+    model.add_element("g", "g", {}, {"fill": "blue"})
+    assert model.names() == ["g"]
+    assert model.svg_text() == '<g style="fill: blue;"></g>'
+    model.add_element("a", "circle", {"cx": 2}, {}, parent="g")
+    assert model.svg_text() == '<g style="fill: blue;"><circle cx="2"></circle></g>'
+
+def test_bounding_box():
+    model = scene.SceneModel()
+    model.add_elements(["a", "b"], "circle", {"cx": [1, 2], "cy": [1, 2]}, {"r": 1})
+    model.add_element("t", "text", {"x": 0, "y": 10}, {}, "label")
+    model.add_element("p", "polyline", {"points": "-5,2 4,20"})
+    model.change_element("b", {"r": 5})
+    assert model.bounding_box() == (-5.0, -3.0, 7.0, 20.0)
+    model.delete_names(["p", "b"])
+    assert model.bounding_box() == (0.0, 0.0, 2.0, 10.0)
+
+def test_diff():
+    (old, new) = (make_scene(), make_scene())
+    new.delete_names(["a"])
+    new.change_element("b", {"cx": 0})
+    new.add_element("d", "circle", {"cx": 0})
+    assert old.diff(new) == (["d"], ["a"], ["b"])
+
+def test_widget_retained_scene(widget):
+    model = widget.retain_scene()
+    widget.add_elements(range(3), "circle", {"cx": [1, 2, 3]}, {"r": 1})
+    widget.change_elements(range(3), {"cy": [4, 5, 6]})
+    widget.delete_names([1])
+    assert [model.element(name)[1] for name in model.names()] == [
+        {"r": 1, "cx": 1, "cy": 4}, {"r": 1, "cx": 3, "cy": 6}]
+    assert widget.stats()["elements_alive"] == 2
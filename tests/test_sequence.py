@@ -0,0 +1,45 @@
+import io
+import numpy as np
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import svg_file
+
+
+def make_cartesian():
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100")
+    return (target, cartesian_svg.Cartesian(target))
+
+def drawn(target):
+    return [(tag, atts) for (_, tag, atts, _, _) in target.scene.elements()]
+
+def test_one_element_sequences_are_shared():
+    (target, C) = make_cartesian()
+    C.sequence("s", [1, 2, 3], [1, 2, 3], ["red"], [2])
+    [(tag, atts)] = drawn(target)
+    assert tag == "polyline"
+    assert atts["stroke"] == "red"
+    assert atts["stroke-width"] == 2
+
+def test_polyline_per_finite_run():
+    (target, C) = make_cartesian()
+    C.sequence("s", [0, 1, 2, 3, 4, 5, 6], [0, 1, np.nan, 3, 4, np.inf, 6], "blue")
+    # the isolated finite point at the end draws nothing.
+    assert [atts["points"] for (_, atts) in drawn(target)] == ["0,0 1,1", "3,3 4,4"]
+    assert C.element_names(["s"]) == ["s*1", "s*2"]
+
+def test_varying_colors_draw_segments():
+    (target, C) = make_cartesian()
+    C.sequence("s", [0, 1, 2, 3], [0, 1, np.nan, 3], ["red", "green", "blue"])
+    # the segments with a non-finite end point are skipped with their colors.
+    assert [(tag, atts["x1"], atts["stroke"]) for (tag, atts) in drawn(target)] == [("line", 0, "red")]
+
+def test_segments_option():
+    (target, C) = make_cartesian()
+    C.sequence("s", [0, 1, 2], [0, 1, 0], "red", segments=True)
+    assert [tag for (tag, _) in drawn(target)] == ["line", "line"]
+
+def test_polylines_update_extrema():
+    (target, C) = make_cartesian()
+    C.polylines("p", [1, 5, np.nan, 2], [3, -1, 0, 8])
+    # extrema include every finite point.
+    assert (C.min_x, C.min_y, C.max_x, C.max_y) == (1, -1, 5, 8)
+    assert len(drawn(target)) == 1
@@ -0,0 +1,120 @@
+import io
+import json
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import static_svg
+from jp_svg_canvas import svg_file
+
+
+def draw(C):
+    C.circles("dots", [1, 2, 3], [4, 5, 6], 1 / 3.0, "blue")
+    C.lines("edges", [1, 2], [4, 5], [2, 3], [5, 6], "black", 1)
+    C.texts("labels", [1 / 3.0, 3], [4, 6], ["one", "three"])
+    C.rect("box", 1 / 7.0, 0, 2, 2, "none")
+
+def elements(text):
+    "Element markup lines of an svg document."
+    return [line for line in text.replace("><", ">\n<").split("\n")
+        if line and not line.startswith("<svg") and line != "</svg>"]
+
+def test_inline_markup_uses_precision():
+    static = static_svg.StaticCanvas("0 0 100 100", inline=True)
+    C = cartesian_svg.doodle(0, 0, 3, 3, svg=static)
+    static.set_pixel_precision(1)
+    draw(C)
+    C.change("dots", r=[1 / 3.0, 2 / 3.0, 1])
+    for line in elements(static.svg_markup()):
+        assert "3333" not in line and "2857" not in line, line
+
+def test_matches_svg_file_markup():
+    static = static_svg.StaticCanvas("0 0 100 100", inline=True)
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100")
+    for canvas in (static, target):
+        C = cartesian_svg.doodle(0, 0, 10, 10, svg=canvas)
+        canvas.set_pixel_precision()
+        draw(C)
+        C.delete("edges")
+        C.change("dots", r=[1, 2, 3])
+    target.close()
+    assert elements(output.getvalue()) == elements(static.svg_markup())
+
+def test_widget_scene_matches_svg_file(widget):
+    widget.retain_scene()
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100")
+    for canvas in (widget, target):
+        C = cartesian_svg.doodle(0, 0, 10, 10, svg=canvas)
+        canvas.set_pixel_precision()
+        draw(C)
+    target.close()
+    assert elements(output.getvalue()) == elements(widget.scene.svg_text())
+
+def test_streamed_svg_file_matches_inline_markup():
+    static = static_svg.StaticCanvas("0 0 100 100", inline=True)
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100", stream=True)
+    for canvas in (static, target):
+        draw(cartesian_svg.doodle(0, 0, 10, 10, svg=canvas))
+        canvas.fit()
+    target.close()
+    assert elements(output.getvalue()) == elements(static.svg_markup())
+    assert static.viewBox == target.viewBox
+
+def test_inline_markup_applies_changes_and_empty():
+    static = static_svg.StaticCanvas("0 0 100 100", inline=True)
+    static.add_element("a", "circle", {"cx": 1})
+    static.add_element("b", "circle", {"cx": 2})
+    static.change_element("a", {"cx": 5}, {"fill": "red"})
+    static.delete_names(["b"])
+    assert static.svg_markup().split("\n")[1:-1] == ['<circle cx="5" style="fill: red;"></circle>']
+    static.empty()
+    assert elements(static.svg_markup()) == []
+    # the script embedding is unaffected.
+    assert "delete_names" in static.embedding(inline=False)
+
+def embedded_commands(static):
+    "(function name, arguments) of the embedded drawing commands."
+    static.flush_run()
+    result = []
+    for command in static.command_list:
+        (name, arguments) = command.split("(", 1)
+        result.append((name, json.loads("[%s]" % arguments[:-1])))
+    return result
+
+def test_element_runs_flush_on_other_commands():
+    static = static_svg.StaticCanvas()
+    for (i, name) in enumerate(["c1", "c2", "c3"]):
+        static.add_element(name, "circle", {"cx": i, "r": 1}, {"fill": "red"})
+    # a different attribute name starts a new run (of one element).
+    static.add_element("d", "circle", {"cy": 5}, {"fill": "red"})
+    static.change_element("c2", {"r": 2})
+    static.add_element("e1", "rect", {"x": 0})
+    static.add_element("e2", "rect", {"x": 1})
+    commands = embedded_commands(static)
+    assert [name for (name, _) in commands] == [
+        "add_elements", "add_element", "change_element", "add_elements"]
+    (names, tag, columns, shared, style, texts) = commands[0][1]
+    assert (names, tag, shared, style, texts) == ({"prefix": "c", "start": 1, "count": 3}, "circle", {},
+        {"fill": "red"}, None)
+    assert sorted(columns) == ["cx", "r"]
+    assert commands[1][1] == ["d", "circle", {"cy": 5}, {"fill": "red"}, None]
+
+def test_constant_text_columns_are_shared():
+    static = static_svg.StaticCanvas()
+    static.add_elements(["a", "b"], "circle", {"fill": ["red", "red"], "stroke": ["red", "blue"],
+        "r": [1, 1]}, {"cx": 0})
+    [(_, (names, _, columns, shared, _, _))] = embedded_commands(static)
+    assert names == ["a", "b"]
+    assert shared == {"cx": 0, "fill": "red"}
+    assert columns["stroke"] == ["red", "blue"]
+    # numeric columns stay typed arrays even when constant.
+    assert columns["r"]["dtype"] == "float32"
+
+def test_compact_names():
+    assert static_svg.compact_names(["p9", "p10", "p11"]) == {"prefix": "p", "start": 9, "count": 3}
+    assert static_svg.compact_names(range(4, 7)) == {"start": 4, "count": 3}
+    assert static_svg.compact_names(["p1", "p3"]) == ["p1", "p3"]
+    assert static_svg.compact_names(["p2", "q3"]) == ["p2", "q3"]
+    assert static_svg.compact_names(["p1"]) == ["p1"]
+    assert static_svg.compact_names(["a", "b"]) == ["a", "b"]
+    assert static_svg.compact_names([1, 2]) == [1, 2]
@@ -0,0 +1,48 @@
+from jp_svg_canvas import cartesian_svg
+
+
+def test_widget_counters(widget):
+    widget.add_elements(["a", "b", "c"], "circle", {"cx": [1, 2, 3]}, {"r": 1})
+    widget.add_element("d", "rect", {"x": 0})
+    widget.change_element("d", {"x": 1})
+    widget.change_element("d", {"x": 2})
+    stats = widget.stats()
+    assert (stats["commands_buffered"], stats["commands_sent"], stats["batches_sent"]) == (4, 0, 0)
+    widget.send_commands()
+    stats = widget.stats()
+    # the changes of d are folded into its add.
+    assert (stats["commands_sent"], stats["commands_eliminated"], stats["batches_sent"]) == (2, 2, 1)
+    assert stats["elements_alive"] == 4
+    assert stats["buffer_bytes"] > 0 and stats["in_flight"] == 1
+    widget.delete_names(["a", "d"])
+    widget.send_commands()
+    assert widget.stats()["elements_alive"] == 2
+    widget.handle_ack(2)
+    stats = widget.stats()
+    assert stats["acks"] == 2 and stats["in_flight"] == 0
+    widget.reset_stats()
+    stats = widget.stats()
+    assert [stats[key] for key in ("commands_buffered", "commands_sent", "commands_eliminated",
+        "batches_sent", "acks")] == [0, 0, 0, 0, 0]
+    assert stats["mean_ack_seconds"] is None and stats["bytes_per_batch"] is None
+    # resetting the counters does not forget the elements on the canvas.
+    assert stats["elements_alive"] == 2
+
+def test_widget_elements_alive_with_scene(widget):
+    widget.retain_scene()
+    widget.add_elements(["a", "b"], "circle", {"cx": [1, 2]}, {"r": 1})
+    # a new element with the name of an existing element replaces it.
+    widget.add_element("a", "rect", {"x": 0})
+    assert widget.stats()["elements_alive"] == 2
+
+def test_cartesian_counters(widget):
+    C = cartesian_svg.Cartesian(widget)
+    C.circles("c", [1, 2, 3], 0, 1)
+    C.lines("l", 0, 0, 1, 1)
+    stats = C.stats()
+    assert (stats["drawing_calls"], stats["elements_drawn"]) == (2, 4)
+    assert stats["target"]["commands_buffered"] == 2
+    C.reset_stats()
+    stats = C.stats()
+    assert (stats["drawing_calls"], stats["elements_drawn"]) == (0, 0)
+    assert stats["target"]["commands_buffered"] == 0
@@ -0,0 +1,114 @@
+import io
+import re
+import pytest
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import svg_file
+
+
+class Unseekable(io.StringIO):
+    "A text stream like a pipe or socket."
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        raise io.UnsupportedOperation("tell")
+
+
+def draw(C):
+    C.circles("dots", [1, 2, 3], [4, 5, 6], 0.5, "blue")
+    C.lines("edges", [1, 2], [4, 5], [2, 3], [5, 6], "black", 1)
+    C.texts("labels", [1, 3], [4, 6], ["one", "three"])
+    C.rects("boxes", [0], [0], [10], [10], "none")
+
+def test_cartesian_delete_change_restyle():
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100")
+    C = cartesian_svg.doodle(0, 0, 10, 10, svg=target)
+    draw(C)
+    C.delete("edges")
+    C.change("dots", r=[1, 2, 3])
+    C.restyle("labels", display="none")
+    target.close()
+    text = output.getvalue()
+    assert "<line" not in text
+    assert 'r="3"' in text
+    assert "display: none;" in text
+
+def test_grouped_delete():
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100")
+    C = cartesian_svg.doodle(0, 0, 10, 10, svg=target)
+    C.grouped = True
+    draw(C)
+    C.delete("dots")
+    target.close()
+    text = output.getvalue()
+    assert "<circle" not in text
+    assert text.count("<g") == 3
+
+def test_stream_rejects_changes():
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100", stream=True)
+    C = cartesian_svg.doodle(0, 0, 10, 10, svg=target)
+    C.grouped = True
+    draw(C)
+    with pytest.raises(ValueError):
+        C.delete("dots")
+    target.close()
+    assert "<g" not in target.file.getvalue()
+    assert not target.supports_groups
+    with pytest.raises(ValueError):
+        target.add_group("g")
+
+def test_stream_matches_retained():
+    outputs = []
+    for stream in (False, True):
+        output = io.StringIO()
+        target = svg_file.SVGFileCanvas(output, "0 0 100 100", stream=stream)
+        draw(cartesian_svg.doodle(0, 0, 10, 10, svg=target))
+        target.fit()
+        target.close()
+        outputs.append(output.getvalue())
+    # the streamed viewBox is padded so fit() can rewrite it.
+    assert outputs[0] == re.sub(' +"', '"', outputs[1])
+
+def test_viewBox_padded_only_for_rewrites():
+    for (output, stream, padded) in [(io.StringIO(), False, False), (io.StringIO(), True, True),
+            (Unseekable(), True, False)]:
+        target = svg_file.SVGFileCanvas(output, "0 0 100 100", stream=stream)
+        target.circle(None, 10, 20, 5, "red")
+        target.close()
+        assert ('viewBox="0 0 100 100"' not in output.getvalue()) == padded
+
+def test_stream_fit_rewrites_header():
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100", stream=True)
+    target.circle(None, 10, 20, 5, "red")
+    target.fit()
+    target.close()
+    header = output.getvalue().split("\n")[0]
+    assert 'viewBox="5 15 10 10' in header
+    assert target.viewBox == "5 15 10 10"
+
+def test_stream_fit_too_long_viewBox():
+    output = io.StringIO()
+    target = svg_file.SVGFileCanvas(output, "0 0 100 100", stream=True)
+    (old, svg_file.VIEWBOX_FIELD_WIDTH) = (svg_file.VIEWBOX_FIELD_WIDTH, 20)
+    try:
+        target.circle(None, 1 / 3.0, -2 / 3.0, 1e-7 / 3.0, "red")
+        target.fit()
+        with pytest.raises(ValueError):
+            target.close()
+    finally:
+        svg_file.VIEWBOX_FIELD_WIDTH = old
+    # the file is complete with the original viewBox.
+    text = output.getvalue()
+    assert 'viewBox="0 0 100 100' in text
+    assert text.endswith("</svg>\n")
+
+def test_stream_fit_unseekable():
+    target = svg_file.SVGFileCanvas(Unseekable(), "0 0 100 100", stream=True)
+    target.circle(None, 10, 20, 5, "red")
+    with pytest.raises(ValueError):
+        target.fit()
+    target.close()
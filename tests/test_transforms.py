@@ -0,0 +1,65 @@
+import io
+import math
+import numpy as np
+from jp_svg_canvas import cartesian_svg
+from jp_svg_canvas import svg_file
+from jp_svg_canvas import transforms2d
+
+
+def make_cartesian(grouped=True):
+    target = svg_file.SVGFileCanvas(io.StringIO(), "0 0 100 100")
+    C = cartesian_svg.Cartesian(target, x_scaling=2.0, y_scaling=-3.0, x_offset=10.0, y_offset=90.0)
+    C.grouped = grouped
+    return (target, C)
+
+def test_svg_transform_and_tapply_arrays():
+    t = transforms2d.compose(transforms2d.rotate_degrees(90), transforms2d.translate(3, -1))
+    # floating point noise and negative zeros are dropped.
+    assert transforms2d.svg_transform(t) == "matrix(0 1 -1 0 3 -1)"
+    (xs, ys) = transforms2d.tapply_arrays(t, [1, 2, 0], [0, 5, -2])
+    expected = [transforms2d.tapply(t, x, y) for (x, y) in [(1, 0), (2, 5), (0, -2)]]
+    assert np.allclose(np.column_stack([xs, ys]), expected)
+
+def test_conjugate_by_projection_maps_world_points():
+    (_, C) = make_cartesian()
+    projection = C.projection()
+    motion = transforms2d.compose(transforms2d.rotate(0.3), transforms2d.translate(4, -7))
+    canvas_motion = transforms2d.conjugate(motion, projection)
+    for (x, y) in [(0, 0), (1, 2), (-5, 3.5)]:
+        (cx, cy) = C.project(x, y)
+        moved = transforms2d.tapply(motion, x, y)
+        assert np.allclose(transforms2d.tapply(canvas_motion, cx, cy), C.project(*moved))
+
+def test_set_transform_changes_group_once():
+    (target, C) = make_cartesian()
+    C.circles("dot", [0, 1], [0, 1], 1)
+    motion = transforms2d.translate(1, 1)
+    C.set_transform("dot", motion)
+    (tag, atts, _, _) = target.scene.element("dot*0")
+    assert tag == "g"
+    # one world unit is 2 canvas units right and 3 up.
+    assert atts["transform"] == "matrix(1 0 0 1 2 -3)"
+    C.set_transform("dot", None)
+    assert target.scene.element("dot*0")[1]["transform"] == ""
+
+def test_set_transform_without_groups_changes_elements():
+    (target, C) = make_cartesian(grouped=False)
+    C.circles(["dot", "dot"], [0, 1], [0, 1], 1)
+    C.set_transform("dot", transforms2d.scale(2), world=False)
+    for name in C.element_names(["dot"]):
+        assert target.scene.element(name)[1]["transform"] == "matrix(2 0 0 2 0 0)"
+
+def test_nested_group_point_inverts_transforms():
+    (target, C) = make_cartesian()
+    C.nest("moon", "planet")
+    C.circles("moon", 3, 0, 0.5)
+    C.set_transform("planet", transforms2d.rotate(math.pi / 2))
+    C.set_transform("moon", transforms2d.translate(1, 2))
+    # the moon group is drawn inside the planet group.
+    [markup] = target.scene.markup()
+    assert markup.startswith("<g transform=") and markup.count("<g") == 2
+    # the moon at world (3, 0) moves by (1, 2) and then turns about the origin to (-2, 4).
+    (cx, cy) = transforms2d.tapply(C.canvas_transform("moon"), *C.project(3, 0))
+    assert np.allclose((cx, cy), C.project(-2, 4))
+    assert np.allclose(C.group_point("moon", cx, cy), (3, 0))
+    assert np.allclose(C.group_point("planet", cx, cy), (4, 2))
@@ -0,0 +1,29 @@
+import numpy as np
+from jp_svg_canvas import cartesian_svg
+
+
+def test_viewBox_updates_view_fields(widget):
+    assert widget.pan_zoom is False
+    # as sent by the browser while panning and zooming.
+    widget.viewBox = "10 -20.5 300 400"
+    assert (widget.view_minx, widget.view_miny, widget.view_width, widget.view_height) == (10, -20.5, 300, 400)
+    widget.viewBox = "1,2,3,4"
+    assert (widget.view_minx, widget.view_miny, widget.view_width, widget.view_height) == (1, 2, 3, 4)
+    # a malformed viewBox leaves the fields alone.
+    widget.viewBox = "1 2 3"
+    assert (widget.view_minx, widget.view_miny, widget.view_width, widget.view_height) == (1, 2, 3, 4)
+
+def test_view_extrema_inverts_projection(widget):
+    C = cartesian_svg.Cartesian(widget, x_scaling=2.0, y_scaling=-4.0, x_offset=50.0, y_offset=100.0)
+    widget.viewBox = "10 20 300 400"
+    (min_x, min_y, max_x, max_y) = C.view_extrema()
+    assert np.allclose((min_x, min_y, max_x, max_y), (-20, -80, 130, 20))
+    corners = [C.project(x, y) for x in (min_x, max_x) for y in (min_y, max_y)]
+    assert sorted(set(cx for (cx, _) in corners)) == [10, 310]
+    assert sorted(set(cy for (_, cy) in corners)) == [20, 420]
+
+def test_render_mode_is_synced(widget):
+    assert widget.render_mode == "svg"
+    assert widget.trait_metadata("render_mode", "sync") is True
+    widget.render_mode = "canvas"
+    assert widget.get_state("render_mode") == {"render_mode": "canvas"}